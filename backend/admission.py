@@ -0,0 +1,124 @@
+# Admission control for the expensive endpoints
+#
+# At most ADMISSION_MAX_CONCURRENT limited requests run at once. Others wait in
+# a bounded queue (ADMISSION_MAX_QUEUE); a freed slot goes to the waiting
+# request with the best priority, oldest first. A request that cannot start
+# within its endpoint's deadline, or finds the queue full, is shed: the API
+# answers 503 with a Retry-After estimate instead of letting latency pile up
+# for everyone. Cheap endpoints (health, catalog reads) are not limited at all.
+#
+# ADMISSION_DEADLINES overrides deadlines per endpoint, e.g.
+# "get_recommendations=1.5,chatbot=4". ADMISSION_MAX_CONCURRENT=0 switches
+# admission control off.
+
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+# Flask endpoint -> (priority, deadline in seconds); lower priority numbers are admitted first
+LIMITED_ENDPOINTS = {
+    'search_colleges': (0, 1.0),
+    'compare_colleges': (0, 1.0),
+    'get_recommendations': (1, 2.0),
+    'what_if': (1, 3.0),
+    'chatbot': (2, 3.0),
+}
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, endpoints: Dict[str, Tuple[int, float]]):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.endpoints = endpoints
+        self.active = 0
+        self.queued = 0
+        self.shed = 0
+        self._waiting = []          # heap of [priority, sequence, state]
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._service_time = 0.05   # moving average of admitted request durations (seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def limits(self, endpoint: Optional[str]) -> Optional[Tuple[int, float]]:
+        # (priority, deadline) for a limited endpoint, None for endpoints that are never queued
+        if not self.enabled:
+            return None
+        return self.endpoints.get(endpoint)
+
+    def acquire(self, endpoint: str) -> Tuple[bool, float]:
+        # Wait for a slot; returns (admitted, seconds waited)
+        priority, deadline = self.endpoints[endpoint]
+        start = time.perf_counter()
+        with self._cond:
+            if self.active < self.max_concurrent and not self.queued:
+                self.active += 1
+                return True, 0.0
+            if self.queued >= self.max_queue:
+                self._shed(endpoint, 'queue_full')
+                return False, 0.0
+
+            entry = [priority, next(self._sequence), 'waiting']
+            heapq.heappush(self._waiting, entry)
+            self.queued += 1
+            while entry[2] == 'waiting':
+                remaining = deadline - (time.perf_counter() - start)
+                if remaining <= 0:
+                    # Left in the heap; release() skips cancelled entries
+                    entry[2] = 'cancelled'
+                    self.queued -= 1
+                    self._shed(endpoint, 'deadline')
+                    return False, time.perf_counter() - start
+                self._cond.wait(remaining)
+            return True, time.perf_counter() - start
+
+    def release(self, duration: float):
+        # Free a slot (handing it straight to the best waiting request)
+        with self._cond:
+            self._service_time = 0.9 * self._service_time + 0.1 * duration
+            while self._waiting:
+                entry = heapq.heappop(self._waiting)
+                if entry[2] == 'waiting':
+                    entry[2] = 'admitted'
+                    self.queued -= 1
+                    self._cond.notify_all()
+                    return
+            self.active -= 1
+
+    def retry_after(self) -> int:
+        # Seconds until the current queue has probably drained
+        waves = (self.queued + self.active) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(waves * self._service_time))
+
+    def _shed(self, endpoint: str, reason: str):
+        self.shed += 1
+        metrics.inc('admission_shed_total', 'Requests rejected by admission control', endpoint=endpoint, reason=reason)
+
+
+def _parse_deadlines(value: str) -> Dict[str, Tuple[int, float]]:
+    endpoints = dict(LIMITED_ENDPOINTS)
+    for item in value.split(','):
+        name, _, seconds = item.partition('=')
+        name = name.strip()
+        if name in endpoints and seconds.strip():
+            endpoints[name] = (endpoints[name][0], float(seconds))
+    return endpoints
+
+
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT', str(2 * (os.cpu_count() or 2)))),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', '64')),
+    endpoints=_parse_deadlines(os.environ.get('ADMISSION_DEADLINES', '')),
+)
+
+metrics.register_gauge('admission_active', 'Limited requests currently running', lambda: admission.active)
+metrics.register_gauge('admission_queued', 'Limited requests waiting for a slot', lambda: admission.queued)
+metrics.register_gauge('admission_shed', 'Requests rejected by admission control since start', lambda: admission.shed)
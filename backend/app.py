@@ -1,30 +1,291 @@
 # Backend API for College Recommendation System
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import os
 import json
-from ml_recommender import CollegeRecommender
+import logging
+import threading
+import time
+import memory
+import metrics
+import tracing
+from admission import admission
+from auth import admin_required, is_admin
+from profiling import profiler
+from json_fragments import dumps
+from geo import parse_km
+from startup import popular_profiles, read_profiles, startup
+from catalogs import DEFAULT_CATALOG, Catalog, CatalogManager, catalog_paths
+import engines
+import topn_table
+from ml_recommender import WHAT_IF_FIELDS, CollegeRecommender
 
 app = Flask(__name__)
 CORS(app)  # Allow frontend to make requests
 
-# Initialize recommender
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(name)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+# Catalogs (catalogs.py): the default one is built by start_engine, the ones in CATALOG_DIR on
+# first use, within a memory budget of CATALOG_MEMORY_MB
 colleges_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'colleges.json')
-recommender = CollegeRecommender(colleges_file)
+CATALOG_DIR = os.environ.get('CATALOG_DIR', '')
+CATALOG_MEMORY_MB = float(os.environ.get('CATALOG_MEMORY_MB', '2048'))
+
+# The default catalog's recommender (built by start_engine; None until then)
+recommender = None
+
+# Feature weights exported by tune_weights.py (used when the file exists)
+weights_file = os.environ.get('WEIGHTS_FILE', os.path.join(os.path.dirname(__file__), '..', 'data', 'weights.json'))
+
+# Materialised top-N table (topn_table.py): loaded from this file, or built and written there
+TOPN_TABLE = os.environ.get('TOPN_TABLE', '')
+TOPN_SIZE = int(os.environ.get('TOPN_SIZE', '10'))
+
+# Profiles replayed before the engine reports ready
+WARMUP_FILE = os.environ.get('WARMUP_FILE', '')
+WARMUP_SIZE = int(os.environ.get('WARMUP_SIZE', '20'))
+
+# Scoring engine for /api/recommend and optional shadow engine (engines.py)
+PRIMARY_ENGINE = os.environ.get('PRIMARY_ENGINE', 'vectorized')
+SHADOW_ENGINE = os.environ.get('SHADOW_ENGINE', '')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '0.05'))
+SHADOW_QUEUE = int(os.environ.get('SHADOW_QUEUE', '100'))
+
+def start_shadow(engine: CollegeRecommender):
+    # Shadow runner for SHADOW_ENGINE; a shadow that fails to load is logged and left out
+    try:
+        return engines.ShadowRunner(engines.create(SHADOW_ENGINE, engine), PRIMARY_ENGINE,
+                                    sample_rate=SHADOW_SAMPLE_RATE, max_queue=SHADOW_QUEUE)
+    except Exception:
+        logger.exception('shadow engine %s could not be loaded', SHADOW_ENGINE)
+        return None
+
+def build_catalog(catalog_id: str, catalog_file: str, timing=None) -> Catalog:
+    # Recommender, scoring engine and shadow runner for one catalog file
+    engine = CollegeRecommender(catalog_file, startup=timing)
+    if os.path.exists(weights_file):
+        engine.load_weights(weights_file)
+    engine.proximity_decay_km = parse_km(os.environ.get('PROXIMITY_DECAY_KM'))
+    primary = engines.create(PRIMARY_ENGINE, engine)
+    runner = start_shadow(engine) if SHADOW_ENGINE else None
+    return Catalog(catalog_id, engine, primary, runner)
+
+catalogs = CatalogManager(catalog_paths(colleges_file, CATALOG_DIR), build_catalog, int(CATALOG_MEMORY_MB * 2**20))
+
+def start_engine():
+    # Build the default catalog phase by phase, warm it up, then publish it
+    global recommender
+    try:
+        catalog = build_catalog(DEFAULT_CATALOG, colleges_file, timing=startup)
+        engine = catalog.recommender
+        if TOPN_TABLE:
+            with startup.phase('materialize'):
+                topn_table.load_or_build(engine, TOPN_TABLE, TOPN_SIZE)
+        with startup.phase('warmup'):
+            profiles = read_profiles(WARMUP_FILE) if WARMUP_FILE else popular_profiles(engine.snapshot.colleges, WARMUP_SIZE)
+            engine.warm_up(profiles)
+        catalogs.add(catalog)
+    except Exception as e:
+        startup.mark_failed(e)
+        return
+    recommender = engine
+    startup.mark_ready()
+
+# The server answers (liveness, /api/ready) while the engine builds in the background;
+# STARTUP_BACKGROUND=0 builds it before the module finishes importing
+if os.environ.get('STARTUP_BACKGROUND', '1').lower() in ('0', 'false', 'no'):
+    start_engine()
+else:
+    threading.Thread(target=start_engine, name='engine-startup', daemon=True).start()
+
+# Feedback is also appended to this NDJSON file when set; tune_weights.py replays it
+FEEDBACK_LOG = os.environ.get('FEEDBACK_LOG', '')
 
 # Store feedback (in production, use a database)
 feedback_storage = []
 
+metrics.register_gauge('colleges_loaded', 'Number of colleges in each loaded catalog',
+                       catalogs.per_catalog(lambda c: c.recommender.snapshot.count))
+metrics.register_gauge('catalog_dead_rows', 'Deleted or replaced rows awaiting compaction in each loaded catalog',
+                       catalogs.per_catalog(lambda c: c.recommender.dead_rows()))
+metrics.register_gauge('catalogs_loaded', 'Catalogs currently loaded',
+                       lambda: sum(1 for entry in catalogs.status() if entry['loaded']))
+metrics.register_gauge('catalog_memory_bytes', 'Measured size of each loaded catalog', catalogs.memory_bytes)
+metrics.register_gauge('feedback_stored', 'Number of feedback entries held in memory', lambda: len(feedback_storage))
+
+@app.before_request
+def start_request_timer():
+    # Remember when the request started for the latency histogram
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+
+@app.before_request
+def start_trace():
+    # Record spans for this request so slow outliers can be inspected later
+    if not request.path.startswith('/api/debug'):
+        tracing.begin(request.method, request.path)
+
+@app.after_request
+def finish_trace(response):
+    # Keep the (redacted) payload and hand the trace to the slow request log
+    trace = tracing.current()
+    if trace is not None:
+        if request.is_json:
+            trace.payload = tracing.redact(request.get_json(silent=True))
+        tracing.end(response.status_code)
+    return response
+
+@app.teardown_request
+def drop_trace(exc):
+    # Finish traces of requests that failed before after_request ran
+    if tracing.current() is not None:
+        tracing.end(500)
+
+# Endpoints that answer before the engine is ready
+STARTUP_ENDPOINTS = {'health_check', 'readiness_check', 'get_metrics', 'static'}
+
+@app.before_request
+def require_engine():
+    # Everything else waits for the engine: 503 until startup has finished
+    if startup.ready or request.endpoint in STARTUP_ENDPOINTS:
+        return
+    response = jsonify({'error': 'Service is starting, please retry shortly', 'startup': startup.status()})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.before_request
+def select_catalog():
+    # The catalog a request addresses: ?catalog=<id> or X-Catalog, else the default one.
+    # A catalog that is not loaded yet is built now (requests for it wait for the build).
+    if request.endpoint in STARTUP_ENDPOINTS:
+        return
+    catalog_id = request.args.get('catalog') or request.headers.get('X-Catalog') or DEFAULT_CATALOG
+    try:
+        g.catalog = catalogs.get(catalog_id)
+    except KeyError:
+        return jsonify({'error': 'Unknown catalog', 'catalog': catalog_id}), 404
+    except Exception as e:
+        logger.exception('catalog %s could not be loaded', catalog_id)
+        return jsonify({'error': 'Catalog could not be loaded', 'catalog': catalog_id, 'message': str(e)}), 500
+    g.recommender = g.catalog.recommender
+    tracing.annotate('catalog', catalog_id)
+
+@app.before_request
+def admit_request():
+    # Queue expensive endpoints behind the concurrency limit; shed them with 503 past their deadline
+    if admission.limits(request.endpoint) is None:
+        return
+    admitted, waited = admission.acquire(request.endpoint)
+    metrics.observe('admission_wait_seconds', waited, 'Time spent waiting for an admission slot',
+                    endpoint=request.endpoint)
+    tracing.annotate('admission_wait_ms', round(waited * 1000.0, 3))
+    if not admitted:
+        response = jsonify({'error': 'Server busy, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(admission.retry_after())
+        return response
+    g.admitted_at = time.perf_counter()
+
+@app.teardown_request
+def release_admission(exc):
+    # Give the slot to the next waiting request
+    admitted_at = g.pop('admitted_at', None)
+    if admitted_at is not None:
+        admission.release(time.perf_counter() - admitted_at)
+
+@app.before_request
+def start_profiling():
+    # Profile this request if an admin asked for it or it was sampled
+    mode = (request.headers.get('X-Profile') or request.args.get('profile') or '').strip().lower()
+    if mode != 'inline':
+        mode = 'report' if parse_flag(mode, False) else ''
+    if mode and is_admin():
+        g.profile_mode = mode
+    elif not request.path.startswith(('/api/debug', '/api/metrics')) and profiler.should_sample():
+        g.profile_mode = 'sample'
+    else:
+        return
+    g.profiler = profiler.start()
+
+@app.after_request
+def finish_profiling(response):
+    # Store the profile and point the client at it
+    running = g.pop('profiler', None)
+    if running is None:
+        return response
+    report = profiler.finish(running, f'{request.method} {request.path}')
+    response.headers['X-Profile-Report'] = report['id']
+    if g.get('profile_mode') == 'inline' and response.is_json:
+        data = response.get_json()
+        if isinstance(data, dict):
+            data['_profile'] = report
+            response.set_data(json.dumps(data))
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    # Record latency and status per endpoint
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_seconds', time.perf_counter() - start, 'Request latency in seconds',
+                        endpoint=endpoint, method=request.method)
+        metrics.inc('http_requests_total', 'Requests by endpoint and status',
+                    endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def parse_flag(value, default: bool) -> bool:
+    # Read a true/false request option given as bool or string
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'off')
+
+def parse_fields(value):
+    # Read a field list given as a list or comma separated string (None = all fields)
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(f).strip() for f in value if str(f).strip()]
+
+def parse_diversity(value):
+    # Read the MMR diversity option: None (rank by score) or a number from 0 to 1
+    if value is None or value == '':
+        return None
+    diversity = float(value)
+    if not 0.0 <= diversity <= 1.0:
+        raise ValueError('diversity must be between 0 and 1')
+    return diversity
+
+@app.route('/api/catalogs', methods=['GET'])
+def list_catalogs():
+    # Catalogs this server can serve, with size and load state
+    return jsonify({'catalogs': catalogs.status(), 'default': DEFAULT_CATALOG,
+                    'loaded_bytes': catalogs.loaded_bytes(), 'budget_bytes': catalogs.budget_bytes})
+
 @app.route('/api/colleges', methods=['GET'])
 def get_all_colleges():
-    # Get list of all colleges
-    return jsonify(recommender.colleges)
+    # Get list of all colleges (encoded once per catalog version)
+    version = g.recommender.changes.token
+    response = Response(g.recommender.colleges_json(), mimetype='application/json')
+    response.headers['X-Catalog-Version'] = version
+    return response
+
+@app.route('/api/colleges/changes', methods=['GET'])
+def get_college_changes():
+    # Colleges added, changed and deleted since ?since=<version>, or the whole catalog
+    # with "resync": true when the client has to start over
+    return Response(g.recommender.catalog_changes(request.args.get('since')), mimetype='application/json')
 
 @app.route('/api/colleges/<int:college_id>', methods=['GET'])
 def get_college_by_id(college_id):
     # Get a specific college by ID
-    college = next((c for c in recommender.colleges if c['id'] == college_id), None)
+    college = g.recommender.get_college(college_id)
     if college:
         return jsonify(college)
     return jsonify({'error': 'College not found'}), 404
@@ -36,8 +297,9 @@ def get_recommendations():
         user_profile = request.json
         
         # Validate required fields
-        required_fields = ['stream', 'gpa', 'preferred_program', 'location', 'budget_range']
-        missing_fields = [field for field in required_fields if not user_profile.get(field)]
+        with metrics.stage('validate'):
+            required_fields = ['stream', 'gpa', 'preferred_program', 'location', 'budget_range']
+            missing_fields = [field for field in required_fields if not user_profile.get(field)]
         
         if missing_fields:
             return jsonify({
@@ -45,16 +307,86 @@ def get_recommendations():
                 'missing': missing_fields
             }), 400
         
-        # Get recommendations
+        # Response options: field projection, explanations and profile echo
+        fields = parse_fields(request.args.get('fields', user_profile.get('fields')))
+        explain = parse_flag(request.args.get('explain', user_profile.get('explain')), True)
+        echo_profile = parse_flag(request.args.get('echo_profile', user_profile.get('echo_profile')), True)
+        diversity = parse_diversity(request.args.get('diversity', user_profile.get('diversity')))
+        
+        # Get recommendations; a sampled share is replayed against the shadow engine afterwards
         top_n = int(user_profile.get('top_n', 5))
-        recommendations = recommender.recommend(user_profile, top_n=top_n)
+        shadow = g.catalog.shadow
+        shadowed = shadow is not None and diversity is None and shadow.sampled()
+        profile = dict(user_profile) if shadowed else None
+        start = time.perf_counter()
+        recommendations = g.catalog.scoring_engine.recommend(user_profile, top_n=top_n, fields=fields,
+                                                             explain=explain, encoded=True, diversity=diversity)
+        if shadowed:
+            shadow.submit(profile, top_n, recommendations, time.perf_counter() - start)
         
+        # Splice the pre-encoded results into the response instead of re-serialising every college
+        with metrics.stage('serialize'):
+            parts = [b'"recommendations":[' + b','.join(recommendations) + b']',
+                     b'"count":' + dumps(len(recommendations))]
+            if echo_profile:
+                parts.append(b'"user_profile":' + dumps(user_profile))
+            response = Response(b'{' + b','.join(parts) + b'}', mimetype='application/json')
+        return response
+    
+    except ValueError as e:
         return jsonify({
-            'recommendations': recommendations,
-            'count': len(recommendations),
-            'user_profile': user_profile
-        })
+            'error': 'Invalid request',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'error': 'Error processing request',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/what-if', methods=['POST'])
+def what_if():
+    # Recommendations for a grid of variations of one profile, scored in a single pass
+    # e.g. {"profile": {...}, "variations": {"gpa": [2.8, 3.0, 3.2], "budget_range": ["low", "medium"]}}
+    try:
+        data = request.json or {}
+        user_profile = data.get('profile') or {}
+        variations = data.get('variations') or {}
+        
+        with metrics.stage('validate'):
+            required_fields = ['stream', 'gpa', 'preferred_program', 'location', 'budget_range']
+            missing_fields = [field for field in required_fields
+                              if not user_profile.get(field) and not variations.get(field)]
+            unknown_fields = [field for field in variations if field not in WHAT_IF_FIELDS]
+        
+        if missing_fields:
+            return jsonify({
+                'error': 'Missing required fields',
+                'missing': missing_fields
+            }), 400
+        if unknown_fields or not all(isinstance(values, list) for values in variations.values()):
+            return jsonify({
+                'error': 'Variations must be lists of values for: ' + ', '.join(WHAT_IF_FIELDS),
+                'unknown': unknown_fields
+            }), 400
+        
+        fields = parse_fields(request.args.get('fields', data.get('fields')))
+        explain = parse_flag(request.args.get('explain', data.get('explain')), False)
+        top_n = int(data.get('top_n', user_profile.get('top_n', 5)))
+        diversity = parse_diversity(request.args.get('diversity', data.get('diversity')))
+        
+        variants = g.recommender.what_if(user_profile, variations, top_n=top_n, fields=fields, explain=explain,
+                                       diversity=diversity)
+        
+        with metrics.stage('serialize'):
+            response = jsonify({'variants': variants, 'count': len(variants)})
+        return response
     
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid what-if request',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'error': 'Error processing request',
@@ -73,7 +405,7 @@ def compare_colleges():
                 'error': 'Please provide at least 2 college IDs to compare'
             }), 400
         
-        comparison = recommender.compare_colleges(college_ids)
+        comparison = g.recommender.compare_colleges(college_ids)
         return jsonify(comparison)
     
     except Exception as e:
@@ -82,11 +414,61 @@ def compare_colleges():
             'message': str(e)
         }), 500
 
+# Query parameter -> catalog field for /api/search filters
+SEARCH_FILTERS = {
+    'location': 'location',
+    'budget': 'budget_range',
+    'budget_range': 'budget_range',
+    'type': 'type',
+    'stream': 'streams',
+    'program': 'programs',
+    'facility': 'facilities',
+    'facilities': 'facilities'
+}
+
+@app.route('/api/search', methods=['GET'])
+def search_colleges():
+    # Filter colleges by facets and return a page of matches with per-facet counts
+    # e.g. /api/search?location=Pokhara&budget=low&program=BSc CSIT&min_gpa_to=3.0
+    # q= adds a ranked full-text query over names, descriptions and programs
+    try:
+        filters = {}
+        for param, field in SEARCH_FILTERS.items():
+            for value in request.args.getlist(param):
+                filters.setdefault(field, []).extend(v for v in value.split(',') if v.strip())
+        
+        gpa_from = request.args.get('min_gpa_from', type=float)
+        gpa_to = request.args.get('min_gpa_to', type=float)
+        if gpa_to is None:
+            # A student's GPA means "colleges I am eligible for"
+            gpa_to = request.args.get('gpa', type=float)
+        
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 20, type=int), 0), 100)
+        
+        result = g.recommender.search(filters, (gpa_from, gpa_to), offset=offset, limit=limit,
+                                    sort=request.args.get('sort'), fields=parse_fields(request.args.get('fields')),
+                                    query=request.args.get('q'))
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({
+            'error': 'Error searching colleges',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest_colleges():
+    # Typeahead: colleges whose name (or text) starts with what has been typed so far
+    prefix = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    return jsonify({'suggestions': g.recommender.suggest(prefix, limit)})
+
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     # Get statistics about the college dataset
     try:
-        stats = recommender.get_statistics()
+        stats = g.recommender.get_statistics()
         return jsonify(stats)
     except Exception as e:
         return jsonify({
@@ -105,8 +487,14 @@ def submit_feedback():
             'comment': data.get('comment', ''),
             'timestamp': data.get('timestamp')
         }
+        if data.get('profile'):
+            # The profile the recommendation was made for (used to tune the weights offline)
+            feedback['profile'] = data['profile']
         
         feedback_storage.append(feedback)
+        if FEEDBACK_LOG:
+            with open(FEEDBACK_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(feedback) + '\n')
         
         return jsonify({
             'message': 'Feedback submitted successfully',
@@ -346,12 +734,128 @@ def chatbot():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    # Health check endpoint
+    # Health check endpoint (liveness: the process is up, the engine may still be starting)
     return jsonify({
         'status': 'ok',
         'message': 'College Recommendation API is running',
-        'colleges_count': len(recommender.colleges)
+        'ready': startup.ready,
+        'colleges_count': recommender.snapshot.count if recommender is not None else 0
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    # Readiness: 200 only once the engine is built and warmed up, with per-phase timings
+    status = startup.status()
+    return jsonify(status), 200 if startup.ready else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Metrics in Prometheus text format (collection needs METRICS_ENABLED=1)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/debug/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    # Stored profile reports, newest first
+    reports = profiler.list_reports()
+    return jsonify({'profiles': reports, 'count': len(reports)})
+
+@app.route('/api/debug/profiles/<report_id>', methods=['GET'])
+@admin_required
+def get_profile(report_id):
+    # One stored profile report as text
+    report = profiler.read_report(report_id)
+    if report is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(report, mimetype='text/plain')
+
+@app.route('/api/debug/slow', methods=['GET'])
+@admin_required
+def get_slow_requests():
+    # Slowest recent requests with their span traces
+    slowest = tracing.slow_log.slowest()
+    return jsonify({
+        'requests': slowest,
+        'count': len(slowest),
+        'capacity': tracing.slow_log.capacity,
+        'window_seconds': tracing.slow_log.window_seconds
+    })
+
+@app.route('/api/debug/memory', methods=['GET'])
+@admin_required
+def get_memory():
+    # Estimated bytes held per subsystem; ?top=N source lines when tracemalloc is running
+    try:
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({'error': 'top must be an integer'}), 400
+    subsystems = g.recommender.memory_parts()
+    # The chatbot keeps no sessions: clients send the conversation history with each message
+    subsystems['chatbot_sessions'] = {}
+    subsystems['feedback'] = {'entries': feedback_storage}
+    subsystems['request_traces'] = {'slow_log': tracing.slow_log, 'profiler': profiler}
+    return jsonify(memory.report(subsystems, top=top, stable=CollegeRecommender.CATALOG_SUBSYSTEMS,
+                                 version=g.recommender.memory_version()))
+
+@app.route('/api/debug/shadow', methods=['GET'])
+@admin_required
+def get_shadow_summary():
+    # How the shadow engine's rankings and latency compare with the primary's so far
+    if g.catalog.shadow is None:
+        return jsonify({'primary': PRIMARY_ENGINE, 'shadow': None})
+    return jsonify(g.catalog.shadow.summary())
+
+@app.route('/api/admin/colleges', methods=['POST'])
+@admin_required
+def add_college():
+    # Add a college to the live catalog (visible to the next request)
+    try:
+        college = g.recommender.add_college(request.json or {})
+        return jsonify(college), 201
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid college', 'message': str(e)}), 400
+
+@app.route('/api/admin/colleges/<int:college_id>', methods=['PUT', 'PATCH'])
+@admin_required
+def update_college(college_id):
+    # Change fields of a college in the live catalog
+    try:
+        college = g.recommender.update_college(college_id, request.json or {})
+        return jsonify(college)
+    except KeyError:
+        return jsonify({'error': 'College not found'}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid college', 'message': str(e)}), 400
+
+@app.route('/api/admin/colleges/<int:college_id>', methods=['DELETE'])
+@admin_required
+def delete_college(college_id):
+    # Remove a college from the live catalog
+    try:
+        college = g.recommender.delete_college(college_id)
+        return jsonify({'deleted': college['id']})
+    except KeyError:
+        return jsonify({'error': 'College not found'}), 404
+
+@app.route('/api/admin/compact', methods=['POST'])
+@admin_required
+def compact_catalog():
+    # Rebuild the catalog indexes now instead of waiting for automatic compaction
+    return jsonify(g.recommender.compact())
+
+@app.route('/api/admin/topn-table', methods=['POST'])
+@admin_required
+def rebuild_topn_table():
+    # Rebuild the materialised top-N table for the current catalog (it is dropped on every edit)
+    start = time.perf_counter()
+    table = g.recommender.build_topn_table(int(request.args.get('top_n', TOPN_SIZE)))
+    if not g.recommender.attach_topn_table(table):
+        return jsonify({'error': 'The catalog changed during the build, please retry'}), 409
+    # TOPN_TABLE is the default catalog's table; others are rebuilt after a restart
+    if TOPN_TABLE and g.catalog.id == DEFAULT_CATALOG:
+        table.save(TOPN_TABLE)
+    return jsonify({'keys': table.keys, 'candidates': len(table.ids), 'top_n': table.top_n,
+                    'seconds': round(time.perf_counter() - start, 3)})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
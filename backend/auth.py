@@ -0,0 +1,30 @@
+# Admin access for debug and maintenance endpoints
+#
+# Admin features are disabled unless ADMIN_TOKEN is set. Requests prove
+# admin access by sending the token in the X-Admin-Token header.
+
+import hmac
+import os
+from functools import wraps
+
+from flask import jsonify, request
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+
+def is_admin() -> bool:
+    # True when the current request carries the admin token
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def admin_required(view):
+    # Reject the request with 403 unless it comes from an admin
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
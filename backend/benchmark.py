@@ -0,0 +1,224 @@
+# Micro-benchmarks for the recommendation engine
+#
+# Usage:
+#   python benchmark.py --sizes 115,1000,10000 --output bench.json
+#   python benchmark.py --baseline bench.json --max-regression 10
+#
+# Measures recommend(), compare_colleges(), get_statistics() and the chatbot
+# extractor over catalogs of different sizes and reports p50/p95/p99 latency,
+# throughput and peak memory. Results are written as JSON so runs can be diffed,
+# and a baseline comparison fails (exit code 1) when a metric regresses.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from data_generator import generate_synthetic, write_colleges
+from ml_recommender import CollegeRecommender
+
+REAL_COLLEGES_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'colleges.json')
+
+# Metrics where a bigger number is worse
+LOWER_IS_BETTER = ['p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'peak_memory_kb']
+HIGHER_IS_BETTER = ['throughput_per_s']
+
+CHATBOT_MESSAGES = [
+    "hello",
+    "I completed Science with 3.5 GPA",
+    "I want to study Computer Engineering in Kathmandu with a medium budget",
+    "I did management, got 2.8, want BBA in Pokhara, cheap please",
+    "I'm not sure, can you help?",
+    "interested in medicine, want to become a doctor, gpa 3.6 in chitwan",
+]
+
+
+def profile_corpus(size: int = 50, seed: int = 1234) -> List[Dict]:
+    # Fixed set of user profiles so every run scores the same inputs
+    rng = random.Random(seed)
+    streams = ['Science', 'Management', 'Humanities']
+    programs = ['Computer Engineering', 'BBA', 'BSc CSIT', 'BCA', 'MBBS', 'Civil Engineering',
+                'BBS', 'BA', 'Architecture', 'BSc Nursing', 'Engineering', 'IT']
+    locations = ['Kathmandu', 'Lalitpur', 'Pokhara', 'Biratnagar', 'Chitwan', 'Butwal', 'any']
+    budgets = ['low', 'medium', 'high']
+    return [{
+        'stream': rng.choice(streams),
+        'gpa': round(rng.uniform(2.0, 4.0), 2),
+        'preferred_program': rng.choice(programs),
+        'location': rng.choice(locations),
+        'budget_range': rng.choice(budgets),
+    } for _ in range(size)]
+
+
+def make_catalog(size: int, seed: int, workdir: str) -> str:
+    # Catalog file for a given size; the real dataset is used when the size matches it
+    with open(REAL_COLLEGES_FILE, 'r', encoding='utf-8') as f:
+        if len(json.load(f)) == size:
+            return REAL_COLLEGES_FILE
+    path = os.path.join(workdir, f'colleges_{size}.ndjson')
+    write_colleges(generate_synthetic(size, seed=seed), path, 'ndjson')
+    return path
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = 3) -> Dict:
+    # Time `iterations` calls of fn(i) and measure peak memory of one extra call
+    for i in range(warmup):
+        fn(i)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    total = time.perf_counter() - started
+
+    # tracemalloc slows everything down, so memory is measured on separate calls
+    tracemalloc.start()
+    for i in range(min(iterations, 5)):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p95_ms': round(percentile(latencies, 95), 4),
+        'p99_ms': round(percentile(latencies, 99), 4),
+        'mean_ms': round(sum(latencies) / len(latencies), 4),
+        'throughput_per_s': round(iterations / total, 2) if total > 0 else 0.0,
+        'peak_memory_kb': round(peak / 1024.0, 1),
+    }
+
+
+def bench_catalog(catalog_file: str, profiles: List[Dict], iterations: int) -> Dict:
+    # Run every recommender benchmark against one catalog
+    recommender = CollegeRecommender(catalog_file)
+    ids = [c['id'] for c in recommender.snapshot.colleges]
+    rng = random.Random(99)
+    compare_sets = [rng.sample(ids, min(len(ids), 4)) for _ in range(iterations)]
+
+    def compare(i):
+        # Time building the comparison, not a hit in the comparison cache (the warm-up
+        # and memory passes repeat the first sets)
+        recommender.comparison_cache.clear()
+        return recommender.compare_colleges(compare_sets[i % len(compare_sets)])
+
+    return {
+        'recommend': measure(lambda i: recommender.recommend(dict(profiles[i % len(profiles)]), top_n=10), iterations),
+        'compare_colleges': measure(compare, iterations),
+        'get_statistics': measure(lambda i: recommender.get_statistics(), iterations),
+    }
+
+
+def bench_chatbot(iterations: int) -> Dict:
+    # The chatbot extractor lives in the Flask handler, so drive it through the test client
+    from app import app
+    from startup import startup
+    startup.wait()
+    client = app.test_client()
+
+    def call(i):
+        response = client.post('/api/chatbot', json={'message': CHATBOT_MESSAGES[i % len(CHATBOT_MESSAGES)]})
+        if response.status_code != 200:
+            raise RuntimeError(f'chatbot returned {response.status_code}')
+
+    return measure(call, iterations)
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    # List every metric that got worse than the baseline by more than max_regression percent
+    regressions = []
+    for name, metrics in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > max_regression:
+                regressions.append(f'{name} {metric}: {old} -> {new} ({change:+.1f}% worse)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the college recommender')
+    parser.add_argument('--sizes', default='115,1000,10000', help='comma separated catalog sizes')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--profiles', type=int, default=50, help='size of the fixed user profile corpus')
+    parser.add_argument('--seed', type=int, default=42, help='seed for synthetic catalogs')
+    parser.add_argument('--skip-chatbot', action='store_true', help='do not benchmark the chatbot extractor')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=10.0,
+                        help='allowed regression in percent before failing (default 10)')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    profiles = profile_corpus(args.profiles)
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'iterations': args.iterations,
+            'sizes': sizes,
+            'seed': args.seed,
+        },
+        'benchmarks': {}
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            catalog_file = make_catalog(size, args.seed, workdir)
+            for name, metrics in bench_catalog(catalog_file, profiles, args.iterations).items():
+                results['benchmarks'][f'{name}@{size}'] = metrics
+
+    if not args.skip_chatbot:
+        results['benchmarks']['chatbot'] = bench_chatbot(args.iterations)
+
+    print(f"{'benchmark':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'peak KB':>12}")
+    for name, m in results['benchmarks'].items():
+        print(f"{name:<28}{m['p50_ms']:>10}{m['p95_ms']:>10}{m['p99_ms']:>10}{m['throughput_per_s']:>12}{m['peak_memory_kb']:>12}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print(f'\n{len(regressions)} metric(s) regressed by more than {args.max_regression}%:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print(f'\nNo regressions above {args.max_regression}% compared to {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# Offline bulk scoring of student profiles
+#
+# Usage:
+#   python bulk_score.py students.csv results.csv --workers 8 --top-n 10
+#   python bulk_score.py students.ndjson results.ndjson --catalog ../data/colleges_100k.ndjson
+#
+# Input profiles (CSV with a header row, or NDJSON) are read in chunks and
+# scored across a process pool. Each worker loads the catalog once (with the
+# fork start method it is shared copy-on-write). Results are written in input
+# order as CSV (one row per recommendation) or NDJSON (one line per student).
+# After every chunk a checkpoint is saved next to the output, so a killed job
+# started again with the same arguments resumes where it stopped.
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+from ml_recommender import CollegeRecommender
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(__file__), '..', 'data', 'colleges.json')
+RESULT_FIELDS = ['name', 'location', 'combined_score', 'similarity_score', 'confidence_score']
+CSV_COLUMNS = ['student_id', 'rank', 'college_id'] + RESULT_FIELDS
+
+_recommender = None
+
+
+def _init_worker(catalog_file: str):
+    # Load the catalog once per worker process (forked workers inherit the parent's copy)
+    global _recommender
+    if _recommender is None:
+        _recommender = CollegeRecommender(catalog_file)
+
+
+def _score_chunk(args) -> List[Dict]:
+    # Top-N for every profile of one chunk
+    profiles, top_n = args
+    results = []
+    for student_id, profile in profiles:
+        try:
+            recommendations = _recommender.recommend(profile, top_n=top_n, fields=RESULT_FIELDS, explain=False)
+            results.append({'student_id': student_id, 'recommendations': recommendations})
+        except Exception as e:
+            results.append({'student_id': student_id, 'error': str(e), 'recommendations': []})
+    return results
+
+
+def read_profiles(path: str) -> Iterator:
+    # (student_id, profile) pairs from a CSV or NDJSON file
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, row in enumerate(rows, 1):
+            student_id = row.pop('student_id', None) or row.pop('id', None) or number
+            yield student_id, row
+
+
+def chunked(items: Iterator, size: int) -> Iterator[List]:
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Checkpoint:
+    # Progress of a job: chunks finished and how many output bytes belong to them
+    def __init__(self, path: str, job: Dict):
+        self.path = path
+        self.job = job
+        self.chunks_done = 0
+        self.profiles_done = 0
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        # Resume state from disk; False if there is none or it belongs to another job
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('job') != self.job:
+            raise SystemExit(f'Checkpoint {self.path} belongs to a different job; delete it to start over')
+        self.chunks_done = state['chunks_done']
+        self.profiles_done = state['profiles_done']
+        self.output_bytes = state['output_bytes']
+        return True
+
+    def save(self):
+        # Write atomically so a kill never leaves a half-written checkpoint
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'job': self.job, 'chunks_done': self.chunks_done, 'profiles_done': self.profiles_done,
+                       'output_bytes': self.output_bytes, 'updated': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+        os.replace(tmp, self.path)
+
+
+def format_results(results: List[Dict], fmt: str) -> str:
+    # Serialise one chunk of results
+    lines = []
+    if fmt == 'ndjson':
+        for result in results:
+            lines.append(json.dumps(result, separators=(',', ':')) + '\n')
+        return ''.join(lines)
+
+    rows = []
+    for result in results:
+        for rank, rec in enumerate(result['recommendations'], 1):
+            rows.append([result['student_id'], rank, rec['id']] + [rec.get(f, '') for f in RESULT_FIELDS])
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a file of student profiles against the college catalog')
+    parser.add_argument('input', help='profiles as CSV (with header) or NDJSON')
+    parser.add_argument('output', help='results file (.csv or .ndjson)')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG, help='college catalog (.json or .ndjson)')
+    parser.add_argument('--top-n', type=int, default=5, help='recommendations per student')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--chunk-size', type=int, default=500, help='profiles per chunk')
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint and start over')
+    args = parser.parse_args()
+
+    fmt = 'ndjson' if args.output.endswith(('.ndjson', '.jsonl')) else 'csv'
+    job = {'input': os.path.abspath(args.input), 'catalog': os.path.abspath(args.catalog),
+           'top_n': args.top_n, 'chunk_size': args.chunk_size, 'format': fmt}
+    checkpoint = Checkpoint(args.output + '.checkpoint', job)
+
+    resumed = not args.restart and checkpoint.load()
+    if resumed:
+        # Drop anything written after the last checkpoint
+        with open(args.output, 'r+b') as f:
+            f.truncate(checkpoint.output_bytes)
+        print(f'Resuming after {checkpoint.profiles_done} profiles ({checkpoint.chunks_done} chunks)')
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            if fmt == 'csv':
+                csv.writer(f).writerow(CSV_COLUMNS)
+        checkpoint.output_bytes = os.path.getsize(args.output)
+        checkpoint.save()
+
+    profiles = read_profiles(args.input)
+    chunks = chunked(itertools.islice(profiles, checkpoint.profiles_done, None), args.chunk_size)
+    tasks = ((chunk, args.top_n) for chunk in chunks)
+
+    if multiprocessing.get_start_method() == 'fork':
+        # Build the catalog once here so every worker shares it copy-on-write
+        _init_worker(args.catalog)
+
+    started = time.time()
+    scored = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.catalog,)) as pool, \
+            open(args.output, 'ab') as out:
+        pending = deque()
+
+        def drain(keep: int):
+            # Write finished chunks in input order until at most `keep` are in flight
+            nonlocal scored
+            while len(pending) > keep:
+                count, future = pending.popleft()
+                out.write(format_results(future.result(), fmt).encode('utf-8'))
+                out.flush()
+                os.fsync(out.fileno())
+
+                checkpoint.chunks_done += 1
+                checkpoint.profiles_done += count
+                checkpoint.output_bytes = out.tell()
+                checkpoint.save()
+
+                scored += count
+                rate = scored / max(time.time() - started, 1e-9)
+                print(f'\r{checkpoint.profiles_done} profiles scored ({rate:.0f}/s)', end='', file=sys.stderr)
+
+        for task in tasks:
+            pending.append((len(task[0]), pool.submit(_score_chunk, task)))
+            drain(args.workers * 2)
+        drain(0)
+
+    elapsed = time.time() - started
+    print(f'\nDone: {scored} profiles in {elapsed:.1f}s with {args.workers} workers -> {args.output}')
+    os.remove(checkpoint.path)
+
+
+if __name__ == '__main__':
+    main()
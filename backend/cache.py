@@ -0,0 +1,93 @@
+# Small thread-safe LRU cache with hit/miss counters
+#
+# Every cache registers itself so its stats show up in /api/metrics.
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List
+
+import metrics
+
+_MISSING = object()
+_caches = weakref.WeakSet()
+
+
+class LRUCache:
+    def __init__(self, name: str, maxsize: int = 1024):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        # Cached value for key, computing and storing it on a miss
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def registered() -> List[LRUCache]:
+    # Every live cache
+    return list(_caches)
+
+
+def _series(stat: str):
+    # Gauge callback summing one stat over all live caches with the same name
+    def collect():
+        values = {}
+        for c in registered():
+            key = (('cache', c.name),)
+            values[key] = values.get(key, 0) + c.stats()[stat]
+        return values
+    return collect
+
+
+metrics.register_gauge('cache_entries', 'Entries held per cache', _series('size'))
+metrics.register_gauge('cache_hits', 'Cache hits since start', _series('hits'))
+metrics.register_gauge('cache_misses', 'Cache misses since start', _series('misses'))
+metrics.register_gauge('cache_evictions', 'Cache evictions since start', _series('evictions'))
@@ -0,0 +1,64 @@
+# Catalog versions and per-college change records for delta sync
+#
+# Every admin edit bumps the catalog version and records which college it
+# touched. A client that cached the catalog at some version asks for the
+# changes since then and gets only the added, changed and deleted colleges.
+#
+# Version tokens look like "<epoch>.<n>". The epoch is new for every process:
+# admin edits are not written back to the catalog file, so a restarted server
+# may hold a different catalog under the same numbers. Only the latest
+# CHANGE_LOG_SIZE changes are kept; a token from another epoch, or older than
+# the log, means the client has to resync the whole catalog.
+
+import secrets
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+CHANGE_LOG_SIZE = 10000
+
+
+class ChangeLog:
+    def __init__(self, capacity: int = CHANGE_LOG_SIZE):
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self._changes = deque(maxlen=capacity)   # (version, college id, 'add' | 'update' | 'delete')
+        self._lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        return f'{self.epoch}.{self.version}'
+
+    def record(self, college_id: int, operation: str):
+        # One edit: the catalog moves to the next version
+        with self._lock:
+            self.version += 1
+            self._changes.append((self.version, college_id, operation))
+
+    def since(self, token: Optional[str]) -> Tuple[str, Optional[Dict[int, str]]]:
+        # (current token, {college id: 'added' | 'changed' | 'deleted'} after `token`); the
+        # changes are None when the token cannot be served from the log
+        epoch, _, number = (token or '').partition('.')
+        with self._lock:
+            current = self.token
+            if epoch != self.epoch or not number.isdigit() or int(number) > self.version:
+                return current, None
+            version = int(number)
+            if self._changes and version < self._changes[0][0] - 1:
+                return current, None
+            changes = [(college_id, operation) for v, college_id, operation in self._changes if v > version]
+
+        # Fold each college's edits into what the client has to do with its copy
+        status = {}
+        for college_id, operation in changes:
+            before = status.get(college_id)
+            if operation == 'delete':
+                if before == 'added':
+                    del status[college_id]   # never seen by the client
+                else:
+                    status[college_id] = 'deleted'
+            elif before is None:
+                status[college_id] = 'added' if operation == 'add' else 'changed'
+            elif before == 'deleted':
+                status[college_id] = 'changed'   # id reused after a delete
+        return current, status
@@ -0,0 +1,176 @@
+# Catalog compiler: deduplicated colleges with canonical program names
+#
+# Usage:
+#   python catalog_compiler.py ../data/colleges.json ../data/colleges.compiled.json
+#
+# The raw catalog has duplicate entries (the same college listed twice) and
+# the same program under several names ("CSIT" / "BSc CSIT", "BE Civil" /
+# "Civil Engineering"). Compiling:
+#   - merges colleges with the same normalised name and location; the first
+#     entry wins and later ids become aliases of it
+#   - maps every program through SYNONYMS to one canonical name, whose
+#     integer id is its position in the sorted program list
+#   - emits the vocabulary the recommender builds its feature vectors from
+# CollegeRecommender compiles raw catalogs on load, and loads compiled ones as they are.
+
+import argparse
+import json
+import re
+import sys
+from typing import Dict, List
+
+COMPILED_FORMAT = 'compiled-catalog'
+COMPILED_VERSION = 1
+
+# Normalised program name -> canonical program name
+SYNONYMS = {
+    'csit': 'BSc CSIT',
+    'bsc csit': 'BSc CSIT',
+    'be civil': 'Civil Engineering',
+    'civil': 'Civil Engineering',
+    'be computer': 'Computer Engineering',
+    'computer engineering': 'Computer Engineering',
+    'be software': 'Software Engineering',
+    'be it': 'IT Engineering',
+    'it': 'Information Technology',
+    'information technology': 'Information Technology',
+    'b pharmacy': 'B Pharmacy',
+    'b pharm': 'B Pharmacy',
+    'bpharm': 'B Pharmacy',
+    'pharmacy': 'B Pharmacy',
+    'b optom': 'B.Optom',
+    'btech food': 'BTech Food Technology',
+    'ba major english': 'BA English',
+    'bachelor of business administration': 'BBA',
+    'bachelor of business studies': 'BBS',
+    'bachelor of computer application': 'BCA',
+    'bachelor of computer applications': 'BCA',
+}
+
+# Fields merged (as ordered unions) when duplicate colleges are combined
+MERGED_FIELDS = ('programs', 'streams', 'career_focus', 'interests', 'facilities')
+# Fields whose values repeat across colleges (and catalogs); their strings are interned on load
+VOCABULARY_FIELDS = ('location', 'budget_range', 'type') + MERGED_FIELDS
+
+
+def normalize(text: str) -> str:
+    # Lowercase, drop punctuation and collapse whitespace
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).split())
+
+
+def canonical_program(name: str) -> str:
+    # Canonical spelling of a program name
+    return SYNONYMS.get(normalize(name), str(name).strip())
+
+
+def college_key(college: Dict) -> str:
+    # Colleges with the same key are the same institution
+    return f"{normalize(college['name'])}|{normalize(college['location'])}"
+
+
+def _ordered_union(first: List, second: List) -> List:
+    seen = set(first)
+    return list(first) + [v for v in second if not (v in seen or seen.add(v))]
+
+
+def is_compiled(data) -> bool:
+    return isinstance(data, dict) and data.get('format') == COMPILED_FORMAT
+
+
+def compile_catalog(colleges: List[Dict]) -> Dict:
+    # Raw list of colleges -> compiled catalog
+    merged = {}      # key -> college
+    aliases = {}     # duplicate id -> kept id
+    for college in colleges:
+        college = dict(college)
+        programs = []
+        for program in college.get('programs', []):
+            canonical = canonical_program(program)
+            if canonical not in programs:
+                programs.append(canonical)
+        college['programs'] = programs
+
+        key = college_key(college)
+        kept = merged.get(key)
+        if kept is None:
+            merged[key] = college
+            continue
+        aliases[college['id']] = kept['id']
+        for field in MERGED_FIELDS:
+            if field in college:
+                kept[field] = _ordered_union(kept.get(field, []), college[field])
+
+    compiled_colleges = list(merged.values())
+    programs = sorted({p for c in compiled_colleges for p in c['programs']})
+    return {
+        'format': COMPILED_FORMAT,
+        'version': COMPILED_VERSION,
+        'colleges': compiled_colleges,
+        'programs': programs,
+        'vocabulary': {
+            'programs': programs,
+            'streams': sorted({s for c in compiled_colleges for s in c['streams']}),
+            'locations': sorted({c['location'] for c in compiled_colleges}),
+            'budget_ranges': sorted({c['budget_range'] for c in compiled_colleges}),
+            'career_focus': sorted({f for c in compiled_colleges for f in c.get('career_focus', [])}),
+            'interests': sorted({i for c in compiled_colleges for i in c.get('interests', [])}),
+        },
+        'aliases': aliases,
+        'stats': {
+            'input_colleges': len(colleges),
+            'colleges': len(compiled_colleges),
+            'duplicates_merged': len(aliases),
+            'programs': len(programs),
+            'raw_program_names': len({p for c in colleges for p in c.get('programs', [])}),
+        },
+    }
+
+
+def intern_vocabulary(catalog: Dict) -> Dict:
+    # Replace the vocabulary strings of a compiled catalog with interned ones, so every
+    # college and every catalog loaded in the process shares one copy of each value
+    for college in catalog['colleges']:
+        for field in VOCABULARY_FIELDS:
+            value = college.get(field)
+            if isinstance(value, str):
+                college[field] = sys.intern(value)
+            elif isinstance(value, list):
+                college[field] = [sys.intern(v) if isinstance(v, str) else v for v in value]
+    vocabulary = catalog['vocabulary']
+    for field, values in vocabulary.items():
+        vocabulary[field] = [sys.intern(v) for v in values]
+    return catalog
+
+
+def load_compiled(data) -> Dict:
+    # Compiled catalog from either raw or already compiled JSON data, with interned vocabulary
+    if is_compiled(data):
+        # JSON object keys are strings; alias ids are ints
+        data['aliases'] = {int(k): v for k, v in data.get('aliases', {}).items()}
+        return intern_vocabulary(data)
+    return intern_vocabulary(compile_catalog(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicate the catalog and canonicalise program names')
+    parser.add_argument('input', help='raw catalog (.json list or .ndjson)')
+    parser.add_argument('output', help='compiled catalog (.json)')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        if args.input.endswith('.ndjson'):
+            colleges = [json.loads(line) for line in f if line.strip()]
+        else:
+            colleges = json.load(f)
+
+    compiled = compile_catalog(colleges)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(compiled, f, separators=(',', ':'))
+
+    stats = compiled['stats']
+    print(f"{stats['input_colleges']} colleges -> {stats['colleges']} ({stats['duplicates_merged']} duplicates merged), "
+          f"{stats['raw_program_names']} program names -> {stats['programs']} canonical programs")
+
+
+if __name__ == '__main__':
+    main()
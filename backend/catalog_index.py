@@ -0,0 +1,298 @@
+# Column and bitmap encoded view of the college catalog
+#
+# Set-valued attributes (programs, streams, facilities) are stored as one
+# integer bitmap per college, with a bit per vocabulary value, so set
+# operations between colleges are single AND/OR operations. Numeric
+# attributes are stored as numpy columns.
+#
+# For search, every facet value also gets a packed bitmap over all colleges
+# (one bit per college). Filters are ORed within a facet and ANDed across
+# facets, and facet counts come from bincounts over value codes.
+#
+# Colleges can be added and deleted: new colleges are appended as new rows
+# (new vocabulary values get the next free id), deleted rows are only cleared
+# from the `live` mask. Packed bitmaps keep spare capacity so appends rarely
+# reallocate them. Rebuilding from the live colleges compacts. An index that
+# requests may be reading is never edited: edits go to a copy(), and add() and
+# delete() replace the arrays they change instead of writing into them (an
+# appended row goes into spare room past the end of a column, see
+# persistent.py). The per-row lists and dicts are persistent containers, so
+# neither a copy nor an added row costs time in proportion to the catalog.
+
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from persistent import ChunkedList, LayeredDict, appended
+
+SET_FIELDS = ('programs', 'streams', 'facilities')
+SINGLE_FIELDS = ('location', 'budget_range', 'type')
+FACET_FIELDS = SINGLE_FIELDS + SET_FIELDS
+
+# Facets with at most this many values are counted by bitmap popcount
+SMALL_FACET = 32
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+BUDGET_ORDER = {'low': 0, 'medium': 1, 'high': 2}
+
+# Spare bitmap capacity added when appended rows run out of room
+MIN_GROWTH = 1024
+
+
+def popcount(bits: int) -> int:
+    # Number of set bits in an integer bitmap
+    return bin(bits).count('1')
+
+
+class CatalogIndex:
+    def __init__(self, colleges: List[Dict]):
+        self.colleges = ChunkedList(colleges)
+        self.row_of = LayeredDict((college['id'], row) for row, college in enumerate(colleges))
+        self.live = np.ones(len(colleges), dtype=bool)
+
+        # Vocabulary per set field; a value's bit is its position in the list
+        self.vocab = {}
+        self.bit_of = {}
+        self.row_bits = {}
+        for field in SET_FIELDS:
+            values = sorted({v for college in colleges for v in college.get(field, [])})
+            bit_of = {v: i for i, v in enumerate(values)}
+            self.vocab[field] = values
+            self.bit_of[field] = bit_of
+            self.row_bits[field] = ChunkedList(self._encode(bit_of, college.get(field, [])) for college in colleges)
+
+        self.min_gpa = np.array([college['min_gpa'] for college in colleges], dtype=np.float64)
+        self.budget = np.array([BUDGET_ORDER.get(college['budget_range'], -1) for college in colleges], dtype=np.int8)
+        self.established = np.array([college.get('established') or 0 for college in colleges], dtype=np.int32)
+
+        self._build_facets()
+
+    def _build_facets(self):
+        # Value codes and per-value packed bitmaps for every facet field
+        n = len(self.colleges)
+        self.size = n
+        self.capacity = (n + 7) // 8 * 8
+        self._all_rows = None
+        self.codes = {}          # single field -> value id per college
+        self.entry_rows = {}     # set field -> college row per (college, value) entry
+        self.entry_values = {}   # set field -> value id per entry
+        self.bitmaps = {}        # field -> list of packed bitmaps, indexed by value id
+        self.lookup = {}         # field -> {lowercased value: value id}
+
+        for field in SINGLE_FIELDS:
+            values = sorted({college.get(field) or '' for college in self.colleges})
+            value_id = {v: i for i, v in enumerate(values)}
+            codes = np.array([value_id[college.get(field) or ''] for college in self.colleges], dtype=np.int32)
+            self.vocab[field] = values
+            self.bit_of[field] = value_id
+            self.codes[field] = codes
+            self.bitmaps[field] = [self.pack(codes == i) for i in range(len(values))]
+
+        for field in SET_FIELDS:
+            bit_of = self.bit_of[field]
+            rows, ids = [], []
+            for row, college in enumerate(self.colleges):
+                for value in dict.fromkeys(college.get(field, [])):
+                    rows.append(row)
+                    ids.append(bit_of[value])
+            entry_rows = np.array(rows, dtype=np.int32)
+            entry_values = np.array(ids, dtype=np.int32)
+            self.entry_rows[field] = entry_rows
+            self.entry_values[field] = entry_values
+
+            # Group entries by value once instead of scanning them per value
+            order = np.argsort(entry_values, kind='stable')
+            bounds = np.searchsorted(entry_values[order], np.arange(len(self.vocab[field]) + 1))
+            bitmaps = []
+            for i in range(len(self.vocab[field])):
+                mask = np.zeros(n, dtype=bool)
+                mask[entry_rows[order[bounds[i]:bounds[i + 1]]]] = True
+                bitmaps.append(self.pack(mask))
+            self.bitmaps[field] = bitmaps
+
+        for field in FACET_FIELDS:
+            self.lookup[field] = {str(v).lower(): i for i, v in enumerate(self.vocab[field])}
+
+    def pack(self, mask: np.ndarray) -> np.ndarray:
+        # Boolean mask over colleges -> packed bitmap padded to the current capacity
+        packed = np.zeros(self.capacity // 8, dtype=np.uint8)
+        bits = np.packbits(mask)
+        packed[:len(bits)] = bits
+        return packed
+
+    def all_rows(self) -> np.ndarray:
+        # Packed bitmap with every live college set
+        if self._all_rows is None:
+            self._all_rows = self.pack(self.live)
+        return self._all_rows.copy()
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        # Packed bitmap -> boolean mask over colleges
+        return np.unpackbits(packed, count=self.size).view(bool)
+
+    def filter_bitmap(self, field: str, values: List[str]) -> np.ndarray:
+        # OR of the bitmaps of the given values (unknown values match nothing)
+        result = np.zeros(self.capacity // 8, dtype=np.uint8)
+        lookup = self.lookup[field]
+        for value in values:
+            value_id = lookup.get(str(value).strip().lower())
+            if value_id is not None:
+                result |= self.bitmaps[field][value_id]
+        return result
+
+    def bitmap_for_bits(self, field: str, bits: int) -> np.ndarray:
+        # OR of the bitmaps of the value ids set in an integer bitmask
+        result = np.zeros(self.capacity // 8, dtype=np.uint8)
+        bitmaps = self.bitmaps[field]
+        while bits:
+            lowest = bits & -bits
+            result |= bitmaps[lowest.bit_length() - 1]
+            bits ^= lowest
+        return result
+
+    def facet_counts(self, field: str, packed: np.ndarray, mask: np.ndarray) -> Dict[str, int]:
+        # Number of matching colleges per value of a facet field
+        vocab = self.vocab[field]
+        if len(vocab) <= SMALL_FACET:
+            # Few values: popcount of each value bitmap ANDed with the packed mask
+            counts = np.array([int(POPCOUNT[bitmap & packed].sum()) for bitmap in self.bitmaps[field]], dtype=np.int64)
+        elif field in SINGLE_FIELDS:
+            # Weighted bincount avoids materialising the filtered code arrays
+            counts = np.bincount(self.codes[field], weights=mask, minlength=len(vocab)).astype(np.int64)
+        else:
+            counts = np.bincount(self.entry_values[field], weights=mask[self.entry_rows[field]],
+                                 minlength=len(vocab)).astype(np.int64)
+        nonzero = np.flatnonzero(counts)
+        ordered = nonzero[np.lexsort((nonzero, -counts[nonzero]))]
+        return {vocab[i]: int(counts[i]) for i in ordered}
+
+    def search(self, filters: Dict[str, List[str]], gpa_range: Tuple[Optional[float], Optional[float]] = (None, None),
+               base_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict[str, Dict[str, int]]]:
+        # Matching rows plus per-facet counts. Counts for a facet ignore that facet's own
+        # filter so the client can show how many results each alternative value would give.
+        # base_mask (e.g. full-text matches) restricts everything, counts included.
+        selections = {field: self.filter_bitmap(field, values) for field, values in filters.items() if values}
+
+        low, high = gpa_range
+        if low is not None or high is not None or base_mask is not None:
+            mask = self.live.copy() if base_mask is None else base_mask & self.live
+            if low is not None:
+                mask &= self.min_gpa >= low
+            if high is not None:
+                mask &= self.min_gpa <= high
+            base = self.pack(mask)
+        else:
+            base = self.all_rows()
+
+        matched = base.copy()
+        for bitmap in selections.values():
+            matched &= bitmap
+        matched_mask = self.unpack(matched)
+
+        facets = {}
+        for field in FACET_FIELDS:
+            if field in selections:
+                others = base.copy()
+                for other, bitmap in selections.items():
+                    if other != field:
+                        others &= bitmap
+                facets[field] = self.facet_counts(field, others, self.unpack(others))
+            else:
+                facets[field] = self.facet_counts(field, matched, matched_mask)
+
+        return np.flatnonzero(matched_mask), facets
+
+    def add(self, college: Dict) -> int:
+        # Append a college as a new row; values not seen before extend the vocabulary
+        row = self.size
+        if row >= self.capacity:
+            self._grow(max(MIN_GROWTH, self.capacity // 4))
+        byte, bit = row >> 3, np.uint8(0x80 >> (row & 7))
+
+        self.colleges.append(college)
+        self.row_of[college['id']] = row
+        for field in SET_FIELDS:
+            ids = [self._value_id(field, value) for value in dict.fromkeys(college.get(field, []))]
+            self.row_bits[field].append(self._encode(self.bit_of[field], college.get(field, [])))
+            self.entry_rows[field] = appended(self.entry_rows[field], np.full(len(ids), row, dtype=np.int32))
+            self.entry_values[field] = appended(self.entry_values[field], ids)
+            for value_id in ids:
+                self._set_bit(field, value_id, byte, bit)
+        for field in SINGLE_FIELDS:
+            value_id = self._value_id(field, college.get(field) or '')
+            self.codes[field] = appended(self.codes[field], value_id)
+            self._set_bit(field, value_id, byte, bit)
+
+        self.min_gpa = appended(self.min_gpa, float(college['min_gpa']))
+        self.budget = appended(self.budget, BUDGET_ORDER.get(college['budget_range'], -1))
+        self.established = appended(self.established, college.get('established') or 0)
+        self.live = appended(self.live, True)
+        self.size += 1
+        self._all_rows = None
+        return row
+
+    def delete(self, row: int):
+        # Drop a row from every result; its storage is reclaimed by the next rebuild
+        self.row_of.pop(self.colleges[row]['id'], None)
+        live = self.live.copy()
+        live[row] = False
+        self.live = live
+        self._all_rows = None
+
+    def copy(self) -> 'CatalogIndex':
+        # An index to edit while this one keeps serving: the arrays are shared (edits replace
+        # them), the lists and dicts edits change are copied (per-row ones copy on write)
+        index = object.__new__(CatalogIndex)
+        index.__dict__.update(self.__dict__)
+        index.colleges = self.colleges.copy()
+        index.row_of = self.row_of.copy()
+        for name in ('vocab', 'bit_of', 'lookup', 'row_bits', 'bitmaps'):
+            setattr(index, name, {field: copy.copy(value) for field, value in getattr(self, name).items()})
+        for name in ('codes', 'entry_rows', 'entry_values'):
+            setattr(index, name, dict(getattr(self, name)))
+        return index
+
+    def _set_bit(self, field: str, value_id: int, byte: int, bit: np.uint8):
+        # Set a row's bit in a value bitmap (on a new copy of it)
+        bitmap = self.bitmaps[field][value_id].copy()
+        bitmap[byte] |= bit
+        self.bitmaps[field][value_id] = bitmap
+
+    def _value_id(self, field: str, value: str) -> int:
+        # Id of a vocabulary value, appending it (with an empty bitmap) if it is new
+        value_id = self.bit_of[field].get(value)
+        if value_id is None:
+            value_id = len(self.vocab[field])
+            self.vocab[field].append(value)
+            self.bit_of[field][value] = value_id
+            self.lookup[field].setdefault(str(value).lower(), value_id)
+            self.bitmaps[field].append(np.zeros(self.capacity // 8, dtype=np.uint8))
+        return value_id
+
+    def _grow(self, rows: int):
+        # Widen every packed bitmap by `rows` (rounded up to whole bytes)
+        extra = np.zeros((rows + 7) // 8, dtype=np.uint8)
+        self.capacity += len(extra) * 8
+        for field in FACET_FIELDS:
+            self.bitmaps[field] = [np.concatenate((bitmap, extra)) for bitmap in self.bitmaps[field]]
+
+    @staticmethod
+    def _encode(bit_of: Dict[str, int], values: List[str]) -> int:
+        bits = 0
+        for value in values:
+            bits |= 1 << bit_of[value]
+        return bits
+
+    def decode(self, field: str, bits: int) -> List[str]:
+        # Values of a field whose bits are set, in vocabulary order
+        vocab = self.vocab[field]
+        values = []
+        while bits:
+            lowest = bits & -bits
+            values.append(vocab[lowest.bit_length() - 1])
+            bits ^= lowest
+        return values
+
+    def rows_for_ids(self, college_ids: List[int]) -> List[int]:
+        # Catalog rows for the given ids in catalog order, unknown ids skipped
+        return sorted({self.row_of[cid] for cid in college_ids if cid in self.row_of})
@@ -0,0 +1,162 @@
+# Several catalogs served from one process
+#
+# Catalogs are addressed by id: "default" is data/colleges.json and every
+# .json / .ndjson file in CATALOG_DIR is a catalog named after the file (for
+# example 2025.json or masters.ndjson). Each one gets its own recommender,
+# with its own indexes, caches, statistics and change log. A catalog is built
+# the first time a request asks for it; requests for a catalog that is still
+# loading wait for that build instead of starting another one.
+#
+# The catalog structures (records, vocabulary, matrices, indexes) of every
+# loaded catalog are measured after loading (see memory.py). When they add up
+# to more than CATALOG_MEMORY_MB, the least recently used catalogs are dropped
+# until the rest fit; the default catalog is never dropped. A dropped catalog
+# is rebuilt from its file when it is next used, so admin edits made to it
+# are lost, as they are when the server restarts.
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+import memory
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG = 'default'
+CATALOG_EXTENSIONS = ('.json', '.ndjson')
+
+
+class Catalog:
+    # One loaded catalog: its recommender, the engine answering /api/recommend and the shadow runner
+    def __init__(self, catalog_id: str, recommender, scoring_engine, shadow=None):
+        self.id = catalog_id
+        self.recommender = recommender
+        self.scoring_engine = scoring_engine
+        self.shadow = shadow
+        self.loaded_at = time.time()
+        self.size_bytes = 0
+
+    def measure(self) -> int:
+        # Bytes held by the catalog structures (caches are bounded and left out)
+        recommender = self.recommender
+        report = memory.report(recommender.memory_parts(), top=0, stable=recommender.CATALOG_SUBSYSTEMS,
+                               version=recommender.memory_version())
+        self.size_bytes = sum(report['subsystems'][name]['bytes'] for name in recommender.CATALOG_SUBSYSTEMS)
+        return self.size_bytes
+
+    def close(self):
+        if self.shadow is not None:
+            self.shadow.close()
+
+
+def catalog_paths(default_file: str, directory: str = '') -> Dict[str, str]:
+    # Catalog id -> file: the default catalog plus every catalog file in `directory`
+    paths = {DEFAULT_CATALOG: default_file}
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(name)
+            if extension in CATALOG_EXTENSIONS and stem != DEFAULT_CATALOG:
+                paths[stem] = os.path.join(directory, name)
+    return paths
+
+
+class CatalogManager:
+    def __init__(self, paths: Dict[str, str], build: Callable[[str, str], Catalog], budget_bytes: int):
+        self.paths = paths
+        self.budget_bytes = budget_bytes
+        self._build = build               # (catalog id, file) -> Catalog
+        self._loaded = OrderedDict()      # catalog id -> Catalog, least recently used first
+        self._building = {}               # catalog id -> lock held while it is built
+        self._lock = threading.Lock()
+
+    def add(self, catalog: Catalog):
+        # Serve an already built catalog (the default one, built at startup)
+        catalog.measure()
+        with self._lock:
+            self._loaded[catalog.id] = catalog
+            evicted = self._evict(catalog.id)
+        self._close(evicted)
+
+    def get(self, catalog_id: str) -> Catalog:
+        # The catalog with this id, built on first use; KeyError for unknown ids
+        catalog = self._touch(catalog_id)
+        if catalog is not None:
+            return catalog
+        if catalog_id not in self.paths:
+            raise KeyError(catalog_id)
+        with self._lock:
+            building = self._building.setdefault(catalog_id, threading.Lock())
+        with building:
+            catalog = self._touch(catalog_id)
+            if catalog is not None:
+                return catalog
+            start = time.perf_counter()
+            try:
+                catalog = self._build(catalog_id, self.paths[catalog_id])
+                catalog.measure()
+                with self._lock:
+                    self._loaded[catalog.id] = catalog
+                    evicted = self._evict(catalog.id)
+            finally:
+                # Only once the catalog is served: requests arriving until then wait on this lock
+                with self._lock:
+                    self._building.pop(catalog_id, None)
+        seconds = time.perf_counter() - start
+        metrics.observe('catalog_load_seconds', seconds, 'Time to build a catalog on first use', catalog=catalog_id)
+        logger.info('loaded catalog %s in %.2fs (%.1f MB)', catalog_id, seconds, catalog.size_bytes / 2**20)
+        self._close(evicted)
+        return catalog
+
+    def _touch(self, catalog_id: str):
+        with self._lock:
+            catalog = self._loaded.get(catalog_id)
+            if catalog is not None:
+                self._loaded.move_to_end(catalog_id)
+            return catalog
+
+    def _evict(self, keep: str) -> List[Catalog]:
+        # Drop least recently used catalogs until the loaded ones fit the budget (lock held)
+        evicted = []
+        if self.budget_bytes <= 0:
+            return evicted
+        for catalog_id in list(self._loaded):
+            if self.loaded_bytes() <= self.budget_bytes:
+                break
+            if catalog_id not in (keep, DEFAULT_CATALOG):
+                evicted.append(self._loaded.pop(catalog_id))
+        return evicted
+
+    def _close(self, evicted: List[Catalog]):
+        for catalog in evicted:
+            catalog.close()
+            metrics.inc('catalog_evictions', 'Catalogs dropped to stay within the memory budget', catalog=catalog.id)
+            logger.info('evicted catalog %s (%.1f MB)', catalog.id, catalog.size_bytes / 2**20)
+
+    def loaded_bytes(self) -> int:
+        return sum(catalog.size_bytes for catalog in list(self._loaded.values()))
+
+    def status(self) -> List[Dict]:
+        # Every known catalog, loaded or not, in id order
+        with self._lock:
+            loaded = dict(self._loaded)
+        catalogs = []
+        for catalog_id in sorted(self.paths):
+            catalog = loaded.get(catalog_id)
+            entry = {'id': catalog_id, 'loaded': catalog is not None}
+            if catalog is not None:
+                entry.update({'colleges': catalog.recommender.snapshot.count, 'size_bytes': catalog.size_bytes,
+                              'loaded_at': catalog.loaded_at})
+            catalogs.append(entry)
+        return catalogs
+
+    def per_catalog(self, value: Callable[[Catalog], float]) -> Callable[[], Dict]:
+        # Gauge callback: value(catalog) for every loaded catalog, labelled with its id
+        return lambda: {(('catalog', c.id),): value(c) for c in list(self._loaded.values())}
+
+    def memory_bytes(self) -> Dict:
+        # Gauge callback: measured bytes per loaded catalog
+        return self.per_catalog(lambda c: c.size_bytes)()
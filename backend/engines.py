@@ -0,0 +1,261 @@
+# Scoring engine registry and shadow-mode comparison
+#
+# /api/recommend scores with the engine named by PRIMARY_ENGINE (default
+# "vectorized", the ml_recommender engine that also serves search, compare,
+# what-if and the admin API). With SHADOW_ENGINE set, a sampled fraction of
+# recommend requests (SHADOW_SAMPLE_RATE, default 0.05) is replayed against
+# that engine on a background thread, off the request path, and its ranking
+# is compared with the one the client got: top-k Jaccard overlap, Spearman
+# rank correlation and the latency difference. Comparisons go to the log and
+# /api/metrics, and a running summary to /api/debug/shadow. When more than
+# SHADOW_QUEUE comparisons are waiting, new ones are dropped instead.
+#
+# "legacy" is the original per-college engine in ml_recommender_backup.py. It
+# scores the compiled records the main engine loaded (deduplicated, program
+# names canonicalized), so the comparison measures scoring and not input
+# differences. It keeps the records as they were at startup: catalog edits
+# made through the admin API do not reach it.
+#
+# Shadow scoring runs with metrics muted, so a shadow "vectorized" engine does
+# not add its stage timings and counters to those of the requests served.
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import metrics
+from json_fragments import dumps
+from ml_recommender_backup import CollegeRecommender as LegacyRecommender
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets for overlap ratios, rank correlations and latency differences (seconds)
+RATIO_BUCKETS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0]
+CORRELATION_BUCKETS = [-1.0, -0.5, 0.0, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0]
+DELTA_BUCKETS = [-1.0, -0.1, -0.025, -0.005, -0.001, 0.0, 0.001, 0.005, 0.025, 0.1, 1.0]
+
+# Engine name -> factory(recommender) returning the engine
+ENGINES: Dict[str, Callable] = {}
+
+
+def register(name: str):
+    # Decorator adding an engine factory to the registry
+    def add(factory: Callable) -> Callable:
+        ENGINES[name] = factory
+        return factory
+    return add
+
+
+def create(name: str, recommender):
+    # Engine by registry name; recommender is the main (vectorized) engine
+    factory = ENGINES.get(name)
+    if factory is None:
+        raise ValueError(f'Unknown scoring engine {name!r} (known: {", ".join(sorted(ENGINES))})')
+    return factory(recommender)
+
+
+class VectorizedEngine:
+    # The main recommender (ml_recommender.py), with every request option
+    name = 'vectorized'
+
+    def __init__(self, recommender):
+        self.recommender = recommender
+
+    def recommend(self, user_profile: Dict, top_n: int = 5, fields: Optional[List[str]] = None,
+                  explain: bool = True, encoded: bool = False, diversity: Optional[float] = None) -> List:
+        return self.recommender.recommend(user_profile, top_n=top_n, fields=fields, explain=explain,
+                                          encoded=encoded, diversity=diversity)
+
+    def rank(self, user_profile: Dict, top_n: int) -> List[int]:
+        # Ids of the top colleges, best first
+        results = self.recommender.recommend(user_profile, top_n=top_n, fields=['id'], explain=False)
+        return [college['id'] for college in results]
+
+
+class LegacyEngine:
+    # The original engine (ml_recommender_backup.py): one Python loop per college, no diversity
+    name = 'legacy'
+
+    def __init__(self, colleges: List[Dict]):
+        self.recommender = LegacyRecommender(colleges=colleges)
+
+    def recommend(self, user_profile: Dict, top_n: int = 5, fields: Optional[List[str]] = None,
+                  explain: bool = True, encoded: bool = False, diversity: Optional[float] = None) -> List:
+        if diversity:
+            raise ValueError('The legacy engine does not support diversified ranking')
+        results = self.recommender.recommend(dict(user_profile), top_n)
+        if fields is not None:
+            results = [{k: college[k] for k in ['id'] + fields if k in college} for college in results]
+        elif not explain:
+            for college in results:
+                college.pop('explanation', None)
+        return [dumps(college) for college in results] if encoded else results
+
+    def rank(self, user_profile: Dict, top_n: int) -> List[int]:
+        return [college['id'] for college in self.recommender.recommend(dict(user_profile), top_n)]
+
+
+@register('vectorized')
+def _vectorized(recommender) -> VectorizedEngine:
+    return VectorizedEngine(recommender)
+
+
+@register('legacy')
+def _legacy(recommender) -> LegacyEngine:
+    # Snapshots are never edited in place, so the records can be shared
+    return LegacyEngine(recommender.snapshot.colleges)
+
+
+def jaccard(a: List, b: List) -> float:
+    # Overlap of two top-k lists as sets (two empty lists agree)
+    union = set(a) | set(b)
+    return len(set(a) & set(b)) / len(union) if union else 1.0
+
+
+def rank_correlation(a: List, b: List) -> Optional[float]:
+    # Spearman correlation of two rankings over the union of their items; an item missing
+    # from a list ranks just below its end. None when either ranking has no spread.
+    if a == b:
+        return 1.0
+    union = list(dict.fromkeys(a + b))
+    position_a = {item: i for i, item in enumerate(a)}
+    position_b = {item: i for i, item in enumerate(b)}
+    ranks_a = np.array([position_a.get(item, len(a)) for item in union], dtype=np.float64)
+    ranks_b = np.array([position_b.get(item, len(b)) for item in union], dtype=np.float64)
+    if ranks_a.std() == 0 or ranks_b.std() == 0:
+        return None
+    return float(np.corrcoef(ranks_a, ranks_b)[0, 1])
+
+
+def _result_id(result) -> int:
+    # College id of one recommendation (a dict, or JSON bytes from encoded=True)
+    if isinstance(result, (bytes, bytearray)):
+        result = json.loads(result)
+    return result['id']
+
+
+class ShadowRunner:
+    # Replays sampled requests against a shadow engine on a worker thread
+    def __init__(self, engine, primary_name: str, sample_rate: float = 0.05, max_queue: int = 100,
+                 recent: int = 50):
+        self.engine = engine
+        self.primary_name = primary_name
+        self.sample_rate = sample_rate
+        self.compared = 0
+        self.identical = 0
+        self.dropped = 0
+        self.failed = 0
+        self.recent = deque(maxlen=recent)   # latest comparisons, newest last
+        self._totals = {'jaccard': 0.0, 'rank_correlation': 0.0, 'correlated': 0, 'latency_delta_ms': 0.0}
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def sampled(self) -> bool:
+        # Whether to shadow the current request
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def submit(self, user_profile: Dict, top_n: int, results: List, seconds: float):
+        # Queue a comparison with what the primary returned and how long it took; never blocks
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._work, name='shadow-scoring', daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((user_profile, top_n, results, seconds))
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc('shadow_dropped_total', 'Shadow comparisons dropped because the queue was full',
+                        engine=self.engine.name)
+
+    def close(self):
+        # Stop the worker once the comparisons already queued are done
+        if self._thread is not None:
+            self._queue.put(None)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self.compare(*job)
+            except Exception:
+                self.failed += 1
+                logger.exception('shadow engine %s failed', self.engine.name)
+
+    def compare(self, user_profile: Dict, top_n: int, results: List, seconds: float) -> Dict:
+        # Run the shadow engine on one request and record how its ranking differs
+        primary = [_result_id(result) for result in results]
+        start = time.perf_counter()
+        with metrics.muted():
+            shadow = self.engine.rank(user_profile, top_n)
+        shadow_seconds = time.perf_counter() - start
+
+        comparison = {
+            'top_n': top_n,
+            'primary': primary,
+            'shadow': shadow,
+            'jaccard': round(jaccard(primary, shadow), 4),
+            'rank_correlation': rank_correlation(primary, shadow),
+            'primary_ms': round(seconds * 1000.0, 3),
+            'shadow_ms': round(shadow_seconds * 1000.0, 3),
+        }
+        comparison['latency_delta_ms'] = round(comparison['shadow_ms'] - comparison['primary_ms'], 3)
+        correlation = comparison['rank_correlation']
+
+        with self._lock:
+            self.compared += 1
+            self.identical += primary == shadow
+            self._totals['jaccard'] += comparison['jaccard']
+            self._totals['latency_delta_ms'] += comparison['latency_delta_ms']
+            if correlation is not None:
+                self._totals['rank_correlation'] += correlation
+                self._totals['correlated'] += 1
+            self.recent.append(comparison)
+
+        labels = {'engine': self.engine.name}
+        metrics.observe('shadow_topk_jaccard', comparison['jaccard'], 'Top-k overlap of shadow and primary rankings',
+                        RATIO_BUCKETS, **labels)
+        if correlation is not None:
+            metrics.observe('shadow_rank_correlation', correlation,
+                            'Spearman correlation of shadow and primary rankings', CORRELATION_BUCKETS, **labels)
+        metrics.observe('shadow_latency_delta_seconds', shadow_seconds - seconds,
+                        'Shadow minus primary scoring time', DELTA_BUCKETS, **labels)
+        metrics.observe('shadow_engine_seconds', shadow_seconds, 'Shadow engine scoring time', **labels)
+
+        log = logger.debug if primary == shadow else logger.info
+        log('shadow %s vs %s: jaccard=%.3f rank_correlation=%s latency_delta=%+.2fms',
+            self.engine.name, self.primary_name, comparison['jaccard'],
+            'n/a' if correlation is None else f'{correlation:.3f}', comparison['latency_delta_ms'])
+        return comparison
+
+    def summary(self) -> Dict:
+        # Running means over every comparison so far, plus the latest ones
+        with self._lock:
+            compared = self.compared
+            totals = dict(self._totals)
+            recent = list(self.recent)
+        return {
+            'primary': self.primary_name,
+            'shadow': self.engine.name,
+            'sample_rate': self.sample_rate,
+            'compared': compared,
+            'identical': self.identical,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'queued': self._queue.qsize(),
+            'mean_jaccard': round(totals['jaccard'] / compared, 4) if compared else None,
+            'mean_rank_correlation': (round(totals['rank_correlation'] / totals['correlated'], 4)
+                                      if totals['correlated'] else None),
+            'mean_latency_delta_ms': round(totals['latency_delta_ms'] / compared, 3) if compared else None,
+            'recent': recent,
+        }
@@ -0,0 +1,179 @@
+# Locations of Nepal's districts and cities, and distances between them
+#
+# Coordinates are approximate city centres; a district is placed at its
+# headquarters (Kaski at Pokhara, Chitwan at Bharatpur, ...). DistanceTable
+# precomputes the great-circle distance from every known place to every
+# location value of a catalog, so the distance from a student's location to
+# each candidate college is a gather over the colleges' location codes.
+
+import copy
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from cache import LRUCache
+
+EARTH_RADIUS_KM = 6371.0
+
+# Lowercase place name -> (latitude, longitude)
+PLACES = {
+    # Kathmandu valley
+    'kathmandu': (27.7172, 85.3240),
+    'lalitpur': (27.6644, 85.3188),
+    'patan': (27.6644, 85.3188),
+    'bhaktapur': (27.6710, 85.4298),
+    'kirtipur': (27.6781, 85.2775),
+    'dhulikhel': (27.6253, 85.5561),
+    'banepa': (27.6298, 85.5214),
+    'kavrepalanchok': (27.6253, 85.5561),
+    # Koshi
+    'biratnagar': (26.4525, 87.2718),
+    'morang': (26.6650, 87.4650),
+    'itahari': (26.6646, 87.2718),
+    'dharan': (26.8125, 87.2836),
+    'sunsari': (26.6069, 87.1461),
+    'inaruwa': (26.6069, 87.1461),
+    'damak': (26.6600, 87.7000),
+    'birtamod': (26.6435, 87.9932),
+    'jhapa': (26.5714, 88.0517),
+    'ilam': (26.9094, 87.9282),
+    'dhankuta': (26.9833, 87.3333),
+    'okhaldhunga': (27.3167, 86.5000),
+    # Madhesh
+    'janakpur': (26.7288, 85.9263),
+    'dhanusha': (26.7288, 85.9263),
+    'birgunj': (27.0104, 84.8774),
+    'parsa': (27.0104, 84.8774),
+    'rajbiraj': (26.5397, 86.7500),
+    'saptari': (26.5397, 86.7500),
+    'lahan': (26.7200, 86.4800),
+    'siraha': (26.6547, 86.2073),
+    'gaur': (26.7667, 85.2833),
+    'kalaiya': (27.0333, 85.0000),
+    'malangwa': (26.8564, 85.5583),
+    # Bagmati outside the valley
+    'hetauda': (27.4287, 85.0322),
+    'makwanpur': (27.4287, 85.0322),
+    'chitwan': (27.6768, 84.4359),
+    'bharatpur': (27.6768, 84.4359),
+    'sindhuli': (27.2569, 85.9713),
+    'nuwakot': (27.9000, 85.1500),
+    'bidur': (27.9000, 85.1500),
+    # Gandaki
+    'pokhara': (28.2096, 83.9856),
+    'kaski': (28.2096, 83.9856),
+    'gorkha': (28.0000, 84.6333),
+    'lamjung': (28.2300, 84.3800),
+    'besisahar': (28.2300, 84.3800),
+    'damauli': (27.9747, 84.2659),
+    'tanahun': (27.9747, 84.2659),
+    'syangja': (28.0833, 83.8667),
+    'waling': (27.9833, 83.7667),
+    'baglung': (28.2719, 83.5898),
+    'parbat': (28.2167, 83.6833),
+    'kusma': (28.2167, 83.6833),
+    'myagdi': (28.3500, 83.5667),
+    'beni': (28.3500, 83.5667),
+    'kawasoti': (27.6333, 84.1333),
+    # Lumbini
+    'butwal': (27.7006, 83.4483),
+    'bhairahawa': (27.5050, 83.4500),
+    'siddharthanagar': (27.5050, 83.4500),
+    'rupandehi': (27.5050, 83.4500),
+    'lumbini': (27.4833, 83.2833),
+    'palpa': (27.8673, 83.5467),
+    'tansen': (27.8673, 83.5467),
+    'kapilvastu': (27.5333, 83.0500),
+    'nawalparasi': (27.5333, 83.6667),
+    'ghorahi': (28.0333, 82.4833),
+    'dang': (28.0333, 82.4833),
+    'tulsipur': (28.1310, 82.2973),
+    'nepalgunj': (28.0500, 81.6167),
+    'banke': (28.0500, 81.6167),
+    'gulariya': (28.2333, 81.3500),
+    'bardiya': (28.2333, 81.3500),
+    # Karnali
+    'birendranagar': (28.6019, 81.6339),
+    'surkhet': (28.6019, 81.6339),
+    'dailekh': (28.8431, 81.7086),
+    'jumla': (29.2747, 82.1838),
+    # Sudurpashchim
+    'dhangadhi': (28.6940, 80.5930),
+    'kailali': (28.6940, 80.5930),
+    'tikapur': (28.5000, 81.1333),
+    'mahendranagar': (28.9633, 80.1780),
+    'bhimdatta': (28.9633, 80.1780),
+    'kanchanpur': (28.9633, 80.1780),
+    'dadeldhura': (29.3000, 80.5833),
+}
+
+
+def resolve(name: str) -> Optional[str]:
+    # Known place a location string refers to: the name itself, or the longest known
+    # place mentioned in it ("Kathmandu Valley", "New Baneshwor, Kathmandu")
+    text = name.lower().strip()
+    if text in PLACES:
+        return text
+    mentioned = [place for place in PLACES if re.search(rf'\b{place}\b', text)]
+    return max(mentioned, key=len) if mentioned else None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Great-circle distance in km; arguments in degrees, numpy arrays broadcast
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class DistanceTable:
+    # Distances (km) from every known place (rows) to each location value of a catalog
+    # (columns, in location-code order); inf where a location has no known coordinates
+    def __init__(self, locations: List[str]):
+        self.places = list(PLACES)
+        self.row_of = {place: i for i, place in enumerate(self.places)}
+        coordinates = np.array([PLACES[place] for place in self.places])
+        self._lat, self._lon = coordinates[:, 0], coordinates[:, 1]
+        self._origins = LRUCache('location_resolution', maxsize=1024)   # location string -> row
+        self.locations = []
+        self.matrix = np.empty((len(self.places), 0))
+        self.extend(locations)
+
+    def _column(self, location: str) -> np.ndarray:
+        place = resolve(location)
+        if place is None:
+            return np.full(len(self.places), np.inf)
+        lat, lon = PLACES[place]
+        return haversine_km(self._lat, self._lon, lat, lon)
+
+    def extend(self, locations: List[str]):
+        # Add columns for location values appended to the catalog vocabulary
+        new = list(locations[len(self.locations):])
+        if new:
+            columns = np.column_stack([self._column(location) for location in new])
+            self.matrix = np.hstack([self.matrix, columns])
+            self.locations.extend(new)
+
+    def copy(self) -> 'DistanceTable':
+        # A table to extend while this one keeps serving (extend() replaces the matrix)
+        table = copy.copy(self)
+        table.locations = list(self.locations)
+        return table
+
+    def from_location(self, location: str) -> Optional[np.ndarray]:
+        # Distances from a student's location to every location value (None if it is unknown)
+        def origin():
+            place = resolve(location)
+            return self.row_of[place] if place is not None else None
+        row = self._origins.get_or_compute(location.lower().strip(), origin)
+        return self.matrix[row] if row is not None else None
+
+
+def parse_km(value) -> Optional[float]:
+    # Optional distance option from a profile or query string ('', None and 0 mean off)
+    if value in (None, ''):
+        return None
+    km = float(value)
+    if km < 0:
+        raise ValueError('Distances must not be negative')
+    return km or None
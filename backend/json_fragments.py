@@ -0,0 +1,89 @@
+# Pre-encoded JSON for catalog records
+#
+# College records never change once they are in a catalog snapshot (an edit
+# appends a new row), so each one is encoded once, on first use, and
+# responses are built by splicing those bytes with the small per-request
+# part. orjson is used for encoding when it is installed.
+
+import json
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    # Compact UTF-8 JSON
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def join_object(parts: Iterable[bytes]) -> bytes:
+    # JSON object from encoded members ('"key":value' without braces), skipping empty parts
+    return b'{' + b','.join(part for part in parts if part) + b'}'
+
+
+def members(value: Dict) -> bytes:
+    # Members of an encoded object without the surrounding braces
+    return dumps(value)[1:-1]
+
+
+class FragmentCache:
+    # Encoded members per row of a catalog, filled lazily
+    def __init__(self, records: List[Dict]):
+        self.records = records          # shared with the catalog index; rows are never rewritten
+        self._bodies = []               # row -> all members of the record
+        self._fields = []               # row -> {field: '"field":value'}
+
+    def _grow(self):
+        missing = len(self.records) - len(self._bodies)
+        if missing > 0:
+            self._bodies.extend([None] * missing)
+            self._fields.extend([None] * missing)
+
+    def extended(self, records: List[Dict]) -> 'FragmentCache':
+        # A cache over `records`, this cache's records with more appended. The encodings are
+        # shared: a row's record is the same in both, and each cache only reads its own rows.
+        cache = FragmentCache(records)
+        cache._bodies = self._bodies
+        cache._fields = self._fields
+        return cache
+
+    def body(self, row: int) -> bytes:
+        # Every member of a record
+        if row >= len(self._bodies):
+            self._grow()
+        body = self._bodies[row]
+        if body is None:
+            body = self._bodies[row] = members(self.records[row])
+        return body
+
+    def projection(self, row: int, fields: List[str]) -> bytes:
+        # The id plus the requested fields of a record
+        if row >= len(self._fields):
+            self._grow()
+        encoded = self._fields[row]
+        if encoded is None:
+            encoded = self._fields[row] = {}
+        record = self.records[row]
+        parts = []
+        for field in ['id'] + [f for f in fields if f != 'id']:
+            if field not in record:
+                continue
+            part = encoded.get(field)
+            if part is None:
+                part = encoded[field] = members({field: record[field]})
+            parts.append(part)
+        return b','.join(parts)
+
+    def record(self, row: int, extra: Optional[Dict] = None, fields: Optional[List[str]] = None) -> bytes:
+        # One record as a JSON object, with the per-request members of `extra` spliced in
+        static = self.body(row) if fields is None else self.projection(row, fields)
+        return join_object((static, members(extra) if extra else b''))
+
+    def array(self, rows: Iterable[int]) -> bytes:
+        # Records as a JSON array
+        return b'[' + b','.join(b'{' + self.body(row) + b'}' for row in rows) + b']'
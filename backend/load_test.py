@@ -0,0 +1,274 @@
+# HTTP load generator for the Flask API
+#
+# Usage:
+#   python load_test.py --url http://localhost:5001 --concurrency 16 --duration 30
+#   python load_test.py --start-server --requests 5000
+#   python load_test.py --in-process --mix recommend=70,colleges=10,chatbot=20
+#
+# Drives /api/recommend, /api/colleges, /api/colleges/<id>, /api/compare,
+# /api/chatbot and /api/feedback with a weighted mix from several worker
+# threads and reports throughput, error rate and a latency histogram per
+# endpoint. --in-process uses Flask's test client, so no sockets are opened.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from benchmark import CHATBOT_MESSAGES, percentile, profile_corpus
+
+ENDPOINTS = ['recommend', 'colleges', 'college', 'compare', 'chatbot', 'feedback']
+DEFAULT_MIX = 'recommend=50,colleges=5,college=15,compare=10,chatbot=15,feedback=5'
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf')]
+
+
+def parse_mix(mix: str) -> Tuple[List[str], List[float]]:
+    # "recommend=50,chatbot=10" -> (['recommend', 'chatbot'], [50.0, 10.0])
+    names, weights = [], []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}")
+        names.append(name)
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+def build_request(name: str, rng: random.Random, college_ids: List[int], profiles: List[Dict]) -> Tuple[str, str, Optional[Dict]]:
+    # (method, path, json body) for one call of the named endpoint
+    if name == 'recommend':
+        return 'POST', '/api/recommend', dict(rng.choice(profiles), top_n=10)
+    if name == 'colleges':
+        return 'GET', '/api/colleges', None
+    if name == 'college':
+        return 'GET', f'/api/colleges/{rng.choice(college_ids)}', None
+    if name == 'compare':
+        return 'POST', '/api/compare', {'college_ids': rng.sample(college_ids, min(len(college_ids), rng.randint(2, 4)))}
+    if name == 'chatbot':
+        return 'POST', '/api/chatbot', {'message': rng.choice(CHATBOT_MESSAGES)}
+    if name == 'feedback':
+        return 'POST', '/api/feedback', {'college_id': rng.choice(college_ids), 'rating': rng.randint(1, 5),
+                                         'comment': 'load test', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    raise ValueError(name)
+
+
+class HttpTransport:
+    # Sends requests to a running server over HTTP
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def send(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class InProcessTransport:
+    # Sends requests through Flask's test client, one client per thread
+    def __init__(self):
+        from app import app
+        from startup import startup
+        if not startup.wait(300):
+            raise RuntimeError('Engine did not become ready in time')
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        resp = client.open(path, method=method, json=body)
+        return resp.status_code, resp.get_data()
+
+
+class EndpointStats:
+    # Latencies and errors collected for one endpoint
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_codes = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms: float, status: int):
+        with self.lock:
+            self.latencies.append(latency_ms)
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            if status == 0 or status >= 500:
+                self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        histogram = {}
+        bucket = 0
+        for upper in HISTOGRAM_BUCKETS:
+            label = f'<={upper:g}ms' if upper != float('inf') else f'>{HISTOGRAM_BUCKETS[-2]:g}ms'
+            n = 0
+            while bucket < count and latencies[bucket] <= upper:
+                bucket += 1
+                n += 1
+            histogram[label] = n
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'throughput_per_s': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+            'status_codes': {str(k): v for k, v in sorted(self.status_codes.items())},
+            'histogram': histogram,
+        }
+
+
+def run_load(transport, names: List[str], weights: List[float], concurrency: int,
+             duration: float, total_requests: int, seed: int) -> Tuple[Dict[str, EndpointStats], float]:
+    # Run worker threads until the duration or request budget is used up
+    status, body = transport.send('GET', '/api/colleges', None)
+    if status != 200:
+        raise RuntimeError(f'Could not list colleges (status {status})')
+    college_ids = [c['id'] for c in json.loads(body)]
+    profiles = profile_corpus(100, seed)
+
+    stats = {name: EndpointStats() for name in names}
+    counter = {'sent': 0}
+    counter_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            if total_requests:
+                with counter_lock:
+                    if counter['sent'] >= total_requests:
+                        return
+                    counter['sent'] += 1
+            name = rng.choices(names, weights)[0]
+            method, path, body = build_request(name, rng, college_ids, profiles)
+            t0 = time.perf_counter()
+            try:
+                status, _ = transport.send(method, path, body)
+            except Exception:
+                status = 0
+            stats[name].record((time.perf_counter() - t0) * 1000.0, status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats, time.perf_counter() - started
+
+
+def start_server(port: int) -> subprocess.Popen:
+    # Start app.py on the given port and wait until /api/ready answers (engine built and warmed up)
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, '-c', f'from app import app; app.run(port={port}, threaded=True)'],
+        cwd=backend_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(1500):
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=1):
+                return proc
+        except Exception:
+            if proc.poll() is not None:
+                raise RuntimeError('Server exited during startup')
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('Server did not become ready in time')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the college recommendation API')
+    parser.add_argument('--url', default='http://localhost:5001', help='base URL of a running server')
+    parser.add_argument('--in-process', action='store_true', help="use Flask's test client instead of HTTP")
+    parser.add_argument('--start-server', action='store_true', help='start app.py locally for the run')
+    parser.add_argument('--port', type=int, default=5099, help='port used with --start-server')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint weights (default {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of worker threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run (0 = use --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='total requests to send')
+    parser.add_argument('--seed', type=int, default=7, help='seed for the request mix')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+    if args.duration <= 0 and args.requests <= 0:
+        # Neither limit would ever stop the workers
+        parser.error('--duration 0 needs --requests greater than 0')
+
+    names, weights = parse_mix(args.mix)
+    duration = 0 if args.requests and args.duration == parser.get_default('duration') else args.duration
+
+    server = None
+    if args.in_process:
+        transport = InProcessTransport()
+        target = 'in-process test client'
+    else:
+        if args.start_server:
+            server = start_server(args.port)
+            args.url = f'http://127.0.0.1:{args.port}'
+        transport = HttpTransport(args.url)
+        target = args.url
+
+    try:
+        stats, elapsed = run_load(transport, names, weights, args.concurrency, duration, args.requests, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'target': target,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'endpoints': {name: s.summary(elapsed) for name, s in stats.items()},
+    }
+    total = sum(e['requests'] for e in report['endpoints'].values())
+    errors = sum(e['errors'] for e in report['endpoints'].values())
+    report['total'] = {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'throughput_per_s': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+    print(f"Target: {target}, {args.concurrency} workers, {elapsed:.1f}s")
+    print(f"{'endpoint':<12}{'reqs':>8}{'err %':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in report['endpoints'].items():
+        print(f"{name:<12}{e['requests']:>8}{e['error_rate'] * 100:>8.2f}{e['throughput_per_s']:>10}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    t = report['total']
+    print(f"{'total':<12}{t['requests']:>8}{t['error_rate'] * 100:>8.2f}{t['throughput_per_s']:>10}")
+    for name, e in report['endpoints'].items():
+        print(f"\n{name} latency histogram:")
+        peak = max(e['histogram'].values()) or 1
+        for label, n in e['histogram'].items():
+            print(f"  {label:>10} {n:>7} {'#' * int(40 * n / peak)}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nReport written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# Memory accounting per subsystem
+#
+# deep_size() estimates the bytes an object graph holds: containers are walked,
+# objects reachable twice are counted once, and numpy arrays count their
+# buffer (a view its header plus the array it views, once). Containers of more than SAMPLE_ABOVE
+# records or other containers are measured on an evenly spaced sample and
+# extrapolated; containers of strings, numbers or arrays (whose sizes can be
+# very uneven) are cheap enough to measure in full. The
+# structures built from the catalog are only measured again after the catalog
+# changes, so a monitor can fetch a report every minute.
+#
+# With TRACEMALLOC_FRAMES=N (N > 0) tracemalloc is started at import, keeping
+# N frames per allocation, and reports include the source lines that allocated
+# the most. Tracing slows every allocation down, so leave it off in production.
+
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+import cache
+from persistent import ChunkedList, LayeredDict
+
+SAMPLE_ABOVE = 1000
+SAMPLE_SIZE = 200
+
+# Sizes of stable subsystems per version (see report)
+_stable_sizes = cache.LRUCache('memory_report', maxsize=4)
+
+# Objects that are not walked into: their size is their own
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None), range, np.ndarray, np.generic)
+# Code, classes and modules are shared by the whole process, not held by a subsystem
+_SKIPPED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+            types.CodeType)
+
+if int(os.environ.get('TRACEMALLOC_FRAMES', '0')) > 0 and not tracemalloc.is_tracing():
+    tracemalloc.start(int(os.environ['TRACEMALLOC_FRAMES']))
+
+
+def _attributes(obj) -> list:
+    # Instance attribute values of a plain object (its __dict__ and slots)
+    values = [vars(obj)] if hasattr(obj, '__dict__') else []
+    for cls in type(obj).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for slot in [slots] if isinstance(slots, str) else slots:
+            if slot not in ('__dict__', '__weakref__') and hasattr(obj, slot):
+                values.append(getattr(obj, slot))
+    return values
+
+
+def _is_view(value) -> bool:
+    # A numpy array over another array's buffer (sys.getsizeof counts only its header)
+    return isinstance(value, np.ndarray) and value.base is not None
+
+
+def _sum_sizes(values, seen: set) -> int:
+    # deep_size() summed over values; all-atomic values are measured without recursing
+    values = list(values)
+    if all(map(isinstance, values, itertools.repeat(_ATOMIC))) and not any(map(_is_view, values)):
+        by_id = dict(zip(map(id, values), values))
+        fresh = by_id.keys() - seen
+        seen.update(fresh)
+        return sum(map(sys.getsizeof, map(by_id.__getitem__, fresh)))
+    return sum(deep_size(value, seen) for value in values)
+
+
+def _contents(obj, seen: set) -> int:
+    # Bytes referenced by a container: all items when there are few or they are atomic,
+    # else an evenly spaced sample extrapolated. Atomic items (strings, numbers, arrays)
+    # are cheap to measure and can vary wildly in size (a posting list per term).
+    mapping = isinstance(obj, (dict, LayeredDict))
+    groups = iter(obj.items()) if mapping else zip(obj)
+    first = next(groups, None)
+    if first is None:
+        return 0
+    if len(obj) <= SAMPLE_ABOVE or all(isinstance(value, _ATOMIC) for value in first):
+        return _sum_sizes(itertools.chain(first, itertools.chain.from_iterable(groups)), seen)
+    step = len(obj) // SAMPLE_SIZE
+    sample = [first] + list(itertools.islice(groups, step - 1, None, step))
+    total = _sum_sizes(itertools.chain.from_iterable(sample), seen) / len(sample) * len(obj)
+    # The items were accounted for here, sampled or not: another container holding the
+    # same records (in a different order) must not extrapolate them again
+    seen.update(map(id, itertools.chain(obj.keys(), obj.values()) if mapping else obj))
+    return int(total)
+
+
+def deep_size(obj, seen: Optional[set] = None) -> int:
+    # Estimated bytes held by obj and everything it references that is not in `seen`;
+    # pass one set across calls to count shared objects once
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, _SKIPPED):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if _is_view(obj):
+        return size + deep_size(obj.base, seen)
+    if isinstance(obj, _ATOMIC):
+        return size
+    if isinstance(obj, (dict, list, tuple, set, frozenset, deque, ChunkedList, LayeredDict)):
+        return size + _contents(obj, seen)
+    return size + _sum_sizes(_attributes(obj), seen)
+
+
+def process_memory() -> Dict[str, int]:
+    # Resident set size of the process now and at its peak, where the platform reports them
+    usage = {}
+    try:
+        with open('/proc/self/statm') as f:
+            usage['rss_bytes'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    return usage
+
+
+def top_allocations(limit: int = 10) -> Optional[Dict]:
+    # The source lines holding the most traced memory, None unless tracemalloc is running
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics('lineno')
+    return {
+        'traced_bytes': current,
+        'peak_traced_bytes': peak,
+        'top': [{'location': str(stat.traceback[0]), 'bytes': stat.size, 'blocks': stat.count}
+                for stat in statistics[:limit]],
+    }
+
+
+def _seed(parts: Dict[str, object]) -> set:
+    # Ids of the named objects and the items of named lists (records), so that later
+    # subsystems referencing them are not charged for them again
+    seen = set()
+    for obj in parts.values():
+        seen.add(id(obj))
+        if isinstance(obj, (list, tuple, ChunkedList)):
+            seen.update(map(id, obj))
+    return seen
+
+
+def report(subsystems: Dict[str, Dict[str, object]], top: int = 10,
+           stable: Tuple[str, ...] = (), version: Hashable = None) -> Dict:
+    # Bytes per subsystem and per named part of it. Subsystems are measured in order and
+    # an object reachable from several parts is counted for the first. Subsystems named in
+    # `stable` only change with `version`: their sizes are reused while it stays the same
+    # and the rest never walk back into them. Every registered LRU cache not named by a
+    # part is added to the 'caches' subsystem.
+    start = time.perf_counter()
+    subsystems = {name: dict(parts) for name, parts in subsystems.items()}
+    named = {id(part) for parts in subsystems.values() for part in parts.values()}
+    caches = subsystems.setdefault('caches', {})
+    for lru in cache.registered():
+        if id(lru) not in named:
+            key = lru.name if lru.name not in caches else f'{lru.name}#{id(lru):x}'
+            caches[key] = lru
+
+    result = {}
+    fixed = {name: parts for name, parts in subsystems.items() if name in stable}
+    if fixed:
+        sizes = _stable_sizes.get(version) if version is not None else None
+        if sizes is None:
+            seen = set()
+            sizes = {name: {part: deep_size(obj, seen) for part, obj in parts.items()} for name, parts in fixed.items()}
+            if version is not None:
+                _stable_sizes.put(version, sizes)
+        result.update(sizes)
+    seen = set().union(*(_seed(parts) for parts in fixed.values()))
+    for name, parts in subsystems.items():
+        if name not in fixed:
+            result[name] = {part: deep_size(obj, seen) for part, obj in parts.items()}
+
+    result = {name: {'bytes': sum(result[name].values()), 'parts': result[name]} for name in subsystems}
+    summary = {
+        'subsystems': result,
+        'total_bytes': sum(entry['bytes'] for entry in result.values()),
+        'process': process_memory(),
+    }
+    allocations = top_allocations(top) if top > 0 else None
+    if allocations is not None:
+        summary['tracemalloc'] = allocations
+    summary['seconds'] = round(time.perf_counter() - start, 4)
+    return summary
@@ -0,0 +1,199 @@
+# Lightweight metrics for the API, exported in Prometheus text format
+#
+# Collection is switched on with METRICS_ENABLED=1. When it is off (and no
+# request trace is being recorded) every timer is a shared no-op object, so
+# instrumented code pays for one function call and nothing else. Stage timers
+# also add a span to the current request trace (see tracing.py). Work done
+# inside muted() (shadow scoring, see engines.py) records nothing.
+
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import tracing
+
+# Latency buckets in seconds
+TIME_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+# Candidate-set size buckets
+SIZE_BUCKETS = [0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000, 100000, 1000000]
+
+enabled = os.environ.get('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+_lock = threading.Lock()
+_histograms = {}   # name -> Histogram
+_counters = {}     # name -> {label tuple: value}
+_gauges = {}       # name -> (help, callback)
+_help = {}
+_muted = contextvars.ContextVar('metrics_muted', default=False)
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+
+class Histogram:
+    # Cumulative histogram with one series per label set
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.series = {}  # label tuple -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, key: Tuple = ()):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for upper, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{_format_labels(key, (("le", f"{upper:g}"),))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, (("le", "+Inf"),))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {series[-1]}')
+        return lines
+
+
+def histogram(name: str, help_text: str, buckets: List[float] = TIME_BUCKETS) -> Histogram:
+    # Get or create a histogram
+    h = _histograms.get(name)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(name, Histogram(name, help_text, buckets))
+    return h
+
+
+def observe(name: str, value: float, help_text: str = '', buckets: List[float] = TIME_BUCKETS, **labels):
+    # Record one value in a histogram
+    if not enabled or _muted.get():
+        return
+    h = histogram(name, help_text, buckets)
+    with _lock:
+        h.observe(value, _label_key(labels))
+
+
+def inc(name: str, help_text: str = '', amount: float = 1, **labels):
+    # Increase a counter
+    if not enabled or _muted.get():
+        return
+    key = _label_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+        if help_text:
+            _help[name] = help_text
+
+
+def register_gauge(name: str, help_text: str, callback: Callable[[], object]):
+    # Gauge read at scrape time; callback returns a number or a {label dict tuple: value} mapping
+    _gauges[name] = (help_text, callback)
+
+
+class _Timer:
+    __slots__ = ('metric', 'name', 'trace', 'start')
+
+    def __init__(self, metric: str, name: str, trace):
+        self.metric = metric
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if self.trace is not None:
+            self.trace.add_span(self.name, self.start, end)
+        if enabled:
+            h = histogram(self.metric, 'Time spent per stage in seconds')
+            with _lock:
+                h.observe(end - self.start, (('stage', self.name),))
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def stage(name: str, metric: str = 'recommender_stage_seconds'):
+    # Context manager timing one stage of request processing
+    trace = tracing.current()
+    if (not enabled and trace is None) or _muted.get():
+        return _NOOP
+    return _Timer(metric, name, trace)
+
+
+@contextlib.contextmanager
+def muted():
+    # Record no metrics or stage spans for the work done in this block
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def render() -> str:
+    # All metrics in Prometheus text exposition format
+    lines = [
+        '# HELP metrics_enabled Whether metric collection is switched on',
+        '# TYPE metrics_enabled gauge',
+        f'metrics_enabled {1 if enabled else 0}',
+    ]
+    with _lock:
+        for name in sorted(_counters):
+            lines.append(f'# HELP {name} {_help.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f'{name}{_format_labels(key)} {value:g}')
+        for name in sorted(_histograms):
+            lines.extend(_histograms[name].render())
+    for name, (help_text, callback) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                lines.append(f'{name}{_format_labels(key)} {v:g}')
+        else:
+            lines.append(f'{name} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    # Drop all collected values (gauges stay registered)
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
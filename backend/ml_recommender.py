@@ -1,18 +1,143 @@
 # College Recommendation Module
 
+import copy
+import hashlib
 import json
 import math
-from typing import List, Dict, Tuple
+import itertools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
+import metrics
+from cache import LRUCache
+from catalog_changes import ChangeLog
+from catalog_compiler import canonical_program, college_key, compile_catalog, load_compiled
+from catalog_index import SET_FIELDS, CatalogIndex, popcount
+from geo import DistanceTable, parse_km
+from json_fragments import FragmentCache, dumps, join_object
+from persistent import LayeredDict, appended
+from text_index import TextIndex
+from topn_table import KEY_FIELDS, TopNTable
+import tracing
+
+# Profile fields /api/what-if can vary, and the cap on the number of variants per call
+WHAT_IF_FIELDS = ('gpa', 'budget_range', 'location', 'preferred_program')
+MAX_WHAT_IF_VARIANTS = 200
+
+# Diversified ranking (MMR) re-ranks the best max(MMR_POOL_FACTOR * top_n, MMR_MIN_POOL) candidates
+MMR_POOL_FACTOR = 10
+MMR_MIN_POOL = 50
+
+# Order of the feature groups in group_features() and weight vectors
+FEATURE_GROUPS = ('program', 'stream', 'location', 'budget', 'gpa')
+
+# Required fields of a college added through the admin API
+COLLEGE_REQUIRED_FIELDS = ('name', 'location', 'budget_range', 'min_gpa', 'programs', 'streams')
+# Compact once deleted or replaced rows make up this share of the index (and at least COMPACT_MIN_ROWS)
+COMPACT_RATIO = 0.25
+COMPACT_MIN_ROWS = 64
+
+@contextmanager
+def _untimed(name: str):
+    # Stand-in for Startup.phase when nobody is timing the build
+    yield
+
+class CatalogSnapshot:
+    # One published state of the catalog: the live colleges and every structure derived from
+    # them. A request reads recommender.snapshot once and uses only that object; edits and
+    # compaction build a new snapshot (sharing the arrays they do not change, and the chunks
+    # of per-row containers they do not touch) and publish it with one assignment, so a
+    # request never sees an edit half applied.
+    
+    def __init__(self, version: int, catalog: Dict, colleges: List[Dict], vocabulary: Tuple,
+                 index: CatalogIndex, text_index: TextIndex, distances: DistanceTable,
+                 fragments: FragmentCache, program_counts: np.ndarray, stream_counts: np.ndarray,
+                 keys: LayeredDict, stats: Dict, topn_table: Optional[TopNTable] = None):
+        self.version = version
+        self.catalog = catalog
+        self.count = len(colleges)   # live colleges
+        # Catalog position of every row: an updated college keeps the position of the row it replaces
+        self.positions = np.arange(index.size, dtype=np.int64)
+        self._colleges = colleges
+        (self.all_programs, self.all_streams, self.all_locations, self.all_budget_ranges,
+         self.all_career_focus, self.all_interests) = vocabulary
+        self.index = index
+        self.text_index = text_index
+        self.distances = distances
+        self.fragments = fragments
+        # Per-college value counts for the vectorised similarity (college vector norms)
+        self.program_counts = program_counts
+        self.stream_counts = stream_counts
+        self.keys = keys     # duplicate key (name and location) -> college id
+        self.stats = stats   # running totals behind get_statistics()
+        self.topn_table = topn_table
+        # Filled on first use
+        self.colleges_json = None
+        self.norms = (None, None)   # (feature weights, weighted norm of every college vector)
+    
+    def replace(self, **parts) -> 'CatalogSnapshot':
+        # The next version with some parts replaced; what is filled on first use starts empty
+        snapshot = copy.copy(self)
+        snapshot.__dict__.update(parts)
+        snapshot.version = self.version + 1
+        snapshot.colleges_json = None
+        snapshot.norms = (None, None)
+        return snapshot
+    
+    def copy(self) -> 'CatalogSnapshot':
+        # The next version with its own copy of everything an admin edit changes
+        index = self.index.copy()
+        return self.replace(
+            _colleges=None, all_programs=list(self.all_programs), all_streams=list(self.all_streams),
+            all_locations=list(self.all_locations), all_budget_ranges=list(self.all_budget_ranges),
+            all_career_focus=set(self.all_career_focus), all_interests=set(self.all_interests),
+            index=index, text_index=self.text_index.copy(), distances=self.distances.copy(),
+            fragments=self.fragments.extended(index.colleges), keys=self.keys.copy(),
+            stats={name: copy.copy(value) for name, value in self.stats.items()}, topn_table=None)
+    
+    def ordered_rows(self) -> np.ndarray:
+        # Rows of the live colleges in catalog order
+        rows = np.flatnonzero(self.index.live)
+        return rows[np.argsort(self.positions[rows], kind='stable')]
+    
+    @property
+    def colleges(self) -> List[Dict]:
+        # Live colleges in catalog order, listed on first use
+        colleges = self._colleges
+        if colleges is None:
+            records = list(self.index.colleges)
+            colleges = self._colleges = [records[row] for row in self.ordered_rows().tolist()]
+        return colleges
+
 class CollegeRecommender:
-    def __init__(self, colleges_file: str):
+    # Memory subsystems built from the catalog, as opposed to caches filled by requests
+    CATALOG_SUBSYSTEMS = ('college_records', 'vocabulary', 'feature_matrices', 'indexes')
+    
+    def __init__(self, colleges_file: str, startup=None):
         # Initialize the recommender with college data
-        with open(colleges_file, 'r', encoding='utf-8') as f:
-            self.colleges = json.load(f)
-        
-        self._build_vocabulary()
+        # startup: optional startup.Startup that times each build phase
+        phase = startup.phase if startup is not None else _untimed
+        with phase('load'):
+            with open(colleges_file, 'r', encoding='utf-8') as f:
+                if colleges_file.endswith('.ndjson'):
+                    # One college per line (large generated catalogs)
+                    data = [json.loads(line) for line in f if line.strip()]
+                else:
+                    data = json.load(f)
+            
+            # Raw catalogs are deduplicated and given canonical program names on load
+            catalog = load_compiled(data)
+        self.aliases = catalog['aliases']
+        self.snapshot = self._build(catalog, 1, phase)
+        self.comparison_cache = LRUCache('comparison', maxsize=512)
+        self.program_cache = LRUCache('program_resolution', maxsize=4096)
+        self._write_lock = threading.Lock()
+        self._compacting = False
+        self.changes = ChangeLog()   # version and per-college edits, for delta sync
         
         # Feature weights for matching
         self.feature_weights = {
@@ -22,29 +147,100 @@ class CollegeRecommender:
             'budget': 0.8,
             'gpa': 0.5
         }
+        # Score multipliers for colleges that match the preferred program / location
+        self.match_boosts = {
+            'program': 2.0,
+            'location': 2.0
+        }
+        # Proximity decay (km) for profiles that do not set proximity_decay_km; None matches
+        # locations by name only
+        self.proximity_decay_km = None
     
-    def _build_vocabulary(self):
-        # Build vocabulary of features from colleges
-        self.all_programs = set()
-        self.all_streams = set()
-        self.all_locations = set()
-        self.all_budget_ranges = set()
-        self.all_career_focus = set()
-        self.all_interests = set()
-        
-        for college in self.colleges:
-            self.all_programs.update(college['programs'])
-            self.all_streams.update(college['streams'])
-            self.all_locations.add(college['location'])
-            self.all_budget_ranges.add(college['budget_range'])
-            self.all_career_focus.update(college['career_focus'])
-            self.all_interests.update(college['interests'])
-        
-        # Convert to sorted lists for consistent indexing
-        self.all_programs = sorted(list(self.all_programs))
-        self.all_streams = sorted(list(self.all_streams))
-        self.all_locations = sorted(list(self.all_locations))
-        self.all_budget_ranges = sorted(list(self.all_budget_ranges))
+    def load_weights(self, weights_file: str):
+        # Use feature weights and match boosts exported by tune_weights.py
+        with open(weights_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        weights = {k: float(v) for k, v in config.get('feature_weights', {}).items() if k in self.feature_weights}
+        boosts = {k: float(v) for k, v in config.get('match_boosts', {}).items() if k in self.match_boosts}
+        self.feature_weights = {**self.feature_weights, **weights}
+        self.match_boosts = {**self.match_boosts, **boosts}
+        with self._write_lock:
+            self.snapshot = self.snapshot.replace(topn_table=None)
+    
+    def _build(self, catalog: Dict, version: int, phase=None) -> CatalogSnapshot:
+        # A snapshot with every derived structure built from a compiled catalog; requests keep
+        # using the published snapshot until the caller swaps this one in
+        phase = phase or _untimed
+        colleges = list(catalog['colleges'])
+        with phase('vocabulary'):
+            vocabulary = self._build_vocabulary(catalog)
+        
+        with phase('matrices'):
+            index = CatalogIndex(colleges)
+            program_counts = np.bincount(index.entry_rows['programs'], minlength=index.size)
+            stream_counts = np.bincount(index.entry_rows['streams'], minlength=index.size)
+        
+        with phase('indexes'):
+            for alias, kept in self.aliases.items():
+                if kept in index.row_of:
+                    index.row_of.setdefault(alias, index.row_of[kept])
+            text_index = TextIndex(colleges)
+            distances = DistanceTable(index.vocab['location'])
+            keys = LayeredDict((college_key(college), college['id']) for college in colleges)
+        
+        self.next_id = max([college['id'] for college in colleges] + list(self.aliases), default=0) + 1
+        return CatalogSnapshot(version, catalog, colleges, vocabulary, index, text_index, distances,
+                               FragmentCache(index.colleges), program_counts, stream_counts, keys,
+                               self._count_statistics(colleges))
+    
+    def _build_vocabulary(self, catalog: Dict) -> Tuple:
+        # Vocabulary of features, as emitted by the catalog compiler:
+        # (programs, streams, locations, budget ranges, career focus, interests)
+        vocabulary = catalog['vocabulary']
+        return (list(vocabulary['programs']), list(vocabulary['streams']), list(vocabulary['locations']),
+                list(vocabulary['budget_ranges']), set(vocabulary['career_focus']), set(vocabulary['interests']))
+    
+    def warm_up(self, profiles: List[Dict]) -> int:
+        # Run representative requests so caches, norms and encoded records are filled
+        # before real traffic arrives; returns the number of profiles that ran
+        warmed = 0
+        for profile in profiles:
+            try:
+                self.recommend(dict(profile), top_n=10, encoded=True)
+                warmed += 1
+            except Exception:
+                continue
+        self.colleges_json()
+        self.get_statistics()
+        return warmed
+    
+    def get_college(self, college_id: int) -> Optional[Dict]:
+        # College by id (ids of merged duplicates resolve to the kept college)
+        index = self.snapshot.index
+        row = index.row_of.get(college_id)
+        return index.colleges[row] if row is not None else None
+    
+    def _resolve_program(self, snap: CatalogSnapshot, preferred_program: str) -> Tuple[int, int]:
+        # Canonical program ids the preferred program selects, as bitmaps over all_programs:
+        # (programs that pass the program filter, programs that count as a program match).
+        # The typed text matches program names by substring; its canonical form (a synonym
+        # such as "CSIT" -> "BSc CSIT") selects only that program, by id.
+        def resolve():
+            p = preferred_program.lower().strip()
+            filter_bits = 0
+            match_bits = 0
+            for i, program in enumerate(snap.all_programs):
+                cp = program.lower()
+                if p == cp or f" {p} " in f" {cp} " or (len(p) > 3 and p in cp):
+                    filter_bits |= 1 << i
+                if p in cp or cp in p:
+                    match_bits |= 1 << i
+            canonical = snap.index.bit_of['programs'].get(canonical_program(preferred_program))
+            if canonical is not None:
+                filter_bits |= 1 << canonical
+                match_bits |= 1 << canonical
+            return filter_bits, match_bits
+        return self.program_cache.get_or_compute((snap.version, preferred_program), resolve)
     
     def _normalize_gpa(self, gpa: float) -> float:
         # Normalize GPA to 0-1 scale
@@ -63,6 +259,11 @@ class CollegeRecommender:
             if field in processed and processed[field]:
                 processed[field] = str(processed[field]).strip()
         
+        # Distance options (km): unset, empty or 0 switch them off
+        for field in ['max_distance_km', 'proximity_decay_km']:
+            if field in processed:
+                processed[field] = parse_km(processed[field])
+        
         # Handle optional fields
         processed['interests'] = processed.get('interests', '').strip()
         processed['career_goals'] = processed.get('career_goals', '').strip()
@@ -85,29 +286,30 @@ class CollegeRecommender:
     
     def _college_to_vector(self, college: Dict) -> List[float]:
         # Convert college to feature vector
+        snap = self.snapshot
         vector = []
         weights = []
         
         # Program features (weighted)
-        for program in self.all_programs:
+        for program in snap.all_programs:
             val = 1.0 if program in college['programs'] else 0.0
             vector.append(val)
             weights.append(self.feature_weights['program'])
         
         # Stream features (weighted)
-        for stream in self.all_streams:
+        for stream in snap.all_streams:
             val = 1.0 if stream in college['streams'] else 0.0
             vector.append(val)
             weights.append(self.feature_weights['stream'])
         
         # Location feature (weighted)
-        for location in self.all_locations:
+        for location in snap.all_locations:
             val = 1.0 if location == college['location'] else 0.0
             vector.append(val)
             weights.append(self.feature_weights['location'])
         
         # Budget range (weighted)
-        for budget in self.all_budget_ranges:
+        for budget in snap.all_budget_ranges:
             val = 1.0 if budget == college['budget_range'] else 0.0
             vector.append(val)
             weights.append(self.feature_weights['budget'])
@@ -121,24 +323,22 @@ class CollegeRecommender:
     
     def _user_to_vector(self, user_profile: Dict) -> List[float]:
         # Convert user profile to feature vector
+        snap = self.snapshot
         vector = []
         
         # Program features - user's preferred program gets weight 1.0
-        preferred_program = user_profile.get('preferred_program', '')
-        for program in self.all_programs:
-            if preferred_program.lower() in program.lower() or program.lower() in preferred_program.lower():
-                vector.append(1.0)
-            else:
-                vector.append(0.0)
+        _, match_bits = self._resolve_program(snap, user_profile.get('preferred_program', ''))
+        for i in range(len(snap.all_programs)):
+            vector.append(1.0 if (match_bits >> i) & 1 else 0.0)
         
         # Stream features
         user_stream = user_profile.get('stream', '')
-        for stream in self.all_streams:
+        for stream in snap.all_streams:
             vector.append(1.0 if stream.lower() == user_stream.lower() else 0.0)
         
         # Location feature
         user_location = user_profile.get('location', '')
-        for location in self.all_locations:
+        for location in snap.all_locations:
             if user_location.lower() == 'any' or user_location.lower() in location.lower() or location.lower() in user_location.lower():
                 vector.append(1.0)
             else:
@@ -146,7 +346,7 @@ class CollegeRecommender:
         
         # Budget range
         user_budget = user_profile.get('budget_range', '')
-        for budget in self.all_budget_ranges:
+        for budget in snap.all_budget_ranges:
             vector.append(1.0 if budget.lower() == user_budget.lower() else 0.0)
         
         # GPA (normalized)
@@ -179,7 +379,7 @@ class CollegeRecommender:
         
         return min(1.0, base_confidence)
     
-    def _analyze_feature_matches(self, college: Dict, user_profile: Dict) -> Dict:
+    def _analyze_feature_matches(self, college: Dict, user_profile: Dict, program_match: Optional[bool] = None) -> Dict:
         # Check which features match
         matches = {
             'program': False,
@@ -189,10 +389,12 @@ class CollegeRecommender:
             'gpa_eligible': False
         }
         
-        # Program match
-        preferred_program = user_profile.get('preferred_program', '').lower()
-        college_programs = [p.lower() for p in college['programs']]
-        matches['program'] = any(preferred_program in p or p in preferred_program for p in college_programs)
+        # Program match (recommend() passes it in, resolved from canonical program ids)
+        if program_match is None:
+            snap = self.snapshot
+            _, match_bits = self._resolve_program(snap, user_profile.get('preferred_program', ''))
+            program_match = bool(snap.index.row_bits['programs'][snap.index.row_of[college['id']]] & match_bits)
+        matches['program'] = program_match
         
         # Stream match
         user_stream = user_profile.get('stream', '').lower()
@@ -213,16 +415,13 @@ class CollegeRecommender:
         
         return matches
     
-    def _filter_by_gpa(self, colleges: List[Dict], user_gpa: float) -> List[Dict]:
-        # Filter colleges by GPA requirement
-        filtered = []
-        for college in colleges:
-            if user_gpa >= college['min_gpa']:
-                filtered.append(college)
-        return filtered
+    def _filter_by_gpa(self, snap: CatalogSnapshot, user_gpa: float) -> np.ndarray:
+        # Boolean mask of (live) colleges whose GPA requirement the user meets
+        return (snap.index.min_gpa <= user_gpa) & snap.index.live
     
-    def _generate_explanation(self, college: Dict, user_profile: Dict, similarity: float, matches: Dict) -> str:
-        # Generate explanation for recommendation
+    def _generate_explanation(self, college: Dict, user_profile: Dict, similarity: float, matches: Dict,
+                              distance_km: Optional[float] = None) -> str:
+        # Generate explanation for recommendation (distance_km: mention how close a nearby college is)
         reasons = []
         
         if matches['program']:
@@ -233,6 +432,8 @@ class CollegeRecommender:
         
         if matches['location']:
             reasons.append(f"located in {college['location']}")
+        elif distance_km is not None:
+            reasons.append(f"is in {college['location']}, about {distance_km:.0f} km from {user_profile.get('location')}")
         
         if matches['budget']:
             reasons.append(f"fits your {college['budget_range']} budget range")
@@ -251,134 +452,927 @@ class CollegeRecommender:
         return explanation
     
     
-    def recommend(self, user_profile: Dict, top_n: int = 5) -> List[Dict]:
+    def _score_fields(self, item: Dict, user_profile: Dict, fields: Optional[List[str]], explain: bool) -> Dict:
+        # The per-request part of one result: scores, matches and the explanation
+        scores = {
+            'similarity_score': lambda: round(item['similarity'], 3),
+            'confidence_score': lambda: round(item['confidence'], 3),
+            'combined_score': lambda: round(item['score'], 3),
+            'feature_matches': lambda: item['matches'],
+            'feature_scores': lambda: item['feature_scores'],
+        }
+        result = {}
+        for key, value in scores.items():
+            if fields is None or key in fields:
+                result[key] = value()
+        
+        if 'distance_km' in item and (fields is None or 'distance_km' in fields):
+            result['distance_km'] = item['distance_km']
+        
+        if explain and (fields is None or 'explanation' in fields):
+            result['explanation'] = self._generate_explanation(
+                item['college'], user_profile, item['similarity'], item['matches'],
+                item['distance_km'] if item.get('nearby') else None
+            )
+        
+        return result
+    
+    def _format_recommendation(self, item: Dict, user_profile: Dict, fields: Optional[List[str]], explain: bool) -> Dict:
+        # Build one result; with `fields` only those keys are returned instead of a full copy
+        college = item['college']
+        if fields is None:
+            result = college.copy()
+        else:
+            result = {'id': college['id']}
+            for field in fields:
+                if field in college:
+                    result[field] = college[field]
+        
+        result.update(self._score_fields(item, user_profile, fields, explain))
+        return result
+    
+    def recommend(self, user_profile: Dict, top_n: int = 5, fields: Optional[List[str]] = None,
+                  explain: bool = True, encoded: bool = False, diversity: Optional[float] = None) -> List:
         # Main recommendation function with preprocessing
-        user_profile = self._preprocess_user_input(user_profile)
-        user_profile = self._handle_missing_data(user_profile)
+        # fields: only return these keys per college (id is always included)
+        # explain: set to False to skip building explanation strings
+        # encoded: return each result as JSON bytes, spliced from the college's pre-encoded record
+        # diversity: 0-1, trade relevance for variety among the results (MMR); None ranks by score
+        with metrics.stage('preprocess'):
+            user_profile = self._preprocess_user_input(user_profile)
+            user_profile = self._handle_missing_data(user_profile)
         
         user_gpa = float(user_profile.get('gpa', 0))
-        eligible_colleges = self._filter_by_gpa(self.colleges, user_gpa)
-        
-        if not eligible_colleges:
-            return []
-        
-        # Filter colleges by preferred program
-        preferred_program = user_profile.get('preferred_program', '').lower().strip()
-        if preferred_program:
-            program_filtered = []
-            for college in eligible_colleges:
-                college_programs = [p.lower() for p in college['programs']]
-                program_match = any(
-                    preferred_program == cp or
-                    f" {preferred_program} " in f" {cp} " or
-                    (len(preferred_program) > 3 and preferred_program in cp)
-                    for cp in college_programs
-                )
-                if program_match:
-                    program_filtered.append(college)
+        preferred_program = user_profile.get('preferred_program', '')
+        snap = self.snapshot
+        
+        # Common inputs: the candidates come straight from the materialised top-N table
+        rows = self._materialized_rows(snap, user_profile, top_n, diversity)
+        if rows is None:
+            with metrics.stage('filter_gpa'):
+                eligible = self._filter_by_gpa(snap, user_gpa)
+            eligible_count = int(np.count_nonzero(eligible))
+            metrics.observe('recommender_candidates', eligible_count, 'Candidate colleges after each filter',
+                            metrics.SIZE_BUCKETS, filter='gpa')
+            tracing.annotate('candidates_after_gpa', eligible_count)
             
-            eligible_colleges = program_filtered
+            if not eligible_count:
+                return []
+            
+            # Filter colleges by preferred program: integer ids against the canonical program bitmaps
+            with metrics.stage('filter_program'):
+                eligible &= self._program_mask(snap, preferred_program)
+                rows = np.flatnonzero(eligible)
+            metrics.observe('recommender_candidates', len(rows), 'Candidate colleges after each filter',
+                            metrics.SIZE_BUCKETS, filter='program')
+            tracing.annotate('candidates_after_program', len(rows))
         
-        user_vector = self._user_to_vector(user_profile)
+        college_scores = self._score_variants(snap, user_profile, [{}], rows, top_n, diversity)[0]
         
-        college_scores = []
-        for college in eligible_colleges:
-            college_vector, weights = self._college_to_vector(college)
-            similarity = self._weighted_cosine_similarity(user_vector, college_vector, weights)
-            
-            matches = self._analyze_feature_matches(college, user_profile)
+        recommendations = []
+        with metrics.stage('explain'):
+            for item in college_scores[:top_n]:
+                if encoded:
+                    recommendations.append(snap.fragments.record(
+                        item['row'], self._score_fields(item, user_profile, fields, explain), fields))
+                else:
+                    recommendations.append(self._format_recommendation(item, user_profile, fields, explain))
+        
+        return recommendations
+    
+    def _materialized_rows(self, snap: CatalogSnapshot, user_profile: Dict, top_n: int,
+                           diversity: Optional[float]) -> Optional[np.ndarray]:
+        # Candidate rows from the top-N table, None when the request has to be scored live
+        table = snap.topn_table
+        if table is None:
+            return None
+        rows = None
+        if (diversity is None and not user_profile.get('max_distance_km')
+                and 'proximity_decay_km' not in user_profile):
+            with metrics.stage('lookup'):
+                rows = table.candidates(user_profile, top_n)
+        metrics.inc('topn_table_requests', 'Recommendation requests looked up in the top-N table',
+                    result='hit' if rows is not None else 'miss')
+        if rows is not None:
+            tracing.annotate('candidates_from_table', len(rows))
+        return rows
+    
+    def _program_mask(self, snap: CatalogSnapshot, preferred_program: str) -> np.ndarray:
+        # Colleges passing the program filter (an empty preference keeps every college)
+        if not preferred_program.strip():
+            return np.ones(snap.index.size, dtype=bool)
+        filter_bits, _ = self._resolve_program(snap, preferred_program)
+        return snap.index.unpack(snap.index.bitmap_for_bits('programs', filter_bits))
+    
+    def _value_table(self, snap: CatalogSnapshot, field: str, accept) -> np.ndarray:
+        # Boolean table over the index vocabulary of a field: which values `accept` (lowercased) takes
+        return np.array([accept(str(v).lower()) for v in snap.index.vocab[field]], dtype=bool)
+    
+    # Per-feature-group parts of the weighted cosine similarity. Each returns, for the candidate
+    # rows, (number of vocabulary values the user vector sets, hits between the user vector and
+    # each college vector, whether each college counts as a match for the explanation).
+    
+    def _stream_group(self, snap: CatalogSnapshot, stream: str, rows: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+        table = self._value_table(snap, 'streams', lambda v: v == stream.lower())
+        hits = self._set_hits(snap, 'streams', table, rows)
+        return int(np.count_nonzero(table)), hits, hits > 0
+    
+    def _program_group(self, snap: CatalogSnapshot, program: str, rows: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+        _, match_bits = self._resolve_program(snap, program)
+        table = np.array([(match_bits >> i) & 1 for i in range(len(snap.index.vocab['programs']))], dtype=bool)
+        hits = self._set_hits(snap, 'programs', table, rows)
+        return int(np.count_nonzero(table)), hits, hits > 0
+    
+    def _set_hits(self, snap: CatalogSnapshot, field: str, table: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # Per candidate row, how many of its values of a set field the vocabulary table selects
+        index = snap.index
+        if len(rows) * 16 < index.size:
+            # Few candidates (e.g. from the top-N table): only their own entries
+            owner, values = self._entries(snap, field, rows)
+            return np.bincount(owner, weights=table[values], minlength=len(rows))
+        return np.bincount(index.entry_rows[field], weights=table[index.entry_values[field]],
+                           minlength=index.size)[rows]
+    
+    def _entries(self, snap: CatalogSnapshot, field: str, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (position in rows, value id) of every entry of a set field for the given rows.
+        # Entries are stored in row order, so each college's values are one slice.
+        entry_rows = snap.index.entry_rows[field]
+        keys = rows.astype(entry_rows.dtype)   # same dtype, or numpy converts every entry
+        start = np.searchsorted(entry_rows, keys, 'left')
+        lengths = np.searchsorted(entry_rows, keys, 'right') - start
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.arange(lengths.sum()) + np.repeat(start - np.cumsum(lengths) + lengths, lengths)
+        return owner, snap.index.entry_values[field][positions]
+    
+    def _location_group(self, snap: CatalogSnapshot, location: str, rows: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+        # The vector matches substrings both ways, the explanation only the user's text in the college's
+        loc = location.lower()
+        codes = snap.index.codes['location'][rows]
+        vector_table = self._value_table(snap, 'location', lambda v: loc == 'any' or loc in v or v in loc)
+        match_table = self._value_table(snap, 'location', lambda v: loc == 'any' or loc in v)
+        return int(np.count_nonzero(vector_table)), vector_table[codes].astype(np.float64), match_table[codes]
+    
+    def _proximity_group(self, snap: CatalogSnapshot, location: str, rows: np.ndarray, decay_km: Optional[float],
+                         max_km: Optional[float]) -> Tuple:
+        # The location group with distances: colleges near the student's location get partial
+        # credit exp(-km / decay_km) instead of none, and with max_km farther ones are dropped.
+        # Distances are gathered from the precomputed table by location code, so this costs
+        # one lookup per college. Returns (user count, hits, exact match, closeness 0-1,
+        # km per college or None, within max_km or None); unknown places fall back to names.
+        count, hits, match = self._location_group(snap, location, rows)
+        closeness = match.astype(np.float64)
+        table = snap.distances.from_location(location) if (decay_km or max_km) else None
+        if table is None:
+            return count, hits, match, closeness, None, None
+        
+        codes = snap.index.codes['location'][rows]
+        distance = table[codes]
+        if decay_km:
+            near = np.exp(-table / decay_km)[codes]
+            hits = np.maximum(hits, near)
+            closeness = np.maximum(closeness, near)
+            # The user vector puts (at least) unit weight on their own location
+            count = max(count, 1)
+        within = (distance <= max_km) | match if max_km else None
+        return count, hits, match, closeness, distance, within
+    
+    def _budget_group(self, snap: CatalogSnapshot, budget: str, rows: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+        table = self._value_table(snap, 'budget_range', lambda v: v == budget.lower())
+        match = table[snap.index.codes['budget_range'][rows]]
+        return int(np.count_nonzero(table)), match.astype(np.float64), match
+    
+    def group_features(self, user_profile: Dict) -> Dict:
+        # Candidate colleges of a profile with the similarity split by feature group (FEATURE_GROUPS
+        # order), so any weights w give similarity = dot @ w**2 / sqrt(college_norm @ w**2 * user_norm @ w**2).
+        # Used by tune_weights.py to score many weight settings at once.
+        profile = self._handle_missing_data(self._preprocess_user_input(user_profile))
+        snap = self.snapshot
+        gpa = float(profile.get('gpa', 0))
+        rows = np.flatnonzero(self._filter_by_gpa(snap, gpa) & self._program_mask(snap, profile.get('preferred_program', '')))
+        
+        program = self._program_group(snap, profile.get('preferred_program', ''), rows)
+        stream = self._stream_group(snap, profile.get('stream', ''), rows)
+        location = self._location_group(snap, profile.get('location', ''), rows)
+        budget = self._budget_group(snap, profile.get('budget_range', ''), rows)
+        min_gpa = snap.index.min_gpa[rows] / 4.0
+        
+        return {
+            'rows': rows,
+            'ids': [snap.index.colleges[row]['id'] for row in rows],
+            'dot': np.column_stack([program[1], stream[1], location[1], budget[1], (gpa / 4.0) * min_gpa]),
+            'college_norm': np.column_stack([snap.program_counts[rows], snap.stream_counts[rows], np.ones(len(rows)),
+                                             np.ones(len(rows)), min_gpa ** 2]),
+            'user_norm': np.array([program[0], stream[0], location[0], budget[0], (gpa / 4.0) ** 2]),
+            'matches': {'program': program[2], 'stream': stream[2], 'location': location[2], 'budget': budget[2]}
+        }
+    
+    def _score_variants(self, snap: CatalogSnapshot, base_profile: Dict, variants: List[Dict], rows: np.ndarray,
+                        top_n: int, diversity: Optional[float] = None) -> List[List[Dict]]:
+        # Top-N scored colleges for each variant (base_profile updated with the variant) in one
+        # vectorised pass over the candidate rows. This is the weighted cosine of _user_to_vector
+        # and _college_to_vector written as per-feature-group dot products: only the groups a
+        # variant changes are evaluated per distinct value, everything else is shared.
+        index = snap.index
+        w = {k: v * v for k, v in self.feature_weights.items()}
+        profiles = [dict(base_profile, **variant) for variant in variants]
+        
+        with metrics.stage('vectorize'):
+            min_gpa = index.min_gpa[rows]
+            college_norm = self._college_norms(snap)[rows]
             
-            confidence = self._calculate_confidence(similarity, matches)
+            # Stream is never varied: one dot-product term for everyone
+            stream_count, stream_hits, stream_match = self._stream_group(snap, base_profile.get('stream', ''), rows)
+            stream_norm = w['stream'] * stream_count
             
-            feature_scores = {
-                'program_match': 1.0 if matches['program'] else 0.0,
-                'stream_match': 1.0 if matches['stream'] else 0.0,
-                'location_match': 1.0 if matches['location'] else 0.0,
-                'budget_match': 1.0 if matches['budget'] else 0.0,
-            }
+            # Terms per distinct value of the varied fields: (user norm part, dot part, match[, eligible])
+            program_terms = {}
+            for program in {p.get('preferred_program', '') for p in profiles}:
+                count, hits, match = self._program_group(snap, program, rows)
+                program_terms[program] = (w['program'] * count, w['program'] * hits, match,
+                                          self._program_mask(snap, program)[rows])
             
-            score_multiplier = 1.0
-            if matches['program']:
-                score_multiplier *= 2.0
+            # Distance options are not varied: every variant uses the base profile's
+            decay_km = base_profile.get('proximity_decay_km', self.proximity_decay_km)
+            max_km = base_profile.get('max_distance_km')
+            location_terms = {}
+            for location in {p.get('location', '') for p in profiles}:
+                count, hits, match, closeness, distance, within = self._proximity_group(snap, location, rows, decay_km,
+                                                                                        max_km)
+                location_terms[location] = (w['location'] * count, w['location'] * hits, match, closeness,
+                                            distance, within)
             
-            if matches['location']:
-                score_multiplier *= 2.0
+            budget_terms = {}
+            for budget in {p.get('budget_range', '') for p in profiles}:
+                count, _, match = self._budget_group(snap, budget, rows)
+                budget_terms[budget] = (w['budget'] * count, match)
+        
+        scored = []
+        with metrics.stage('score'):
+            inverse_norm = np.divide(1.0, college_norm, out=np.zeros(len(rows)), where=college_norm > 0)
+            combined = {}   # (program, location, budget) -> terms shared by variants differing only in GPA
+            for profile in profiles:
+                key = (profile.get('preferred_program', ''), profile.get('location', ''), profile.get('budget_range', ''))
+                terms = combined.get(key)
+                if terms is None:
+                    program_norm, program_dot, program_match, program_ok = program_terms[key[0]]
+                    location_norm, location_dot, location_match, closeness, distance, within = location_terms[key[1]]
+                    budget_norm, budget_match = budget_terms[key[2]]
+                    location_boost = self.match_boosts['location']
+                    terms = combined[key] = (
+                        program_norm + stream_norm + location_norm + budget_norm,
+                        program_dot + w['stream'] * stream_hits + location_dot + w['budget'] * budget_match,
+                        0.1 * program_match + 0.08 * stream_match + 0.15 * closeness,
+                        np.where(program_match, self.match_boosts['program'], 1.0)
+                        * np.where(location_match, location_boost, 1.0 + (location_boost - 1.0) * closeness),
+                        program_ok if within is None else program_ok & within,
+                        program_match, location_match, budget_match, closeness, distance, within
+                    )
+                user_norm_part, dot_part, bonus, multiplier, program_ok = terms[:5]
+                
+                gpa = float(profile.get('gpa', 0))
+                user_norm = math.sqrt(user_norm_part + w['gpa'] * (gpa / 4.0) ** 2)
+                similarity = dot_part + (w['gpa'] * gpa / 16.0) * min_gpa
+                similarity *= inverse_norm
+                similarity *= 1.0 / user_norm if user_norm > 0 else 0.0
+                
+                confidence = np.minimum(similarity + bonus, 1.0)
+                score = similarity * confidence
+                score *= multiplier
+                
+                # Variants only see the colleges their own GPA and program filters allow
+                eligible = program_ok & (min_gpa <= gpa)
+                score[~eligible] = -np.inf
+                scored.append((score, int(np.count_nonzero(eligible)), similarity, confidence) + terms[5:])
+        
+        with metrics.stage('sort'):
+            if diversity is None:
+                tops = [self._top_positions(score, min(top_n, count)) for score, count, *_ in scored]
+            else:
+                pool_size = max(MMR_POOL_FACTOR * top_n, MMR_MIN_POOL)
+                pools = [self._top_positions(score, min(pool_size, count)) for score, count, *_ in scored]
+        
+        if diversity is not None:
+            with metrics.stage('diversify'):
+                tops = []
+                for pool, (score, count, *_) in zip(pools, scored):
+                    similarity = self._college_similarities(snap, rows[pool])
+                    tops.append(pool[self._diverse_positions(score[pool], similarity, min(top_n, count), diversity)])
+        
+        results = []
+        for top, (score, _, similarity, confidence, program_match, location_match, budget_match,
+                  closeness, distance, within) in zip(tops, scored):
+            items = []
+            for pos in top:
+                matches = {
+                    'program': bool(program_match[pos]),
+                    'stream': bool(stream_match[pos]),
+                    'location': bool(location_match[pos]),
+                    'budget': bool(budget_match[pos]),
+                    'gpa_eligible': True
+                }
+                items.append({
+                    'row': int(rows[pos]),
+                    'college': index.colleges[rows[pos]],
+                    'similarity': float(similarity[pos]),
+                    'confidence': float(confidence[pos]),
+                    'matches': matches,
+                    'feature_scores': {
+                        'program_match': 1.0 if matches['program'] else 0.0,
+                        'stream_match': 1.0 if matches['stream'] else 0.0,
+                        'location_match': round(float(closeness[pos]), 3),
+                        'budget_match': 1.0 if matches['budget'] else 0.0,
+                    },
+                    'score': float(score[pos])
+                })
+                if distance is not None and np.isfinite(distance[pos]):
+                    items[-1]['distance_km'] = round(float(distance[pos]), 1)
+                    # Worth a mention when the student asked for a radius or it earned real credit
+                    items[-1]['nearby'] = not matches['location'] and (within is not None or closeness[pos] >= 0.5)
+            results.append(items)
+        
+        return results
+    
+    def _college_norms(self, snap: CatalogSnapshot) -> np.ndarray:
+        # Weighted norm of every college vector, recomputed only when the feature weights change
+        w = {k: v * v for k, v in self.feature_weights.items()}
+        key = tuple(sorted(w.items()))
+        norms_key, norms = snap.norms
+        if norms_key != key:
+            norms = np.sqrt(w['program'] * snap.program_counts + w['stream'] * snap.stream_counts
+                            + w['location'] + w['budget'] + w['gpa'] * (snap.index.min_gpa / 4.0) ** 2)
+            snap.norms = (key, norms)
+        return norms
+    
+    def _college_similarities(self, snap: CatalogSnapshot, rows: np.ndarray) -> np.ndarray:
+        # Weighted cosine similarity between every pair of the given colleges, over the same
+        # features as _college_to_vector (programs, streams, location, budget, GPA requirement)
+        index = snap.index
+        w = self.feature_weights
+        n = len(rows)
+        blocks = []
+        for field, weight in (('programs', w['program']), ('streams', w['stream'])):
+            owner, values = self._entries(snap, field, rows)
+            block = np.zeros((n, len(index.vocab[field])))
+            block[owner, values] = weight
+            blocks.append(block)
+        for field, weight in (('location', w['location']), ('budget_range', w['budget'])):
+            block = np.zeros((n, len(index.vocab[field])))
+            block[np.arange(n), index.codes[field][rows]] = weight
+            blocks.append(block)
+        blocks.append((w['gpa'] * index.min_gpa[rows] / 4.0)[:, None])
+        
+        vectors = np.hstack(blocks)
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors /= np.where(norms > 0, norms, 1.0)[:, None]
+        return vectors @ vectors.T
+    
+    @staticmethod
+    def _diverse_positions(score: np.ndarray, similarity: np.ndarray, k: int, diversity: float) -> np.ndarray:
+        # Maximal marginal relevance: k steps, each taking the candidate with the best
+        # (1 - diversity) * relevance - diversity * (similarity to the closest one already taken).
+        # `score` must be best first (ties then go to the better ranked candidate).
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        best = score[0]
+        relevance = score / best if best > 0 else np.zeros(len(score))
+        redundancy = np.zeros(len(score))
+        available = np.ones(len(score), dtype=bool)
+        chosen = []
+        for _ in range(k):
+            gain = (1.0 - diversity) * relevance - diversity * redundancy
+            gain[~available] = -np.inf
+            pick = int(np.argmax(gain))
+            chosen.append(pick)
+            available[pick] = False
+            redundancy = np.maximum(redundancy, similarity[pick])
+        return np.array(chosen, dtype=np.int64)
+    
+    @staticmethod
+    def _top_positions(score: np.ndarray, k: int) -> np.ndarray:
+        # Positions of the k best scores, best first; ties keep catalog order like a stable sort
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < len(score):
+            threshold = np.partition(score, len(score) - k)[len(score) - k]
+            positions = np.flatnonzero(score >= threshold)
+        else:
+            positions = np.arange(len(score))
+        return positions[np.lexsort((positions, -score[positions]))][:k]
+    
+    def what_if(self, base_profile: Dict, variations: Dict[str, List], top_n: int = 5,
+                fields: Optional[List[str]] = None, explain: bool = False,
+                diversity: Optional[float] = None) -> List[Dict]:
+        # Recommendations for every combination of the given variations of a base profile
+        # (e.g. {'gpa': [2.8, 3.0, 3.2], 'budget_range': ['low', 'medium']} gives 6 variants),
+        # scored together over the union of their candidate colleges
+        base_profile = self._handle_missing_data(self._preprocess_user_input(base_profile))
+        keys = [key for key in WHAT_IF_FIELDS if variations.get(key)]
+        variants = []
+        for combination in itertools.product(*(variations[key] for key in keys)):
+            variant = dict(zip(keys, combination))
+            if 'gpa' in variant:
+                variant['gpa'] = float(variant['gpa'])
+            for key in ('preferred_program', 'location', 'budget_range'):
+                if key in variant:
+                    variant[key] = str(variant[key]).strip()
+            variants.append(variant)
+        if len(variants) > MAX_WHAT_IF_VARIANTS:
+            raise ValueError(f'Too many variants ({len(variants)}); at most {MAX_WHAT_IF_VARIANTS} are allowed')
+        tracing.annotate('variants', len(variants))
+        snap = self.snapshot
+        
+        # Candidates: colleges at least one variant can get into
+        with metrics.stage('filter_gpa'):
+            max_gpa = max(float(dict(base_profile, **v).get('gpa', 0)) for v in variants)
+            eligible = self._filter_by_gpa(snap, max_gpa)
+        with metrics.stage('filter_program'):
+            programs = {dict(base_profile, **v).get('preferred_program', '') for v in variants}
+            program_mask = np.zeros(snap.index.size, dtype=bool)
+            for program in programs:
+                program_mask |= self._program_mask(snap, program)
+            rows = np.flatnonzero(eligible & program_mask)
+        tracing.annotate('candidates', len(rows))
+        
+        scored = self._score_variants(snap, base_profile, variants, rows, top_n, diversity)
+        
+        results = []
+        with metrics.stage('explain'):
+            for variant, items in zip(variants, scored):
+                profile = dict(base_profile, **variant)
+                recommendations = [self._format_recommendation(item, profile, fields, explain) for item in items]
+                results.append({'variant': variant, 'recommendations': recommendations, 'count': len(recommendations)})
+        return results
+    
+    def snapshot_fingerprint(self, snap: Optional[CatalogSnapshot] = None) -> str:
+        # Identifies the live catalog (in row order) and the scoring settings, for top-N tables
+        snap = snap or self.snapshot
+        digest = hashlib.sha1(snap.fragments.array(np.flatnonzero(snap.index.live).tolist()))
+        digest.update(dumps([sorted(self.feature_weights.items()), sorted(self.match_boosts.items()),
+                             self.proximity_decay_km]))
+        return digest.hexdigest()
+    
+    def build_topn_table(self, top_n: int = 10) -> TopNTable:
+        # Candidates for every (program, stream, location, budget range, GPA bucket) combination
+        # (see topn_table.py). Each college's similarity over a bucket's GPA range is bounded from
+        # its closed form (D + b*g*m) / sqrt(U + b*g^2), which rises up to g = m*U/D and falls after;
+        # colleges whose best score in the bucket stays below N others' worst scores are dropped.
+        snap = self.snapshot
+        index = snap.index
+        fingerprint = self.snapshot_fingerprint(snap)
+        w = {k: v * v for k, v in self.feature_weights.items()}
+        beta = w['gpa'] / 16.0
+        live = np.flatnonzero(index.live)
+        breakpoints = np.unique(index.min_gpa[live])
+        upper = max([4.0] + breakpoints.tolist())
+        edges = np.append(breakpoints, upper)   # bucket i covers GPAs edges[i] to edges[i + 1]
+        dims = {
+            'preferred_program': list(dict.fromkeys(p.lower() for p in snap.all_programs)),
+            'stream': list(dict.fromkeys(s.lower() for s in index.vocab['streams'])),
+            'location': list(dict.fromkeys([l.lower() for l in index.vocab['location']] + ['any'])),
+            'budget_range': list(dict.fromkeys(b.lower() for b in index.vocab['budget_range'])),
+        }
+        norms = self._college_norms(snap)
+        row_ids = np.array([college['id'] for college in index.colleges], dtype=np.int64)
+        boosts = self.match_boosts
+        
+        candidates = []
+        counts = []
+        for program in dims['preferred_program']:
+            rows = np.flatnonzero(self._program_mask(snap, program) & index.live)
+            min_gpa = index.min_gpa[rows]
+            inverse_norm = np.divide(1.0, norms[rows], out=np.zeros(len(rows)), where=norms[rows] > 0)
+            eligible = min_gpa[:, None] <= edges[None, :-1]
+            program_count, program_hits, program_match = self._program_group(snap, program, rows)
+            streams = [self._stream_group(snap, stream, rows) for stream in dims['stream']]
+            locations = [self._proximity_group(snap, location, rows, self.proximity_decay_km, None)[:4]
+                         for location in dims['location']]
+            budgets = [self._budget_group(snap, budget, rows) for budget in dims['budget_range']]
             
-            college_scores.append({
-                'college': college,
-                'similarity': similarity,
-                'confidence': confidence,
-                'matches': matches,
-                'feature_scores': feature_scores,
-                'score': similarity * confidence * score_multiplier
-            })
+            for stream_count, stream_hits, stream_match in streams:
+                for location_count, location_hits, location_match, closeness in locations:
+                    multiplier = (np.where(program_match, boosts['program'], 1.0)
+                                  * np.where(location_match, boosts['location'],
+                                             1.0 + (boosts['location'] - 1.0) * closeness))
+                    bonus = 0.1 * program_match + 0.08 * stream_match + 0.15 * closeness
+                    for budget_count, _, budget_match in budgets:
+                        user_norm_part = (w['program'] * program_count + w['stream'] * stream_count
+                                          + w['location'] * location_count + w['budget'] * budget_count)
+                        dot = (w['program'] * program_hits + w['stream'] * stream_hits
+                               + w['location'] * location_hits + w['budget'] * budget_match)
+                        keep = self._bucket_candidates(dot, min_gpa, inverse_norm, user_norm_part, beta,
+                                                       bonus, multiplier, edges, eligible, top_n)
+                        bucket, position = np.nonzero(keep.T)
+                        candidates.append(row_ids[rows[position]])
+                        counts.append(np.bincount(bucket, minlength=len(breakpoints)))
         
-        college_scores.sort(key=lambda x: x['score'], reverse=True)
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(counts))]) if counts else np.zeros(1)
+        ids = np.concatenate(candidates) if candidates else np.zeros(0)
+        return TopNTable({field: dims[field] for field in KEY_FIELDS}, breakpoints, upper,
+                         offsets.astype(np.int64), ids.astype(np.int32), top_n, fingerprint)
+    
+    @staticmethod
+    def _bucket_candidates(dot, min_gpa, inverse_norm, user_norm_part, beta, bonus, multiplier,
+                           edges, eligible, top_n) -> np.ndarray:
+        # rows x buckets mask of the colleges that can reach the top N somewhere in each GPA bucket
+        def similarity(gpa):
+            return (dot[:, None] + beta * gpa * min_gpa[:, None]) * inverse_norm[:, None] / np.sqrt(
+                user_norm_part + beta * gpa ** 2)
         
-        recommendations = []
-        for item in college_scores[:top_n]:
-            college = item['college'].copy()
-            college['similarity_score'] = round(item['similarity'], 3)
-            college['confidence_score'] = round(item['confidence'], 3)
-            college['combined_score'] = round(item['score'], 3)
-            college['feature_matches'] = item['matches']
-            college['feature_scores'] = item['feature_scores']
-            college['explanation'] = self._generate_explanation(
-                college, user_profile, item['similarity'], item['matches']
-            )
-            recommendations.append(college)
+        def score(sim):
+            # As in _score_variants; increasing in the similarity
+            return sim * np.minimum(sim + bonus[:, None], 1.0) * multiplier[:, None]
         
-        return recommendations
+        at_edges = similarity(edges[None, :])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            peak_gpa = np.where(dot > 0, min_gpa * user_norm_part / dot, np.inf)
+            peak = np.where(np.isfinite(peak_gpa), similarity(peak_gpa[:, None])[:, 0], 0.0)
+        inside = (peak_gpa[:, None] > edges[None, :-1]) & (peak_gpa[:, None] < edges[None, 1:])
+        low = np.minimum(at_edges[:, :-1], at_edges[:, 1:])
+        high = np.maximum(np.maximum(at_edges[:, :-1], at_edges[:, 1:]), np.where(inside, peak[:, None], 0.0))
+        
+        worst = np.where(eligible, score(low), -np.inf)
+        n = len(dot)
+        if n > top_n:
+            threshold = np.partition(worst, n - top_n, axis=0)[n - top_n]
+        else:
+            threshold = np.full(worst.shape[1], -np.inf)
+        # A little slack so rounding never drops a college the live scoring would rank
+        return eligible & (score(high) * (1 + 1e-9) + 1e-12 >= threshold[None, :])
+    
+    def attach_topn_table(self, table: TopNTable) -> bool:
+        # Serve matching requests from a top-N table, if it was built for the current snapshot
+        with self._write_lock:
+            snap = self.snapshot
+            if table.fingerprint != self.snapshot_fingerprint(snap):
+                return False
+            table.bind(snap.index.row_of)
+            self.snapshot = snap.replace(topn_table=table)
+        return True
+    
+    def colleges_json(self) -> bytes:
+        # The live catalog as a JSON array, cached until the catalog changes
+        snap = self.snapshot
+        body = snap.colleges_json
+        if body is None:
+            body = snap.colleges_json = snap.fragments.array(snap.ordered_rows().tolist())
+        return body
+
+    def catalog_changes(self, since: Optional[str]) -> bytes:
+        # JSON with the colleges added, changed and deleted after a catalog version token, or
+        # the whole catalog ("resync": true) when the token is unknown, older than the change
+        # log, or the changes would outnumber half the catalog
+        # Edits are published before they are recorded, so the snapshot is at least this version
+        version, changes = self.changes.since(since)
+        snap = self.snapshot
+        parts = [b'"version":' + dumps(version)]
+        if changes is None or len(changes) > snap.count // 2:
+            metrics.inc('catalog_sync_requests', 'Catalog sync requests by outcome', result='resync')
+            parts += [b'"resync":true', b'"colleges":' + self.colleges_json()]
+            return join_object(parts)
+        
+        metrics.inc('catalog_sync_requests', 'Catalog sync requests by outcome', result='delta')
+        row_of = snap.index.row_of
+        rows = {'added': [], 'changed': []}
+        deleted = []
+        for college_id, status in changes.items():
+            row = row_of.get(college_id)
+            if status == 'deleted' or row is None:
+                deleted.append(college_id)
+            else:
+                rows[status].append(row)
+        parts += [b'"resync":false', b'"added":' + snap.fragments.array(rows['added']),
+                  b'"changed":' + snap.fragments.array(rows['changed']), b'"deleted":' + dumps(deleted)]
+        return join_object(parts)
+    
+    def memory_parts(self) -> Dict[str, Dict]:
+        # The structures behind each memory subsystem (see memory.report); those in
+        # CATALOG_SUBSYSTEMS only change with memory_version()
+        snap = self.snapshot
+        index = snap.index
+        return {
+            'college_records': {'rows': index.colleges, 'positions': snap.positions, 'catalog': snap.catalog},
+            'vocabulary': {
+                'values': [snap.all_programs, snap.all_streams, snap.all_locations, snap.all_budget_ranges,
+                           snap.all_career_focus, snap.all_interests],
+                'value_ids': [index.vocab, index.bit_of, index.lookup],
+                'aliases': self.aliases,
+            },
+            'caches': {
+                'comparison': self.comparison_cache,
+                'program_resolution': self.program_cache,
+                'encoded_records': snap.fragments,
+                'catalog_json': snap.colleges_json,
+            },
+            'feature_matrices': {
+                'columns': [index.min_gpa, index.budget, index.established, index.live, index.codes],
+                'entries': [index.entry_rows, index.entry_values],
+                'row_bits': index.row_bits,
+                'vector_norms': [snap.program_counts, snap.stream_counts, snap.norms[1]],
+            },
+            'indexes': {
+                'bitmaps': index.bitmaps,
+                'row_of': index.row_of,
+                'duplicate_keys': snap.keys,
+                'text': snap.text_index,
+                'distances': snap.distances,
+                'topn_table': snap.topn_table,
+                'statistics': snap.stats,
+                'other': index,
+            },
+        }
     
+    def memory_version(self) -> Tuple:
+        # Changes whenever a structure of CATALOG_SUBSYSTEMS is replaced or grows
+        snap = self.snapshot
+        return (id(self), snap.version, snap.norms[0])
+    
+    def dead_rows(self) -> int:
+        # Deleted or replaced rows awaiting compaction
+        snap = self.snapshot
+        return snap.index.size - snap.count
+
     def compare_colleges(self, college_ids: List[int]) -> Dict:
-        # Compare multiple colleges
-        selected_colleges = [c for c in self.colleges if c['id'] in college_ids]
+        # Compare multiple colleges; identical id sets are served from cache
+        snap = self.snapshot
+        rows = snap.index.rows_for_ids(college_ids)
         
-        if not selected_colleges:
+        if not rows:
             return {'error': 'No colleges found'}
         
+        return self.comparison_cache.get_or_compute((snap.version, tuple(rows)),
+                                                    lambda: self._build_comparison(snap, rows))
+    
+    def _build_comparison(self, snap: CatalogSnapshot, rows: List[int]) -> Dict:
+        # Shared/unique features, pairwise similarity and numeric deltas in one pass over the index
+        index = snap.index
+        selected_colleges = [index.colleges[row] for row in rows]
+        ids = [college['id'] for college in selected_colleges]
+        n = len(rows)
+        
         comparison = {
             'colleges': selected_colleges,
+            'college_ids': ids,
             'common_features': {},
-            'differences': {}
+            'differences': {
+                'unique_features': {cid: {} for cid in ids},
+                'similarity': {}
+            }
         }
         
-        # Find common programs
-        if len(selected_colleges) > 0:
-            common_programs = set(selected_colleges[0]['programs'])
-            for college in selected_colleges[1:]:
-                common_programs &= set(college['programs'])
-            comparison['common_features']['programs'] = list(common_programs)
+        overall = np.zeros((n, n))
+        for field in SET_FIELDS:
+            bits = [index.row_bits[field][row] for row in rows]
+            
+            # Prefix/suffix unions give "everyone else" for each college without a nested loop
+            common = bits[0]
+            prefix = [0] * (n + 1)
+            suffix = [0] * (n + 1)
+            for i in range(n):
+                common &= bits[i]
+                prefix[i + 1] = prefix[i] | bits[i]
+                suffix[n - 1 - i] = suffix[n - i] | bits[n - 1 - i]
+            comparison['common_features'][field] = index.decode(field, common)
+            
+            counts = [popcount(b) for b in bits]
+            similarity = np.eye(n)
+            for i in range(n):
+                others = prefix[i] | suffix[i + 1]
+                comparison['differences']['unique_features'][ids[i]][field] = index.decode(field, bits[i] & ~others)
+                for j in range(i + 1, n):
+                    shared = popcount(bits[i] & bits[j])
+                    union = counts[i] + counts[j] - shared
+                    similarity[i, j] = similarity[j, i] = shared / union if union else 1.0
+            comparison['differences']['similarity'][field] = np.round(similarity, 3).tolist()
+            overall += similarity
+        comparison['differences']['similarity']['overall'] = np.round(overall / len(SET_FIELDS), 3).tolist()
+        
+        # Numeric attributes: values, spread and pairwise deltas (column minus row)
+        for name, column in (('min_gpa', index.min_gpa), ('budget_range', index.budget), ('established', index.established)):
+            raw = column[rows]
+            values = raw.astype(np.float64)
+            comparison['differences'][name] = {
+                'values': raw.tolist() if name != 'budget_range' else [c['budget_range'] for c in selected_colleges],
+                'min': raw.min().item(),
+                'max': raw.max().item(),
+                'spread': round(float(values.max() - values.min()), 3),
+                'deltas': np.round(values[None, :] - values[:, None], 3).tolist()
+            }
         
         return comparison
     
+    def search(self, filters: Dict[str, List[str]], gpa_range: Tuple[Optional[float], Optional[float]] = (None, None),
+               offset: int = 0, limit: int = 20, sort: Optional[str] = None, fields: Optional[List[str]] = None,
+               query: Optional[str] = None) -> Dict:
+        # Faceted search: one page of matching colleges plus value counts per facet
+        # With a text query only matching colleges count, ranked by BM25 unless `sort` is given
+        snap = self.snapshot
+        relevance = None
+        base_mask = None
+        if query and query.strip():
+            with metrics.stage('search_text'):
+                text_rows, text_scores = snap.text_index.search(query)
+                base_mask = np.zeros(snap.index.size, dtype=bool)
+                base_mask[text_rows] = True
+                relevance = np.zeros(snap.index.size)
+                relevance[text_rows] = text_scores
+        
+        with metrics.stage('search_filter'):
+            rows, facets = snap.index.search(filters, gpa_range, base_mask)
+        
+        column = {'min_gpa': snap.index.min_gpa, 'established': snap.index.established}.get((sort or '').lstrip('-'))
+        if column is not None:
+            order = np.argsort(column[rows], kind='stable')
+            rows = rows[order[::-1]] if sort.startswith('-') else rows[order]
+        elif relevance is not None:
+            rows = rows[np.argsort(-relevance[rows], kind='stable')]
+        
+        page = []
+        for row in rows[offset:offset + limit]:
+            college = snap.index.colleges[row]
+            if fields is None:
+                page.append(college)
+            else:
+                page.append({'id': college['id'], **{f: college[f] for f in fields if f in college}})
+        
+        return {
+            'results': page,
+            'total': int(len(rows)),
+            'offset': offset,
+            'limit': limit,
+            'facets': facets
+        }
+    
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict]:
+        # Typeahead suggestions for a partly typed college name or keyword
+        snap = self.snapshot
+        rows = snap.text_index.suggest(prefix, limit)
+        colleges = [snap.index.colleges[row] for row in rows]
+        return [{'id': c['id'], 'name': c['name'], 'location': c['location']} for c in colleges]
+    
+    def _count_statistics(self, colleges: List[Dict]) -> Dict:
+        # Running totals behind get_statistics(), kept up to date by the admin mutations
+        stats = {'by_location': Counter(), 'by_budget': Counter(), 'by_stream': Counter(), 'gpa_total': 0.0}
+        for college in colleges:
+            self._tally(stats, college, 1)
+        return stats
+    
+    @staticmethod
+    def _tally(stats: Dict, college: Dict, sign: int):
+        # Add (sign=1) or remove (sign=-1) a college from the running statistics
+        counts = [(stats['by_location'], college['location']), (stats['by_budget'], college['budget_range'])]
+        counts += [(stats['by_stream'], stream) for stream in college['streams']]
+        for counter, key in counts:
+            counter[key] += sign
+            if counter[key] <= 0:
+                del counter[key]
+        stats['gpa_total'] += sign * college['min_gpa']
+    
     def get_statistics(self) -> Dict:
         # Get statistics about colleges
+        snap = self.snapshot
         stats = {
-            'total_colleges': len(self.colleges),
-            'by_location': {},
-            'by_budget': {},
-            'by_stream': {},
-            'programs_count': len(self.all_programs),
+            'total_colleges': snap.count,
+            'by_location': dict(snap.stats['by_location']),
+            'by_budget': dict(snap.stats['by_budget']),
+            'by_stream': dict(snap.stats['by_stream']),
+            'programs_count': len(snap.all_programs),
             'average_min_gpa': 0.0
         }
         
-        total_gpa = 0
-        for college in self.colleges:
-            # Location stats
-            loc = college['location']
-            stats['by_location'][loc] = stats['by_location'].get(loc, 0) + 1
-            
-            # Budget stats
-            budget = college['budget_range']
-            stats['by_budget'][budget] = stats['by_budget'].get(budget, 0) + 1
-            
-            # Stream stats
-            for stream in college['streams']:
-                stats['by_stream'][stream] = stats['by_stream'].get(stream, 0) + 1
-            
-            total_gpa += college['min_gpa']
-        
-        stats['average_min_gpa'] = round(total_gpa / len(self.colleges), 2)
+        if snap.count:
+            stats['average_min_gpa'] = round(snap.stats['gpa_total'] / snap.count, 2)
         
         return stats
+    
+    def _prepare_college(self, snap: CatalogSnapshot, college: Dict, college_id: int) -> Dict:
+        # Validate a college from the admin API and bring it into catalog form
+        missing = [field for field in COLLEGE_REQUIRED_FIELDS if college.get(field) in (None, '', [])]
+        if missing:
+            raise ValueError('Missing required fields: ' + ', '.join(missing))
+        
+        college = dict(college)
+        college['id'] = int(college_id)
+        college['min_gpa'] = float(college['min_gpa'])
+        for field in ('name', 'location', 'budget_range', 'type'):
+            if field in college:
+                college[field] = str(college[field]).strip()
+        for field in ('programs', 'streams', 'career_focus', 'interests', 'facilities'):
+            values = college.get(field)
+            if isinstance(values, str):
+                values = values.split(',')
+            if values is not None:
+                college[field] = list(dict.fromkeys(str(v).strip() for v in values if str(v).strip()))
+        college['programs'] = list(dict.fromkeys(canonical_program(p) for p in college['programs']))
+        
+        duplicate = snap.keys.get(college_key(college))
+        if duplicate is not None and duplicate != college['id']:
+            raise ValueError(f"College {duplicate} already has this name and location")
+        return college
+    
+    def _append(self, snap: CatalogSnapshot, college: Dict, position: Optional[int] = None):
+        # Add a college to every derived structure of an unpublished snapshot as a new row, at
+        # the end of the catalog unless a catalog position is given
+        index = snap.index
+        row = index.add(college)
+        snap.positions = appended(snap.positions, row if position is None else position)
+        snap.count += 1
+        snap.text_index.add(row, college)
+        for alias, kept in self.aliases.items():
+            if kept == college['id']:
+                index.row_of[alias] = row
+        snap.distances.extend(index.vocab['location'])
+        snap.program_counts = appended(snap.program_counts, len(college['programs']))
+        snap.stream_counts = appended(snap.stream_counts, len(college['streams']))
+        snap.keys[college_key(college)] = college['id']
+        self._tally(snap.stats, college, 1)
+        
+        # New values extend the feature vocabulary (ids stay stable until compaction)
+        snap.all_programs.extend(index.vocab['programs'][len(snap.all_programs):])
+        snap.all_streams.extend(index.vocab['streams'][len(snap.all_streams):])
+        if college['location'] not in snap.all_locations:
+            snap.all_locations.append(college['location'])
+        if college['budget_range'] not in snap.all_budget_ranges:
+            snap.all_budget_ranges.append(college['budget_range'])
+        snap.all_career_focus.update(college.get('career_focus', []))
+        snap.all_interests.update(college.get('interests', []))
+    
+    def _remove(self, snap: CatalogSnapshot, college: Dict):
+        # Tombstone a college's row in an unpublished snapshot
+        row = snap.index.row_of[college['id']]
+        snap.index.delete(row)
+        snap.text_index.delete(row, college)
+        snap.count -= 1
+        snap.keys.pop(college_key(college), None)
+        self._tally(snap.stats, college, -1)
+    
+    @staticmethod
+    def _position(snap: CatalogSnapshot, college: Dict) -> int:
+        # Catalog position of a live college
+        return int(snap.positions[snap.index.row_of[college['id']]])
+    
+    def _publish(self, snap: CatalogSnapshot, operation: str, college_id: int):
+        # Serve an edited snapshot, record the edit, drop results computed from older
+        # snapshots and compact once enough rows are dead
+        self.snapshot = snap
+        self.changes.record(college_id, operation)
+        self.comparison_cache.clear()
+        self.program_cache.clear()
+        metrics.inc('catalog_mutations', 'Colleges added, updated or deleted through the admin API', operation=operation)
+        if self.dead_rows() >= max(COMPACT_MIN_ROWS, COMPACT_RATIO * snap.index.size) and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, daemon=True).start()
+    
+    def add_college(self, college: Dict) -> Dict:
+        # Add a college; it is recommendable as soon as this returns
+        with self._write_lock:
+            college_id = int(college.get('id') or self.next_id)
+            if self.get_college(college_id) is not None:
+                raise ValueError(f'College {college_id} already exists')
+            snap = self.snapshot.copy()
+            college = self._prepare_college(snap, college, college_id)
+            self._append(snap, college)
+            self.next_id = max(self.next_id, college_id + 1)
+            self._publish(snap, 'add', college_id)
+        return college
+    
+    def update_college(self, college_id: int, changes: Dict) -> Dict:
+        # Change fields of a college: the old row is tombstoned and the new version appended
+        with self._write_lock:
+            old = self.get_college(college_id)
+            if old is None:
+                raise KeyError(college_id)
+            snap = self.snapshot.copy()
+            college = self._prepare_college(snap, {**old, **changes}, old['id'])
+            position = self._position(snap, old)
+            self._remove(snap, old)
+            self._append(snap, college, position)
+            self._publish(snap, 'update', old['id'])
+        return college
+    
+    def delete_college(self, college_id: int) -> Dict:
+        # Remove a college (and the ids of duplicates merged into it)
+        with self._write_lock:
+            old = self.get_college(college_id)
+            if old is None:
+                raise KeyError(college_id)
+            snap = self.snapshot.copy()
+            self._remove(snap, old)
+            merged = [alias for alias, kept in self.aliases.items() if kept == old['id']]
+            for alias in merged:
+                snap.index.row_of.pop(alias, None)
+            self.aliases = {alias: kept for alias, kept in self.aliases.items() if kept != old['id']}
+            self._publish(snap, 'delete', old['id'])
+        return old
+    
+    def compact(self) -> Dict:
+        # Rebuild every derived structure from the live colleges: drops dead rows
+        # and puts newly added vocabulary values back in sorted order
+        with self._write_lock:
+            snap = self.snapshot
+            catalog = compile_catalog(snap.colleges)
+            catalog['aliases'] = self.aliases
+            self.snapshot = self._build(catalog, snap.version + 1)
+            self.comparison_cache.clear()
+            self.program_cache.clear()
+            self._compacting = False
+        return {'rows_before': snap.index.size, 'rows': self.snapshot.index.size, 'colleges': snap.count}
@@ -5,10 +5,12 @@ import math
 from typing import List, Dict, Tuple
 
 class CollegeRecommender:
-    def __init__(self, colleges_file: str):
-        # Initialize the recommender with college data
-        with open(colleges_file, 'r', encoding='utf-8') as f:
-            self.colleges = json.load(f)
+    def __init__(self, colleges_file: str = None, colleges: List[Dict] = None):
+        # Initialize the recommender with college data, read from the file unless the records are given
+        if colleges is None:
+            with open(colleges_file, 'r', encoding='utf-8') as f:
+                colleges = json.load(f)
+        self.colleges = colleges
         
         self._build_vocabulary()
         
@@ -0,0 +1,231 @@
+# Containers that are cheap to copy, for catalog snapshots
+#
+# An admin edit copies the snapshot it changes (see ml_recommender.py), so
+# the per-row lists and dicts of a large catalog must not be copied whole.
+# ChunkedList stores a list as chunks of at most CHUNK items: a copy shares
+# every chunk and copies one the first time it changes it. LayeredDict keeps
+# a shared base dict plus the changes made since: a copy copies only the
+# changes, which are folded into a new base once there are MERGE_AT of them.
+# appended() grows a numpy column the same way: a new row is written into
+# spare room after the end of the column's buffer and the result is a longer
+# view of it, which arrays holding fewer rows never see. Either way an edit
+# costs about a chunk or a layer, not the catalog size.
+#
+# A copy is made to be edited while the original keeps serving readers, so
+# the original must not be changed after copy() (snapshots never are), and
+# only the newest column over a buffer may be passed to appended().
+
+import bisect
+import itertools
+import sys
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+CHUNK = 512
+MERGE_AT = 1024
+# Spare room given to a column that has to be reallocated: an eighth of its length, at least MIN_SPARE items
+MIN_SPARE = 16
+
+_MISSING = object()
+_DELETED = object()
+
+
+def appended(array: np.ndarray, values) -> np.ndarray:
+    # array with values appended, like np.append, but written into spare room after the end
+    # of its buffer when there is some (array must be the longest view of that buffer)
+    values = np.asarray(values, dtype=array.dtype).ravel()
+    n, k = len(array), len(values)
+    base = array.base
+    if (isinstance(base, np.ndarray) and base.ndim == 1 and base.dtype == array.dtype and len(base) >= n + k
+            and base.__array_interface__['data'][0] == array.__array_interface__['data'][0]):
+        base[n:n + k] = values
+        return base[:n + k]
+    buffer = np.empty(n + k + max(MIN_SPARE, n // 8), dtype=array.dtype)
+    buffer[:n] = array
+    buffer[n:n + k] = values
+    return buffer[:n + k]
+
+
+class ChunkedList:
+    # List with shared, copy-on-write chunks; supports indexing, slicing, append, insert
+    # and item assignment (bisect and insort work on it like on a list)
+    __slots__ = ('_chunks', '_starts', '_owned', '_len')
+
+    def __init__(self, items: Iterable = ()):
+        items = list(items)
+        self._chunks = [items[i:i + CHUNK] for i in range(0, len(items), CHUNK)] or [[]]
+        self._owned = set(map(id, self._chunks))   # chunks no other list holds
+        self._len = len(items)
+        self._reindex()
+
+    def _reindex(self):
+        # Position of each chunk's first item
+        self._starts = list(itertools.accumulate((len(chunk) for chunk in self._chunks[:-1]), initial=0))
+
+    def _locate(self, i: int):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('list index out of range')
+        k = bisect.bisect_right(self._starts, i) - 1
+        return k, i - self._starts[k]
+
+    def _own(self, k: int) -> List:
+        # Chunk k, copied first if another list may hold it
+        chunk = self._chunks[k]
+        if id(chunk) not in self._owned:
+            chunk = self._chunks[k] = list(chunk)
+            self._owned.add(id(chunk))
+        return chunk
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            return list(itertools.islice(self, start, stop, step))
+        k, j = self._locate(i)
+        return self._chunks[k][j]
+
+    def __setitem__(self, i: int, value):
+        k, j = self._locate(i)
+        self._own(k)[j] = value
+
+    def append(self, value):
+        if len(self._chunks[-1]) >= CHUNK:
+            chunk = [value]
+            self._chunks.append(chunk)
+            self._owned.add(id(chunk))
+            self._starts.append(self._len)
+        else:
+            self._own(len(self._chunks) - 1).append(value)
+        self._len += 1
+
+    def insert(self, i: int, value):
+        if i >= self._len:
+            self.append(value)
+            return
+        k, j = self._locate(max(i, -self._len))
+        chunk = self._own(k)
+        chunk.insert(j, value)
+        if len(chunk) > 2 * CHUNK:
+            self._owned.discard(id(chunk))
+            halves = [chunk[:CHUNK], chunk[CHUNK:]]
+            self._owned.update(map(id, halves))
+            self._chunks[k:k + 1] = halves
+        self._len += 1
+        self._reindex()
+
+    def copy(self) -> 'ChunkedList':
+        # A list with the same items, sharing every chunk until one of the two changes it
+        copied = object.__new__(ChunkedList)
+        copied._chunks = list(self._chunks)
+        copied._starts = list(self._starts)
+        copied._owned = set()
+        copied._len = self._len
+        self._owned = set()
+        return copied
+
+    __copy__ = copy
+
+    def __sizeof__(self) -> int:
+        # The chunk lists themselves (the items are measured separately)
+        return (object.__sizeof__(self) + sys.getsizeof(self._chunks) + sys.getsizeof(self._starts)
+                + sum(map(sys.getsizeof, self._chunks)))
+
+    def __repr__(self) -> str:
+        return f'ChunkedList({list(self)!r})'
+
+
+class LayeredDict:
+    # Dict as a shared base plus a layer of changes (deletions are markers in the layer)
+    __slots__ = ('_base', '_layer', '_len')
+
+    def __init__(self, items=()):
+        self._base = dict(items)
+        self._layer = {}
+        self._len = len(self._base)
+
+    def get(self, key, default=None):
+        value = self._layer.get(key, _MISSING)
+        if value is _MISSING:
+            return self._base.get(key, default)
+        return default if value is _DELETED else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._len += 1
+        self._layer[key] = value
+
+    def pop(self, key, default=_MISSING):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        if key in self._base:
+            self._layer[key] = _DELETED
+        else:
+            del self._layer[key]
+        self._len -= 1
+        return value
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+
+    def __len__(self) -> int:
+        return self._len
+
+    def items(self) -> Iterator:
+        layer = self._layer
+        for key, value in self._base.items():
+            if key not in layer:
+                yield key, value
+        for key, value in layer.items():
+            if value is not _DELETED:
+                yield key, value
+
+    def keys(self) -> Iterator:
+        return (key for key, _ in self.items())
+
+    def values(self) -> Iterator:
+        return (value for _, value in self.items())
+
+    __iter__ = keys
+
+    def copy(self) -> 'LayeredDict':
+        # A dict with the same items; the base is shared unless the layer is folded into it
+        copied = object.__new__(LayeredDict)
+        if len(self._layer) >= MERGE_AT:
+            copied._base = dict(self.items())
+            copied._layer = {}
+        else:
+            copied._base = self._base
+            copied._layer = dict(self._layer)
+        copied._len = self._len
+        return copied
+
+    __copy__ = copy
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self._base) + sys.getsizeof(self._layer)
+
+    def __repr__(self) -> str:
+        return f'LayeredDict({dict(self.items())!r})'
@@ -0,0 +1,110 @@
+# Request profiling with cProfile
+#
+# Two ways to profile a request:
+#   - on demand: an admin sends `X-Profile: 1` (or `?profile=1`; `0`, `false`,
+#     `no` and `off` leave it off); the report is stored and its id returned
+#     in the X-Profile-Report header. With `X-Profile: inline` (or
+#     `?profile=inline`) the hottest functions are also added to the JSON
+#     response under "_profile".
+#   - sampling: PROFILE_SAMPLE_RATE=N profiles one in every N requests.
+# Reports go to PROFILE_DIR, which keeps only the newest PROFILE_MAX_FILES.
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class RequestProfiler:
+    def __init__(self, directory: str, sample_rate: int = 0, max_files: int = 50, top_n: int = 25):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.top_n = top_n
+        self._counter = itertools.count(1)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def should_sample(self) -> bool:
+        # True for one in every `sample_rate` requests
+        if self.sample_rate <= 0:
+            return False
+        return next(self._counter) % self.sample_rate == 0
+
+    def start(self) -> Optional[cProfile.Profile]:
+        # Start profiling the current thread, or None if another profiler is active
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        return profiler
+
+    def finish(self, profiler: cProfile.Profile, label: str) -> Dict:
+        # Stop profiling, store the report and return a summary of the hottest functions
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+
+        slug = re.sub(r'[^a-zA-Z0-9]+', '_', label).strip('_')
+        report_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._ids):06d}-{slug}"
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(self.top_n)
+
+        top = []
+        for (filename, line, func), (cc, nc, tottime, cumtime, _) in stats.stats.items():
+            top.append({
+                'function': f'{os.path.basename(filename)}:{line}({func})',
+                'calls': nc,
+                'total_ms': round(tottime * 1000, 3),
+                'cumulative_ms': round(cumtime * 1000, 3),
+            })
+        top.sort(key=lambda f: f['total_ms'], reverse=True)
+
+        self._store(report_id, profiler, f'{label}\n\n{text.getvalue()}')
+        return {'id': report_id, 'total_ms': round(stats.total_tt * 1000, 3), 'hottest': top[:self.top_n]}
+
+    def _store(self, report_id: str, profiler: cProfile.Profile, text: str):
+        # Write the .prof dump and text report, then drop the oldest reports
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.directory, f'{report_id}.prof'))
+            with open(os.path.join(self.directory, f'{report_id}.txt'), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+            reports = self.list_reports()
+            for old in reports[self.max_files:]:
+                for ext in ('.prof', '.txt'):
+                    try:
+                        os.remove(os.path.join(self.directory, old + ext))
+                    except OSError:
+                        pass
+
+    def list_reports(self) -> List[str]:
+        # Stored report ids, newest first
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-4] for name in os.listdir(self.directory) if name.endswith('.txt')]
+        return sorted(ids, reverse=True)
+
+    def read_report(self, report_id: str) -> Optional[str]:
+        # Text report for an id, or None if it does not exist
+        if not re.fullmatch(r'[\w\-]+', report_id):
+            return None
+        path = os.path.join(self.directory, f'{report_id}.txt')
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+
+profiler = RequestProfiler(
+    directory=os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'college-profiles')),
+    sample_rate=int(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    max_files=int(os.environ.get('PROFILE_MAX_FILES', '50')),
+)
@@ -0,0 +1,117 @@
+# Phased engine startup and warm-up
+#
+# The recommender is built in timed phases (load, vocabulary, matrices,
+# indexes, warm-up). Each phase's duration is logged and kept for /api/ready,
+# which only succeeds once every phase has finished, so an orchestrator does
+# not route traffic to an instance that is still building or cold.
+#
+# The warm-up corpus is read from WARMUP_FILE (a JSON list or NDJSON of
+# profiles); without it, WARMUP_SIZE popular profiles are derived from the
+# catalog (0 disables warm-up).
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    def __init__(self):
+        self.state = 'starting'
+        self.error = None
+        self.phases = []    # [{'phase': name, 'seconds': duration}] in order
+        self.current = None
+        self.started = time.time()
+        self.finished = None
+        self._ready = threading.Event()
+
+    @contextmanager
+    def phase(self, name: str):
+        # Time one startup phase
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phases.append({'phase': name, 'seconds': round(seconds, 3)})
+            self.current = None
+            logger.info('startup phase %s took %.3fs', name, seconds)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self):
+        self.state = 'ready'
+        self.finished = time.time()
+        logger.info('engine ready after %.3fs', self.finished - self.started)
+        self._ready.set()
+
+    def mark_failed(self, error: Exception):
+        self.state = 'failed'
+        self.error = str(error)
+        self.finished = time.time()
+        logger.exception('engine startup failed')
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # Block until the engine is ready (False on timeout)
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict:
+        status = {'status': self.state, 'phases': list(self.phases)}
+        if self.current:
+            status['current_phase'] = self.current
+        if self.error:
+            status['error'] = self.error
+        if self.finished:
+            status['startup_seconds'] = round(self.finished - self.started, 3)
+        return status
+
+    def phase_seconds(self) -> Dict:
+        # Gauge callback: duration per finished phase
+        return {(('phase', p['phase']),): p['seconds'] for p in self.phases}
+
+
+def read_profiles(path: str) -> List[Dict]:
+    # Warm-up profiles from a JSON list or NDJSON file
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def popular_profiles(colleges: List[Dict], size: int) -> List[Dict]:
+    # Profiles for the most offered programs, each with the stream and location most
+    # common among the colleges offering it, in every budget range
+    programs = Counter(p for college in colleges for p in college['programs'])
+    budgets = sorted({college['budget_range'] for college in colleges})
+    profiles = []
+    for program, _ in programs.most_common():
+        offering = [college for college in colleges if program in college['programs']]
+        stream = Counter(s for college in offering for s in college['streams']).most_common(1)
+        location = Counter(college['location'] for college in offering).most_common(1)
+        for budget in budgets:
+            if len(profiles) >= size:
+                return profiles
+            profiles.append({
+                'stream': stream[0][0] if stream else '',
+                'gpa': 3.0,
+                'preferred_program': program,
+                'location': location[0][0] if location else '',
+                'budget_range': budget,
+            })
+    return profiles
+
+
+startup = Startup()
+
+metrics.register_gauge('startup_ready', 'Whether the engine is built and warmed up', lambda: 1 if startup.ready else 0)
+metrics.register_gauge('startup_phase_seconds', 'Duration of each startup phase', startup.phase_seconds)
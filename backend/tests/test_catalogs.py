@@ -0,0 +1,51 @@
+# Tests for lazily loaded catalogs
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalogs import Catalog, CatalogManager
+
+
+class SlowCatalog(Catalog):
+    # A catalog whose measurement takes a while, like a large one
+    def measure(self) -> int:
+        time.sleep(0.05)
+        self.size_bytes = 1
+        return self.size_bytes
+
+
+def test_catalog_is_built_once_for_concurrent_requests():
+    builds = []
+
+    def build(catalog_id, path):
+        builds.append(catalog_id)
+        return SlowCatalog(catalog_id, None, None)
+
+    manager = CatalogManager({'default': 'default.json', 'a': 'a.json'}, build, budget_bytes=0)
+    results = []
+
+    def request(delay):
+        time.sleep(delay)
+        results.append(manager.get('a'))
+
+    # Requests arriving before, during and after the measurement
+    threads = [threading.Thread(target=request, args=(delay,)) for delay in (0, 0.01, 0.03, 0.06, 0.08)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == ['a']
+    assert len({id(catalog) for catalog in results}) == 1
+
+
+def test_gauges_report_every_loaded_catalog():
+    manager = CatalogManager({'default': 'default.json', 'a': 'a.json'},
+                             lambda catalog_id, path: SlowCatalog(catalog_id, None, None), budget_bytes=0)
+    manager.get('default')
+    manager.get('a')
+    assert manager.per_catalog(lambda c: len(c.id))() == {(('catalog', 'default'),): 7, (('catalog', 'a'),): 1}
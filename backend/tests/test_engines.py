@@ -0,0 +1,50 @@
+# Tests for the scoring engine registry and shadow mode
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import engines
+import metrics
+from ml_recommender import CollegeRecommender
+
+COLLEGES_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'colleges.json')
+
+PROFILE = {'stream': 'Science', 'gpa': 3.2, 'preferred_program': 'BSc CSIT', 'location': 'Kathmandu',
+           'budget_range': 'medium'}
+
+
+@pytest.fixture
+def recommender():
+    return CollegeRecommender(COLLEGES_FILE)
+
+
+@pytest.fixture
+def collecting():
+    enabled = metrics.enabled
+    metrics.enabled = True
+    metrics.reset()
+    yield
+    metrics.enabled = enabled
+    metrics.reset()
+
+
+def test_legacy_engine_scores_the_compiled_records(recommender):
+    legacy = engines.create('legacy', recommender)
+    assert legacy.recommender.colleges is recommender.snapshot.colleges
+
+
+def test_shadow_runs_leave_stage_metrics_alone(recommender, collecting):
+    runner = engines.ShadowRunner(engines.create('vectorized', recommender), 'vectorized')
+    results = recommender.recommend(dict(PROFILE), top_n=5)
+    served = metrics.render()
+
+    comparison = runner.compare(dict(PROFILE), 5, results, 0.01)
+    assert comparison['jaccard'] == 1.0
+    rendered = metrics.render()
+    assert [l for l in rendered.splitlines() if l.startswith('recommender_')] == \
+        [l for l in served.splitlines() if l.startswith('recommender_')]
+    assert 'shadow_topk_jaccard_count{engine="vectorized"} 1' in rendered
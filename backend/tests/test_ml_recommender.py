@@ -0,0 +1,125 @@
+# Tests for the recommendation engine
+#
+# Run from the repository root: python -m pytest backend/tests
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml_recommender import CollegeRecommender
+
+COLLEGES_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'colleges.json')
+
+PROFILES = [
+    {'stream': 'Science', 'gpa': 3.2, 'preferred_program': 'BSc CSIT', 'location': 'Kathmandu', 'budget_range': 'medium'},
+    {'stream': 'Management', 'gpa': 2.8, 'preferred_program': 'BBA', 'location': 'Pokhara', 'budget_range': 'low'},
+    {'stream': 'Science', 'gpa': 3.6, 'preferred_program': 'Engineering', 'location': 'any', 'budget_range': 'high'},
+    {'stream': 'Humanities', 'gpa': 2.4, 'preferred_program': '', 'location': 'Lalitpur', 'budget_range': 'low'},
+]
+
+
+@pytest.fixture
+def recommender():
+    return CollegeRecommender(COLLEGES_FILE)
+
+
+def test_reads_see_whole_edits_during_writes_and_compaction(recommender):
+    # Readers run against a writer adding, updating and deleting colleges (with new program
+    # and location values) often enough to trigger background compactions
+    template = dict(recommender.snapshot.colleges[0])
+    colleges_before = len(recommender.snapshot.colleges)
+    errors = []
+    reads = [0]
+    done = threading.Event()
+
+    def read():
+        i = 0
+        while not done.is_set():
+            profile = PROFILES[i % len(PROFILES)]
+            i += 1
+            try:
+                results = recommender.recommend(dict(profile), top_n=10)
+                assert all(college['min_gpa'] <= profile['gpa'] for college in results)
+                recommender.recommend(dict(profile), top_n=5, diversity=0.5, encoded=True)
+                recommender.what_if(profile, {'gpa': [2.5, 3.0, 3.5]}, top_n=3)
+                recommender.search({'programs': ['BBA']}, query='college')
+                recommender.suggest('ka')
+                recommender.compare_colleges([college['id'] for college in results[:3]])
+                recommender.get_statistics()
+                recommender.catalog_changes(None)
+                reads[0] += 1
+            except Exception as e:
+                errors.append(e)
+                return
+
+    def write():
+        try:
+            for i in range(150):
+                college = recommender.add_college(dict(template, id=None, name=f'Test College {i}',
+                                                       location=f'Test Town {i % 7}',
+                                                       programs=template['programs'] + [f'Test Program {i}']))
+                recommender.update_college(college['id'], {'min_gpa': 2.0, 'budget_range': 'high'})
+                recommender.delete_college(college['id'])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [threading.Thread(target=read) for _ in range(4)] + [threading.Thread(target=write)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors, errors[:3]
+    assert reads[0] > 0
+    recommender.compact()
+    assert len(recommender.snapshot.colleges) == colleges_before
+    assert recommender.dead_rows() == 0
+
+
+def test_edit_publishes_a_new_snapshot(recommender):
+    # A request holding the old snapshot keeps a consistent view after an edit
+    before = recommender.snapshot
+    college = dict(before.colleges[0], id=None, name='Snapshot Test College')
+    added = recommender.add_college(college)
+
+    assert recommender.snapshot is not before
+    assert recommender.snapshot.version > before.version
+    assert added['id'] not in before.index.row_of
+    assert len(before.index.min_gpa) == before.index.size == len(before.index.live)
+    assert recommender.get_college(added['id'])['name'] == 'Snapshot Test College'
+
+
+def resolved_programs(recommender, preferred_program):
+    # (programs passing the filter, programs counted as a match) for a preferred program
+    snap = recommender.snapshot
+    filter_bits, match_bits = recommender._resolve_program(snap, preferred_program)
+    return set(snap.index.decode('programs', filter_bits)), set(snap.index.decode('programs', match_bits))
+
+
+def test_synonym_selects_only_its_canonical_program(recommender):
+    # "CSIT" is "BSc CSIT"; the canonical name must not match generic programs such as "BSc"
+    passed, matched = resolved_programs(recommender, 'CSIT')
+    assert passed == matched == {'BSc CSIT'}
+
+    profile = dict(PROFILES[0], preferred_program='CSIT')
+    for college in recommender.recommend(profile, top_n=10):
+        assert 'BSc CSIT' in college['programs']
+        assert college['feature_matches']['program']
+
+
+def test_short_synonym_does_not_match_through_its_expansion(recommender):
+    # "IT" also selects "Information Technology", but "MA" is not matched through "information"
+    passed, matched = resolved_programs(recommender, 'IT')
+    assert 'Information Technology' in passed and 'Information Technology' in matched
+    assert 'MA' not in matched and 'MA' not in passed
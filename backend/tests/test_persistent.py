@@ -0,0 +1,56 @@
+# Tests for the copy-on-write snapshot containers
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import persistent
+from persistent import ChunkedList, LayeredDict, appended
+
+
+def test_chunked_list_copy_leaves_the_original_alone(monkeypatch):
+    monkeypatch.setattr(persistent, 'CHUNK', 4)
+    original = ChunkedList(range(10))
+    copied = original.copy()
+    copied[1] = 'changed'
+    copied.insert(5, 'inserted')
+    for i in range(6):
+        copied.insert(0, i)
+    copied.append('last')
+
+    assert list(original) == list(range(10))
+    expected = list(range(10))
+    expected[1] = 'changed'
+    expected.insert(5, 'inserted')
+    for i in range(6):
+        expected.insert(0, i)
+    expected.append('last')
+    assert list(copied) == expected
+    assert [copied[i] for i in range(len(copied))] == expected
+    assert copied[-3:] == expected[-3:]
+
+
+def test_layered_dict_copy_leaves_the_original_alone(monkeypatch):
+    monkeypatch.setattr(persistent, 'MERGE_AT', 3)
+    original = LayeredDict({'a': 1, 'b': 2})
+    copied = original.copy()
+    copied['c'] = 3
+    copied.pop('a')
+    for i in range(5):
+        copied = copied.copy()
+        copied[i] = i
+
+    assert dict(original.items()) == {'a': 1, 'b': 2}
+    assert dict(copied.items()) == {'b': 2, 'c': 3, 0: 0, 1: 1, 2: 2, 3: 3, 4: 4}
+    assert len(copied) == 7 and 'a' not in copied
+
+
+def test_appended_does_not_change_shorter_views():
+    first = appended(np.arange(3), [3])
+    second = appended(first, [4, 5])
+    assert first.tolist() == [0, 1, 2, 3]
+    assert second.tolist() == [0, 1, 2, 3, 4, 5]
+    assert second.base is first.base
@@ -0,0 +1,47 @@
+# Tests for full-text search and typeahead
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import text_index
+from text_index import TextIndex
+
+
+def college(name, location='Kathmandu', programs=('BBA',), description=''):
+    return {'name': name, 'location': location, 'programs': list(programs), 'description': description}
+
+
+COLLEGES = [
+    college('Everest Engineering College', programs=['BE Civil', 'BE Computer']),
+    college('Everest Business School', programs=['BBA']),
+    college('Pokhara Engineering Campus', location='Pokhara', programs=['BE Civil']),
+    college('Kathmandu Medical College', programs=['MBBS'], description='engineering of care'),
+    college('Engineering Institute Kathmandu', programs=['BE Computer', 'BE Electrical']),
+    college('Himalayan College', programs=['BBA'], description='near Kathmandu'),
+]
+
+
+def test_multi_word_suggest_returns_ranked_live_rows():
+    index = TextIndex(COLLEGES)
+    expected_rows, _ = index.score('kathmandu eng', prefix_last=True)
+    # 'kathmandu eng' is nobody's name, so every suggestion comes from the keyword match
+    assert index.suggest('kathmandu eng') == [int(row) for row in expected_rows]
+    assert set(index.suggest('kathmandu eng')) == {0, 3, 4}
+
+    index.delete(4, COLLEGES[4])
+    assert index.suggest('kathmandu eng') == [int(row) for row in expected_rows if row != 4]
+
+
+def test_deleted_rows_do_not_crowd_out_typeahead(monkeypatch):
+    monkeypatch.setattr(text_index, 'TOP_PER_TERM', 2)
+    colleges = [college(f'Campus {i}', programs=['BBA'], description='engineering ' * (5 - i)) for i in range(5)]
+    index = TextIndex(colleges)
+    best = index.suggest('engin', limit=2)
+    for row in best:
+        index.delete(row, colleges[row])
+
+    suggestions = index.suggest('engin', limit=2)
+    assert len(suggestions) == 2
+    assert not set(suggestions) & set(best)
@@ -0,0 +1,294 @@
+# Full-text index over college names, descriptions and programs
+#
+# Built once per catalog snapshot: an inverted index with one postings list
+# per token holding college rows and their precomputed BM25 impact. Queries
+# intersect postings starting from the rarest token, so only candidate rows
+# are scored. A sorted term list gives prefix lookups, and each term keeps
+# its highest-impact rows so typeahead never walks a long postings list.
+#
+# Colleges added later are appended with the IDF and average length of the
+# last build; deleted rows are masked out and dropped from the typeahead rows.
+# A rebuild refreshes the statistics.
+# Edits are made to a copy(), never to an index requests may be reading; the
+# per-term and per-name lists are persistent containers, cheap to copy.
+
+import bisect
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from persistent import ChunkedList, LayeredDict, appended
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Per-field boosts: a hit in the name counts more than one in the description
+FIELD_BOOSTS = {'name': 3, 'programs': 2, 'location': 1, 'description': 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Highest-impact rows kept per term for typeahead
+TOP_PER_TERM = 16
+# Multi-word typeahead also checks every row of its rarest complete word when it has at most this many
+SUGGEST_SCAN_ROWS = 2048
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class TextIndex:
+    def __init__(self, colleges: List[Dict]):
+        self.size = len(colleges)
+        self.live = np.ones(self.size, dtype=bool)
+        postings = {}   # term -> {row: weighted term frequency}
+        lengths = np.zeros(self.size, dtype=np.float64)
+
+        for row, college in enumerate(colleges):
+            for token, tf in self._term_frequencies(college).items():
+                postings.setdefault(token, {})[row] = tf
+            lengths[row] = self._length(college)
+
+        df = np.array([len(postings[t]) for t in sorted(postings)], dtype=np.float64)
+        idf = np.log(1.0 + (self.size - df + 0.5) / (df + 0.5))
+        self.avg_length = float(lengths.mean()) if self.size else 1.0
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (self.avg_length or 1.0))
+
+        # Freeze postings into sorted row arrays with their BM25 impact. Term ids are
+        # positions in self.terms; sorted_terms is kept separately for prefix lookups.
+        terms = sorted(postings)
+        rows_of, impacts_of, top_rows_of = [], [], []
+        for term_id, term in enumerate(terms):
+            docs = postings[term]
+            rows = np.fromiter(docs.keys(), dtype=np.int32, count=len(docs))
+            tf = np.fromiter(docs.values(), dtype=np.float64, count=len(docs))
+            order = np.argsort(rows)
+            rows, tf = rows[order], tf[order]
+            impact = (idf[term_id] * tf * (BM25_K1 + 1) / (tf + length_norm[rows])).astype(np.float32)
+            rows_of.append(rows)
+            impacts_of.append(impact)
+            top = np.argsort(-impact, kind='stable')[:TOP_PER_TERM]
+            top_rows_of.append((rows[top], impact[top]))
+        self.terms = ChunkedList(terms)
+        self.sorted_terms = ChunkedList(terms)
+        self.term_id = LayeredDict((t, i) for i, t in enumerate(terms))
+        self.idf = ChunkedList(idf.tolist())
+        self.rows = ChunkedList(rows_of)
+        self.impacts = ChunkedList(impacts_of)
+        self.top_rows = ChunkedList(top_rows_of)
+
+        # Names for typeahead, sorted by lowercased name
+        names = sorted((college.get('name', '').lower(), row) for row, college in enumerate(colleges))
+        self.names = ChunkedList(names)
+        self._name_keys = ChunkedList(name for name, _ in names)
+
+    @staticmethod
+    def _term_frequencies(college: Dict) -> Dict[str, int]:
+        # Boost-weighted frequency of every token of a college
+        frequencies = {}
+        for field, boost in FIELD_BOOSTS.items():
+            value = college.get(field) or ''
+            if isinstance(value, list):
+                value = ' '.join(value)
+            for token in tokenize(value):
+                frequencies[token] = frequencies.get(token, 0) + boost
+        return frequencies
+
+    @staticmethod
+    def _length(college: Dict) -> float:
+        # Boost-weighted document length
+        length = 0
+        for field, boost in FIELD_BOOSTS.items():
+            value = college.get(field) or ''
+            if isinstance(value, list):
+                value = ' '.join(value)
+            length += len(tokenize(value)) * boost
+        return float(length)
+
+    def add(self, row: int, college: Dict):
+        # Index a college appended as `row` (rows only ever grow, so postings stay sorted)
+        self.size = row + 1
+        self.live = appended(self.live, np.ones(self.size - len(self.live), dtype=bool))
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._length(college) / (self.avg_length or 1.0))
+        for token, tf in self._term_frequencies(college).items():
+            term_id = self.term_id.get(token)
+            if term_id is None:
+                # A new term: df = 1 at the current size
+                term_id = len(self.terms)
+                self.terms.append(token)
+                self.term_id[token] = term_id
+                bisect.insort(self.sorted_terms, token)
+                self.idf.append(float(np.log(1.0 + (self.size - 0.5) / 1.5)))
+                self.rows.append(np.empty(0, dtype=np.int32))
+                self.impacts.append(np.empty(0, dtype=np.float32))
+                self.top_rows.append((np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)))
+            impact = np.float32(self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + length_norm))
+            self.rows[term_id] = appended(self.rows[term_id], row)
+            self.impacts[term_id] = appended(self.impacts[term_id], impact)
+            top_rows, top_impacts = self.top_rows[term_id]
+            top_rows, top_impacts = np.append(top_rows, np.int32(row)), np.append(top_impacts, impact)
+            top = np.argsort(-top_impacts, kind='stable')[:TOP_PER_TERM]
+            self.top_rows[term_id] = (top_rows[top], top_impacts[top])
+        name = college.get('name', '').lower()
+        position = bisect.bisect_right(self._name_keys, name)
+        self._name_keys.insert(position, name)
+        self.names.insert(position, (name, row))
+
+    def delete(self, row: int, college: Dict):
+        live = self.live.copy()
+        live[row] = False
+        self.live = live
+        # Refill the typeahead rows of terms this row was among the best of, from live rows
+        for token in self._term_frequencies(college):
+            term_id = self.term_id.get(token)
+            if term_id is None or row not in self.top_rows[term_id][0]:
+                continue
+            rows, impacts = self.rows[term_id], self.impacts[term_id]
+            keep = live[rows]
+            rows, impacts = rows[keep], impacts[keep]
+            top = np.argsort(-impacts, kind='stable')[:TOP_PER_TERM]
+            self.top_rows[term_id] = (rows[top], impacts[top])
+
+    def copy(self) -> 'TextIndex':
+        # An index to edit while this one keeps serving (see CatalogIndex.copy): postings
+        # arrays are shared, the lists and dicts add() changes are copied on write
+        index = object.__new__(TextIndex)
+        index.__dict__.update(self.__dict__)
+        for name in ('terms', 'sorted_terms', 'idf', 'rows', 'impacts', 'top_rows', 'names', '_name_keys'):
+            setattr(index, name, getattr(self, name).copy())
+        index.term_id = self.term_id.copy()
+        return index
+
+    def expand_prefix(self, prefix: str, limit: int = 50) -> List[int]:
+        # Term ids that start with prefix
+        start = bisect.bisect_left(self.sorted_terms, prefix)
+        ids = []
+        for term in self.sorted_terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            ids.append(self.term_id[term])
+        return ids
+
+    def _token_terms(self, tokens: List[str], prefix_last: bool) -> Optional[List[List[int]]]:
+        # Term ids per token, or None if some token matches nothing
+        term_lists = []
+        for position, token in enumerate(tokens):
+            if prefix_last and position == len(tokens) - 1:
+                term_ids = self.expand_prefix(token)
+            else:
+                term_id = self.term_id.get(token)
+                term_ids = [term_id] if term_id is not None else []
+            if not term_ids:
+                return None
+            term_lists.append(term_ids)
+        return term_lists
+
+    def _token_rows(self, term_ids: List[int]) -> np.ndarray:
+        if len(term_ids) == 1:
+            return self.rows[term_ids[0]]
+        return np.unique(np.concatenate([self.rows[t] for t in term_ids]))
+
+    def score(self, query: str, prefix_last: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        # BM25 scores of matching rows, best first. Every query token must match (AND).
+        # With prefix_last the final token also matches longer terms ("comp" -> "computer").
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        tokens = tokenize(query)
+        if not tokens:
+            return empty
+        term_lists = self._token_terms(tokens, prefix_last)
+        if term_lists is None:
+            return empty
+
+        # Intersect postings, rarest token first, so the candidate set only shrinks
+        token_rows = sorted((self._token_rows(ids) for ids in term_lists), key=len)
+        candidates = token_rows[0]
+        for rows in token_rows[1:]:
+            if not len(candidates):
+                return empty
+            pos = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+            candidates = candidates[rows[pos] == candidates]
+
+        candidates = candidates[self.live[candidates]]
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for term_ids in term_lists:
+            for term_id in term_ids:
+                rows = self.rows[term_id]
+                pos = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+                hit = rows[pos] == candidates
+                scores[hit] += self.impacts[term_id][pos[hit]]
+
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
+
+    def search(self, query: str, candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Ranked rows for a query, optionally restricted to a boolean candidate mask
+        rows, scores = self.score(query)
+        if candidates is not None and len(rows):
+            keep = candidates[rows]
+            rows, scores = rows[keep], scores[keep]
+        return rows, scores
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[int]:
+        # Rows for typeahead: names starting with the prefix first, then best prefix matches
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        rows = []
+        start = bisect.bisect_left(self._name_keys, prefix)
+        for i in range(start, len(self.names)):
+            if len(rows) >= limit or not self._name_keys[i].startswith(prefix):
+                break
+            if self.live[self.names[i][1]]:
+                rows.append(self.names[i][1])
+        if len(rows) < limit:
+            tokens = tokenize(prefix)
+            if len(tokens) == 1:
+                # Single partial word: merge the precomputed best rows of every completion
+                best = {}
+                for term_id in self.expand_prefix(tokens[0]):
+                    for row, impact in zip(*self.top_rows[term_id]):
+                        row = int(row)
+                        best[row] = max(best.get(row, 0.0), float(impact))
+                ranked = sorted(best, key=best.get, reverse=True)
+            elif tokens:
+                ranked = self._suggest_words(tokens, limit)
+            else:
+                ranked = []
+            seen = set(rows)
+            for row in ranked:
+                if len(rows) >= limit:
+                    break
+                if row not in seen and self.live[row]:
+                    seen.add(row)
+                    rows.append(row)
+        return rows
+
+    def _suggest_words(self, tokens: List[str], limit: int) -> List[int]:
+        # Best live rows matching every word, the last one as a prefix. Only a bounded candidate
+        # set is checked: the typeahead rows of every term involved, plus all rows of the rarest
+        # complete word when it is rare enough. Long postings lists are searched, never walked.
+        term_lists = self._token_terms(tokens, prefix_last=True)
+        if term_lists is None:
+            return []
+        pool = [self.top_rows[term_id][0] for term_ids in term_lists for term_id in term_ids]
+        rarest = min((self.rows[term_ids[0]] for term_ids in term_lists[:-1]), key=len)
+        if len(rarest) <= SUGGEST_SCAN_ROWS:
+            pool.append(rarest)
+        candidates = np.unique(np.concatenate(pool))
+        candidates = candidates[self.live[candidates]]
+
+        matched = np.ones(len(candidates), dtype=bool)
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for term_ids in term_lists:
+            any_hit = np.zeros(len(candidates), dtype=bool)
+            for term_id in term_ids:
+                rows = self.rows[term_id]
+                pos = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+                hit = rows[pos] == candidates
+                scores[hit] += self.impacts[term_id][pos[hit]]
+                any_hit |= hit
+            matched &= any_hit
+        candidates, scores = candidates[matched], scores[matched]
+        order = np.argsort(-scores, kind='stable')[:limit * 2]
+        return [int(row) for row in candidates[order]]
@@ -0,0 +1,133 @@
+# Materialised top-N candidates for the common recommendation inputs
+#
+# Usage:
+#   python topn_table.py --output ../data/topn.npz
+#   python topn_table.py --catalog catalog.ndjson --weights ../data/weights.json --top-n 20 --output topn.npz
+#
+# The categorical inputs of recommend() have a small domain: stream x location x
+# budget range x canonical program, and between two consecutive min_gpa values
+# (a GPA bucket) the set of eligible colleges does not change. For every such
+# combination the table keeps the colleges that can reach the top N for some
+# GPA in the bucket: a college is left out only if, over the whole bucket, N
+# others always score higher. A matching request then scores those few rows
+# instead of the catalog and gets exactly the live results. Free-text inputs,
+# distance options and diversified ranking are scored live.
+#
+# A table belongs to one catalog snapshot and weight setting (its fingerprint)
+# and is dropped when the catalog is edited. The server loads it from
+# TOPN_TABLE at startup, building and writing it there when it is missing or
+# stale.
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Profile fields that make up a table key, in key order (the GPA bucket comes last)
+KEY_FIELDS = ('preferred_program', 'stream', 'location', 'budget_range')
+
+
+class TopNTable:
+    def __init__(self, dims: Dict[str, List[str]], breakpoints: np.ndarray, upper: float,
+                 offsets: np.ndarray, ids: np.ndarray, top_n: int, fingerprint: str):
+        self.dims = dims                  # key field -> lowercased values
+        self.codes = {field: {v: i for i, v in enumerate(values)} for field, values in dims.items()}
+        self.breakpoints = breakpoints    # start of each GPA bucket (distinct min_gpa values)
+        self.upper = upper                # highest GPA the last bucket covers
+        self.offsets = offsets            # key number -> start of its candidates in `ids`
+        self.ids = ids                    # candidate college ids, in catalog row order per key
+        self.top_n = top_n
+        self.fingerprint = fingerprint
+        self.rows = None                  # `ids` as rows of the serving index (bind())
+
+    @property
+    def keys(self) -> int:
+        return len(self.offsets) - 1
+
+    def bind(self, row_of: Dict[int, int]):
+        # Resolve candidate ids to the rows of the index that serves them
+        self.rows = np.array([row_of[college_id] for college_id in self.ids.tolist()], dtype=np.int64)
+
+    def candidates(self, profile: Dict, top_n: int) -> Optional[np.ndarray]:
+        # Candidate rows for a preprocessed profile, None if the table does not cover it
+        if self.rows is None or top_n > self.top_n:
+            return None
+        key = 0
+        for field in KEY_FIELDS:
+            code = self.codes[field].get(str(profile.get(field, '')).strip().lower())
+            if code is None:
+                return None
+            key = key * len(self.dims[field]) + code
+        gpa = float(profile.get('gpa', 0))
+        bucket = int(np.searchsorted(self.breakpoints, gpa, side='right')) - 1
+        if bucket < 0 or gpa > self.upper:
+            return None
+        key = key * len(self.breakpoints) + bucket
+        return self.rows[self.offsets[key]:self.offsets[key + 1]]
+
+    def save(self, path: str):
+        arrays = {f'dim_{field}': np.array(self.dims[field], dtype=str) for field in KEY_FIELDS}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, breakpoints=self.breakpoints, upper=np.float64(self.upper),
+                                offsets=self.offsets, ids=self.ids, top_n=np.int64(self.top_n),
+                                fingerprint=np.array(self.fingerprint), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'TopNTable':
+        with np.load(path, allow_pickle=False) as data:
+            dims = {field: data[f'dim_{field}'].tolist() for field in KEY_FIELDS}
+            return cls(dims, data['breakpoints'], float(data['upper']), data['offsets'], data['ids'],
+                       int(data['top_n']), str(data['fingerprint']))
+
+
+def load_or_build(recommender, path: str, top_n: int) -> TopNTable:
+    # Attach the table stored at `path`, building (and writing) a fresh one if it is
+    # missing, too small or for another catalog snapshot
+    if os.path.exists(path):
+        try:
+            table = TopNTable.load(path)
+            if table.top_n >= top_n and recommender.attach_topn_table(table):
+                logger.info('loaded top-N table %s (%d keys)', path, table.keys)
+                return table
+            logger.info('top-N table %s is stale, rebuilding', path)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning('could not read top-N table %s: %s', path, e)
+    table = recommender.build_topn_table(top_n)
+    recommender.attach_topn_table(table)
+    table.save(path)
+    logger.info('built top-N table %s (%d keys, %d candidates)', path, table.keys, len(table.ids))
+    return table
+
+
+def main():
+    from ml_recommender import CollegeRecommender
+
+    parser = argparse.ArgumentParser(description='Precompute the top-N candidate table for a catalog')
+    parser.add_argument('--catalog', default=os.path.join(os.path.dirname(__file__), '..', 'data', 'colleges.json'),
+                        help='college catalog (.json or .ndjson)')
+    parser.add_argument('--weights', help='weights file the server uses (WEIGHTS_FILE)')
+    parser.add_argument('--proximity-decay-km', type=float, help='the server\'s PROXIMITY_DECAY_KM')
+    parser.add_argument('--top-n', type=int, default=10, help='largest top_n the table answers')
+    parser.add_argument('--output', required=True, help='table file (.npz), the server\'s TOPN_TABLE')
+    args = parser.parse_args()
+
+    recommender = CollegeRecommender(args.catalog)
+    if args.weights:
+        recommender.load_weights(args.weights)
+    recommender.proximity_decay_km = args.proximity_decay_km or None
+
+    started = time.time()
+    table = recommender.build_topn_table(args.top_n)
+    table.save(args.output)
+    sizes = np.diff(table.offsets)
+    print(f'{table.keys} keys, {len(table.ids)} candidates (mean {sizes.mean():.1f}, max {sizes.max()}) '
+          f'in {time.time() - started:.1f}s; wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
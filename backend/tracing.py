@@ -0,0 +1,148 @@
+# Per-request span traces and a buffer of the slowest requests
+#
+# Every API request gets a lightweight trace: one span per timed stage plus a
+# few annotations such as candidate counts. When the request finishes the
+# trace is offered to SlowRequestLog, which keeps only the N slowest traces of
+# the current and previous time window, so memory stays constant no matter
+# how much traffic there is.
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+enabled = os.environ.get('TRACE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+# Payload fields replaced with "[redacted]" before a trace is stored ("*" redacts every value)
+REDACT_FIELDS = set(f.strip() for f in os.environ.get(
+    'TRACE_REDACT_FIELDS', 'interests,career_goals,message,comment,history,current_data').split(',') if f.strip())
+
+MAX_SPANS = 64
+MAX_STRING = 200
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    __slots__ = ('method', 'path', 'started_at', 'start', 'spans', 'annotations', 'payload', 'duration_ms', 'status')
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.annotations = {}
+        self.payload = None
+        self.duration_ms = 0.0
+        self.status = 0
+
+    def add_span(self, name: str, start: float, end: float):
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, start - self.start, end - start))
+
+    def to_dict(self) -> Dict:
+        return {
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'duration_ms': round(self.duration_ms, 3),
+            'spans': [{'name': name, 'start_ms': round(offset * 1000, 3), 'duration_ms': round(length * 1000, 3)}
+                      for name, offset, length in self.spans],
+            'annotations': dict(self.annotations),
+            'payload': self.payload,
+        }
+
+
+def redact(value, fields=None):
+    # Copy of a request payload with sensitive fields hidden and long strings cut
+    fields = REDACT_FIELDS if fields is None else fields
+    if isinstance(value, dict):
+        return {k: '[redacted]' if ('*' in fields or k in fields) else redact(v, fields) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, fields) for v in value[:20]]
+    if isinstance(value, str) and len(value) > MAX_STRING:
+        return value[:MAX_STRING] + '...'
+    return value
+
+
+def begin(method: str, path: str) -> Optional[Trace]:
+    # Start a trace for the current request
+    if not enabled:
+        return None
+    trace = Trace(method, path)
+    _current.set(trace)
+    return trace
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def annotate(key: str, value):
+    # Attach a value (e.g. a candidate count) to the current trace
+    trace = _current.get()
+    if trace is not None:
+        trace.annotations[key] = value
+
+
+def end(status: int) -> Optional[Trace]:
+    # Finish the current trace and hand it to the slow request log
+    trace = _current.get()
+    if trace is None:
+        return None
+    _current.set(None)
+    trace.duration_ms = (time.perf_counter() - trace.start) * 1000.0
+    trace.status = status
+    slow_log.offer(trace)
+    return trace
+
+
+class SlowRequestLog:
+    # The `capacity` slowest traces of the current and the previous window
+    def __init__(self, capacity: int = 20, window_seconds: float = 300.0):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._window_start = time.monotonic()
+        self._current = []   # min-heap of (duration, seq, trace)
+        self._previous = []
+
+    def _rotate(self, now: float):
+        if now - self._window_start >= self.window_seconds:
+            # Anything older than one full window is dropped
+            self._previous = self._current if now - self._window_start < 2 * self.window_seconds else []
+            self._current = []
+            self._window_start = now
+
+    def offer(self, trace: Trace):
+        with self._lock:
+            self._rotate(time.monotonic())
+            entry = (trace.duration_ms, next(self._seq), trace)
+            if len(self._current) < self.capacity:
+                heapq.heappush(self._current, entry)
+            elif trace.duration_ms > self._current[0][0]:
+                heapq.heapreplace(self._current, entry)
+
+    def slowest(self) -> List[Dict]:
+        # Slowest traces first
+        with self._lock:
+            self._rotate(time.monotonic())
+            entries = sorted(self._current + self._previous, key=lambda e: e[0], reverse=True)[:self.capacity]
+        return [trace.to_dict() for _, _, trace in entries]
+
+    def clear(self):
+        with self._lock:
+            self._current = []
+            self._previous = []
+
+
+slow_log = SlowRequestLog(
+    capacity=int(os.environ.get('TRACE_SLOW_CAPACITY', '20')),
+    window_seconds=float(os.environ.get('TRACE_WINDOW_SECONDS', '300')),
+)
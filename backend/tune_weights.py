@@ -0,0 +1,226 @@
+# Offline tuning of the recommender's feature weights
+#
+# Usage:
+#   python tune_weights.py feedback.ndjson --samples 5000 --output ../data/weights.json
+#   python tune_weights.py feedback.ndjson --grid program=4,6,8 --grid location=2,4,6 --k 5
+#
+# Replays logged feedback: NDJSON lines with the student's profile, a college_id and
+# a rating (1-5) or a clicked flag, as the server writes them with FEEDBACK_LOG set.
+# Every weight configuration (the five feature weights plus the program/location
+# match boosts) is scored at once: the recommender splits each profile's similarity
+# into per-feature-group parts, so a whole batch of configurations is a couple of
+# matrix products per profile instead of one recommend() call per configuration.
+# Configurations are ranked by NDCG@k and hit rate@k, chosen on a training split
+# and checked on a held-out one. The best can be exported as the weights file
+# app.py loads (WEIGHTS_FILE, default data/weights.json).
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from ml_recommender import FEATURE_GROUPS, CollegeRecommender
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(__file__), '..', 'data', 'colleges.json')
+BOOSTS = ('program', 'location')
+PARAMS = FEATURE_GROUPS + tuple(f'{name}_boost' for name in BOOSTS)
+
+# Ratings at or below this count as "not relevant"; higher ratings gain rating - NEUTRAL_RATING
+NEUTRAL_RATING = 2
+# Upper bound on candidates x configurations held in memory per batch
+BATCH_CELLS = 4_000_000
+
+
+def read_feedback(path: str) -> List[Dict]:
+    # One query per distinct profile: {'profile': ..., 'gains': {college_id: gain}}
+    queries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            profile = entry.get('profile')
+            if not profile or entry.get('college_id') is None:
+                continue
+            if entry.get('rating') is not None:
+                gain = max(float(entry['rating']) - NEUTRAL_RATING, 0.0)
+            else:
+                gain = 1.0 if entry.get('clicked') else 0.0
+            key = json.dumps(profile, sort_keys=True)
+            query = queries.setdefault(key, {'profile': profile, 'gains': {}})
+            college_id = int(entry['college_id'])
+            query['gains'][college_id] = max(query['gains'].get(college_id, 0.0), gain)
+    # Without a relevant college a query cannot tell configurations apart
+    return [q for q in queries.values() if any(g > 0 for g in q['gains'].values())]
+
+
+def current_config(recommender: CollegeRecommender) -> np.ndarray:
+    return np.array([recommender.feature_weights[g] for g in FEATURE_GROUPS]
+                    + [recommender.match_boosts[b] for b in BOOSTS], dtype=np.float64)
+
+
+def sample_configs(base: np.ndarray, samples: int, spread: float, seed: int) -> np.ndarray:
+    # The base configuration followed by random ones within a factor `spread` of it (log-uniform)
+    rng = np.random.default_rng(seed)
+    factors = np.exp(rng.uniform(-np.log(spread), np.log(spread), size=(samples, len(base))))
+    configs = base * factors
+    # Boosts below 1 would penalise matches
+    configs[:, len(FEATURE_GROUPS):] = np.maximum(configs[:, len(FEATURE_GROUPS):], 1.0)
+    return np.vstack([base, configs])
+
+
+def grid_configs(base: np.ndarray, grid: Dict[str, List[float]]) -> np.ndarray:
+    # Every combination of the listed values; parameters not in the grid keep their base value
+    positions = [PARAMS.index(name) for name in grid]
+    configs = []
+    for values in itertools.product(*grid.values()):
+        config = base.copy()
+        config[positions] = values
+        configs.append(config)
+    return np.array(configs)
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[float]]:
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in PARAMS:
+            raise SystemExit(f"Unknown parameter '{name}' (choose from {', '.join(PARAMS)})")
+        grid[name] = [float(v) for v in values.split(',') if v.strip()]
+    return grid
+
+
+def evaluate(recommender: CollegeRecommender, queries: List[Dict], configs: np.ndarray, k: int) -> Dict[str, np.ndarray]:
+    # Mean NDCG@k and hit rate@k of every configuration over the queries
+    n_groups = len(FEATURE_GROUPS)
+    squared = configs[:, :n_groups] ** 2
+    ndcg = np.zeros(len(configs))
+    hits = np.zeros(len(configs))
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+
+    for query in queries:
+        features = recommender.group_features(dict(query['profile']))
+        n = len(features['rows'])
+        gains = np.array([query['gains'].get(cid, 0.0) for cid in features['ids']])
+        if not n or not gains.any():
+            # None of the relevant colleges is reachable: zero for every configuration
+            continue
+        ideal = np.sort(np.array(list(query['gains'].values())))[::-1][:k]
+        idcg = float((ideal * discounts[:len(ideal)]).sum())
+
+        matches = features['matches']
+        bonus = 0.1 * matches['program'] + 0.08 * matches['stream'] + 0.15 * matches['location']
+        user_norm = np.sqrt(squared @ features['user_norm'])
+        top_k = min(k, n)
+
+        for start in range(0, len(configs), max(1, BATCH_CELLS // n)):
+            batch = slice(start, start + max(1, BATCH_CELLS // n))
+            dot = features['dot'] @ squared[batch].T                      # candidates x configs
+            norm = np.sqrt(features['college_norm'] @ squared[batch].T) * user_norm[batch]
+            similarity = np.divide(dot, norm, out=np.zeros_like(dot), where=norm > 0)
+            confidence = np.minimum(similarity + bonus[:, None], 1.0)
+            boost = (np.where(matches['program'][:, None], configs[batch, n_groups], 1.0)
+                     * np.where(matches['location'][:, None], configs[batch, n_groups + 1], 1.0))
+            score = similarity * confidence * boost
+
+            # Top-k rows per configuration, best first
+            if top_k < n:
+                top = np.argpartition(-score, top_k - 1, axis=0)[:top_k]
+            else:
+                top = np.broadcast_to(np.arange(n)[:, None], score.shape)
+            order = np.argsort(-np.take_along_axis(score, top, axis=0), axis=0, kind='stable')
+            ranked_gains = gains[np.take_along_axis(top, order, axis=0)]
+
+            ndcg[batch] += (ranked_gains * discounts[:top_k, None]).sum(axis=0) / idcg
+            hits[batch] += (ranked_gains > 0).any(axis=0)
+
+    count = max(len(queries), 1)
+    return {'ndcg': ndcg / count, 'hit_rate': hits / count}
+
+
+def config_dict(config: np.ndarray) -> Dict:
+    n_groups = len(FEATURE_GROUPS)
+    return {
+        'feature_weights': {g: round(float(v), 4) for g, v in zip(FEATURE_GROUPS, config[:n_groups])},
+        'match_boosts': {b: round(float(v), 4) for b, v in zip(BOOSTS, config[n_groups:])}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune feature weights against logged feedback')
+    parser.add_argument('feedback', help='NDJSON feedback log with profiles')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG, help='college catalog (.json or .ndjson)')
+    parser.add_argument('--weights', help='start from this weights file instead of the built-in weights')
+    parser.add_argument('--samples', type=int, default=2000, help='random configurations to try')
+    parser.add_argument('--spread', type=float, default=4.0, help='random weights lie within this factor of the start')
+    parser.add_argument('--grid', action='append', default=[], metavar='PARAM=V1,V2,...',
+                        help=f"try every combination of these values instead of random samples ({', '.join(PARAMS)})")
+    parser.add_argument('--k', type=int, default=5, help='cut-off for NDCG and hit rate')
+    parser.add_argument('--holdout', type=float, default=0.2, help='share of profiles held out for checking')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10, help='configurations to print')
+    parser.add_argument('--output', help='write the best configuration here (the server loads it as WEIGHTS_FILE)')
+    args = parser.parse_args()
+
+    recommender = CollegeRecommender(args.catalog)
+    if args.weights:
+        recommender.load_weights(args.weights)
+    queries = read_feedback(args.feedback)
+    if not queries:
+        raise SystemExit('No feedback entries with a profile and a positive outcome')
+
+    random.Random(args.seed).shuffle(queries)
+    held = int(len(queries) * args.holdout) if len(queries) > 1 else 0
+    train, test = queries[held:], queries[:held]
+
+    base = current_config(recommender)
+    grid = parse_grid(args.grid)
+    configs = grid_configs(base, grid) if grid else sample_configs(base, args.samples, args.spread, args.seed)
+    print(f'{len(queries)} profiles ({len(train)} train, {len(test)} held out), {len(configs)} configurations')
+
+    started = time.time()
+    scores = evaluate(recommender, train, configs, args.k)
+    print(f'Scored in {time.time() - started:.1f}s')
+
+    baseline = evaluate(recommender, train, base[None, :], args.k)
+    ranking = np.lexsort((-scores['hit_rate'], -scores['ndcg']))
+    header = ' '.join(f'{p[:8]:>8}' for p in PARAMS)
+    print(f"\n{'ndcg@' + str(args.k):>8} {'hit@' + str(args.k):>8}  {header}")
+    for i in ranking[:args.top]:
+        values = ' '.join(f'{v:8.3f}' for v in configs[i])
+        print(f"{scores['ndcg'][i]:8.4f} {scores['hit_rate'][i]:8.4f}  {values}")
+    print(f"{baseline['ndcg'][0]:8.4f} {baseline['hit_rate'][0]:8.4f}  (current weights)")
+
+    best = configs[ranking[0]]
+    result = config_dict(best)
+    result['metrics'] = {
+        'k': args.k,
+        'train': {'ndcg': round(float(scores['ndcg'][ranking[0]]), 4),
+                  'hit_rate': round(float(scores['hit_rate'][ranking[0]]), 4),
+                  'baseline_ndcg': round(float(baseline['ndcg'][0]), 4),
+                  'baseline_hit_rate': round(float(baseline['hit_rate'][0]), 4)},
+        'profiles': len(queries)
+    }
+    if test:
+        held_out = evaluate(recommender, test, np.vstack([best, base]), args.k)
+        result['metrics']['holdout'] = {'ndcg': round(float(held_out['ndcg'][0]), 4),
+                                        'hit_rate': round(float(held_out['hit_rate'][0]), 4),
+                                        'baseline_ndcg': round(float(held_out['ndcg'][1]), 4),
+                                        'baseline_hit_rate': round(float(held_out['hit_rate'][1]), 4)}
+        print(f"\nHeld out: ndcg@{args.k} {held_out['ndcg'][0]:.4f} (current {held_out['ndcg'][1]:.4f}), "
+              f"hit@{args.k} {held_out['hit_rate'][0]:.4f} (current {held_out['hit_rate'][1]:.4f})")
+
+    if args.output:
+        result['generated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
+import argparse
 import json
 import random
+from collections import Counter
 
 # Real colleges found from verified sources
 real_colleges = [
@@ -162,64 +164,168 @@ streams_map = {
     "Humanities": "Humanities"
 }
 
+# Name parts for synthetic colleges
+name_prefixes = ["Himalayan", "Everest", "Annapurna", "Kanchan", "Sagarmatha", "Lumbini", "Janak", "Gaurishankar",
+                 "Shree", "Nepal", "Valley", "National", "Global", "Pioneer", "Premier", "Central", "Eastern",
+                 "Western", "Mid-Western", "Far-Western", "New Summit", "Golden Gate", "Little Angels", "Trinity"]
+name_suffixes = {
+    "Engineering": ["Engineering College", "Institute of Technology", "College of Engineering"],
+    "Management": ["College of Management", "Business School", "Management College"],
+    "IT": ["College of IT", "Institute of Computing", "Tech College"],
+    "Science": ["Science Campus", "College of Science", "Multiple Campus"],
+    "Medical": ["Medical College", "Institute of Health Sciences", "Nursing College"],
+    "Humanities": ["Multiple Campus", "College of Arts", "Campus"],
+    "Agriculture": ["Agriculture Campus", "College of Agriculture", "Institute of Agriculture"],
+}
+facilities_pool = ["Library", "Computer Lab", "Cafeteria", "WiFi", "Hostel", "Sports", "Transportation", "Auditorium", "Laboratory"]
+
+
+def _weighted_choices(counts):
+    # Turn a {value: count} mapping into population/weights lists
+    values = sorted(counts)
+    return values, [counts[v] for v in values]
+
+
+# Distributions measured from the real colleges
+location_dist = _weighted_choices(Counter(rc["location"] for rc in real_colleges))
+type_dist = _weighted_choices(Counter(rc.get("type", "Private") for rc in real_colleges))
+category_dist = _weighted_choices({"Engineering": 30, "Management": 35, "IT": 20, "Science": 12, "Medical": 8, "Humanities": 10, "Agriculture": 3})
+
+
+def guess_category(programs):
+    # Category and streams of a scraped college, guessed from its program names
+    category = "General"
+    stream = "Science" # Default
+
+    # Heuristic to find category and stream
+    for cat, progs in program_types.items():
+        if any(p in str(programs) for p in progs):
+            category = cat
+            stream = streams_map[cat]
+            break
+
+    # Ensure 'streams' is a list
+    streams = [stream]
+    if "Management" in str(programs) or "BBA" in str(programs) or "BBS" in str(programs):
+        if "Management" not in streams: streams.append("Management")
+    if "BA" in str(programs) or "BSW" in str(programs):
+         if "Humanities" not in streams: streams.append("Humanities")
+    return category, streams
+
+
+def build_college(rc, college_id, rng):
+    # Build a full college record from a name/location/type/programs entry
+    programs = rc["programs"]
+    if rc.get("categories"):
+        # Synthetic entries carry the categories their programs were drawn from, main one first
+        category = rc["categories"][0]
+        streams = list(dict.fromkeys(streams_map[c] for c in rc["categories"]))
+    else:
+        category, streams = guess_category(programs)
+
+    budget = rng.choice(["low", "medium", "high"])
+    if rc.get("type") == "Government" or rc.get("type") == "Community":
+        budget = "low"
+    elif "International" in rc["name"] or "British" in rc["name"] or "Islington" in rc["name"]:
+        budget = "high"
+
+    return {
+        "id": college_id,
+        "name": rc["name"],
+        "location": rc["location"],
+        "programs": programs,
+        "streams": streams,
+        "min_gpa": round(rng.uniform(2.4, 3.2), 1) if rc.get("type") == "Government" else round(rng.uniform(2.0, 3.0), 1),
+        "budget_range": budget,
+        "career_focus": [category, "Industry"],
+        "interests": [category, "Learning"],
+        "description": f"{rc['name']} is a well-known {rc.get('type')} institution located in {rc['location']}.",
+        "website": f"https://example.com/college{college_id}",
+        "contact": f"+977-1-{rng.randint(4000000, 4999999)}",
+        "facilities": ["Library", "Computer Lab", "Cafeteria", "WiFi"] + (["Hostel"] if rng.random() > 0.4 else []),
+        "established": rng.randint(1960, 2010),
+        "type": rc.get("type", "Private"),
+        "admission_process": "Entrance Exam" if "Science" in streams else "Merit-based",
+        "scholarship_available": True
+    }
+
+
+def synthetic_entry(college_id, rng):
+    # Make up a name/location/type/programs entry shaped like the real ones
+    category = rng.choices(*category_dist)[0]
+    location = rng.choices(*location_dist)[0]
+    college_type = rng.choices(*type_dist)[0]
+
+    # Most colleges stick to one category, some add management programs on top
+    progs = program_types[category]
+    programs = rng.sample(progs, rng.randint(1, min(6, len(progs))))
+    categories = [category]
+    if category != "Management" and rng.random() < 0.25:
+        programs += rng.sample(program_types["Management"], rng.randint(1, 2))
+        categories.append("Management")
+
+    name = f"{rng.choice(name_prefixes)} {rng.choice(name_suffixes[category])} {location} #{college_id}"
+    if college_type == "Private" and rng.random() < 0.1:
+        name = f"{rng.choice(name_prefixes)} International College {location} #{college_id}"
+
+    return {"name": name, "location": location, "type": college_type, "programs": programs, "categories": categories}
+
+
+def generate_synthetic(count, seed=0):
+    # Yield `count` synthetic colleges; the same seed always gives the same catalog
+    rng = random.Random(seed)
+    for college_id in range(1, count + 1):
+        college = build_college(synthetic_entry(college_id, rng), college_id, rng)
+        # Give synthetic colleges some facility variety
+        extra = rng.sample(facilities_pool[4:], rng.randint(0, 3))
+        college["facilities"] = college["facilities"] + [f for f in extra if f not in college["facilities"]]
+        yield college
+
+
+def write_colleges(colleges, path, fmt="json"):
+    # Stream colleges to disk one record at a time so memory stays flat
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == "ndjson":
+            for college in colleges:
+                f.write(json.dumps(college, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+        else:
+            f.write("[\n")
+            for college in colleges:
+                if count:
+                    f.write(",\n")
+                f.write(json.dumps(college, indent=2))
+                count += 1
+            f.write("\n]\n")
+    return count
+
+
 def main():
-    colleges = []
-    college_id = 1
-    
-    print(f"Generating dataset with {len(real_colleges)} REAL colleges only.")
-    
-    for rc in real_colleges:
-        # Determine category for metadata
-        category = "General"
-        programs = rc["programs"]
-        stream = "Science" # Default
-        
-        # Heuristic to find category and stream
-        for cat, progs in program_types.items():
-            if any(p in str(programs) for p in progs):
-                category = cat
-                stream = streams_map[cat]
-                break
-        
-        # Ensure 'streams' is a list
-        streams = [stream]
-        if "Management" in str(programs) or "BBA" in str(programs) or "BBS" in str(programs):
-            if "Management" not in streams: streams.append("Management")
-        if "BA" in str(programs) or "BSW" in str(programs):
-             if "Humanities" not in streams: streams.append("Humanities")
-        
-        budget = random.choice(["low", "medium", "high"])
-        if rc.get("type") == "Government" or rc.get("type") == "Community":
-            budget = "low"
-        elif "International" in rc["name"] or "British" in rc["name"] or "Islington" in rc["name"]:
-            budget = "high"
-            
-        colleges.append({
-            "id": college_id,
-            "name": rc["name"],
-            "location": rc["location"],
-            "programs": programs,
-            "streams": streams,
-            "min_gpa": round(random.uniform(2.4, 3.2), 1) if rc.get("type") == "Government" else round(random.uniform(2.0, 3.0), 1),
-            "budget_range": budget,
-            "career_focus": [category, "Industry"], 
-            "interests": [category, "Learning"], 
-            "description": f"{rc['name']} is a well-known {rc.get('type')} institution located in {rc['location']}.", 
-            "website": f"https://example.com/college{college_id}",
-            "contact": f"+977-1-{random.randint(4000000, 4999999)}",
-            "facilities": ["Library", "Computer Lab", "Cafeteria", "WiFi"] + (["Hostel"] if random.random() > 0.4 else []),
-            "established": random.randint(1960, 2010),
-            "type": rc.get("type", "Private"),
-            "admission_process": "Entrance Exam" if "Science" in streams else "Merit-based",
-            "scholarship_available": True
-        })
-        college_id += 1
-        
+    parser = argparse.ArgumentParser(description="Generate the college dataset")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="generate N synthetic colleges instead of the real ones")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible output")
+    parser.add_argument("--format", choices=["json", "ndjson"], default=None,
+                        help="output format (default: from the output file extension)")
+    parser.add_argument("--output", default='data/colleges.json', help="output file")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.output.endswith(".ndjson") else "json")
+
+    if args.synthetic:
+        print(f"Generating {args.synthetic} synthetic colleges (seed {args.seed or 0}).")
+        colleges = generate_synthetic(args.synthetic, seed=args.seed or 0)
+    else:
+        print(f"Generating dataset with {len(real_colleges)} REAL colleges only.")
+        rng = random.Random(args.seed)
+        colleges = (build_college(rc, college_id, rng) for college_id, rc in enumerate(real_colleges, 1))
+
     # Save to file
-    with open('data/colleges.json', 'w', encoding='utf-8') as f:
-        json.dump(colleges, f, indent=2)
-    
-    print(f"Generated {len(colleges)} colleges.")
+    count = write_colleges(colleges, args.output, fmt)
+
+    print(f"Generated {count} colleges.")
 
 if __name__ == "__main__":
     main()
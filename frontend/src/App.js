@@ -6,6 +6,36 @@ import Comparison from './components/Comparison';
 
 const API_BASE_URL = 'http://localhost:5001/api';
 
+// The catalog is kept in localStorage as { version, colleges }; later visits only fetch
+// the colleges added, changed or deleted since that version
+const CATALOG_CACHE_KEY = 'collegeCatalog';
+
+const loadCachedCatalog = () => {
+  try {
+    const cached = JSON.parse(localStorage.getItem(CATALOG_CACHE_KEY));
+    return cached && Array.isArray(cached.colleges) ? cached : null;
+  } catch (err) {
+    return null;
+  }
+};
+
+// Whether a sync response can be applied: a whole catalog, or changes to a cached one
+const isCatalogSync = (data, cached) => Boolean(data) && data.version !== undefined && (data.resync
+  ? Array.isArray(data.colleges)
+  : Boolean(cached) && ['added', 'changed', 'deleted'].every(key => Array.isArray(data[key])));
+
+const applyCatalogChanges = (colleges, changes) => {
+  // Added colleges are upserted too: a cached copy can be newer than its version
+  const deleted = new Set(changes.deleted);
+  const changed = new Map([...changes.changed, ...changes.added].map(c => [c.id, c]));
+  const kept = colleges.filter(c => !deleted.has(c.id)).map(c => {
+    const update = changed.get(c.id);
+    changed.delete(c.id);
+    return update || c;
+  });
+  return [...kept, ...changed.values()];
+};
+
 function App() {
   // Form state
   const [formData, setFormData] = useState({
@@ -15,6 +45,7 @@ function App() {
     interests: '',
     career_goals: '',
     location: '',
+    max_distance_km: '',
     budget_range: ''
   });
 
@@ -40,19 +71,42 @@ function App() {
   // Available options from dataset
   const [availablePrograms, setAvailablePrograms] = useState([]);
 
-  // Load all colleges on mount
+  // Load all colleges on mount (only the changes when a cached copy exists)
   useEffect(() => {
-    fetch(`${API_BASE_URL}/colleges`)
-      .then(res => res.json())
-      .then(data => {
-        setAllColleges(data);
+    const cached = loadCachedCatalog();
+    const showColleges = colleges => {
+      setAllColleges(colleges);
 
-        // Extract unique programs, interests, and careers
-        const programs = [...new Set(data.flatMap(c => c.programs))].sort();
+      // Extract unique programs, interests, and careers
+      const programs = [...new Set(colleges.flatMap(c => c.programs))].sort();
 
-        setAvailablePrograms(programs);
+      setAvailablePrograms(programs);
+    };
+    const since = cached ? `?since=${encodeURIComponent(cached.version)}` : '';
+    fetch(`${API_BASE_URL}/colleges/changes${since}`)
+      .then(res => res.json().catch(() => null).then(data => {
+        // Errors (503 while the engine starts or sheds load, 404 for an unknown catalog) carry no catalog
+        if (!res.ok || !isCatalogSync(data, cached)) {
+          throw new Error((data && data.error) || `Catalog sync failed (${res.status})`);
+        }
+        return data;
+      }))
+      .then(data => {
+        const colleges = data.resync ? data.colleges : applyCatalogChanges(cached.colleges, data);
+        try {
+          localStorage.setItem(CATALOG_CACHE_KEY, JSON.stringify({ version: data.version, colleges }));
+        } catch (err) {
+          // Storage full or disabled: the next visit downloads the whole catalog again
+        }
+        showColleges(colleges);
       })
-      .catch(err => console.error('Error loading colleges:', err));
+      .catch(err => {
+        console.error('Error loading colleges:', err);
+        // Show the cached catalog as it is; the next visit syncs it again
+        if (cached) {
+          showColleges(cached.colleges);
+        }
+      });
   }, []);
 
   // Handle form input change
@@ -158,6 +212,7 @@ function App() {
         body: JSON.stringify({
           college_id: collegeId,
           rating: rating,
+          profile: formData,
           timestamp: new Date().toISOString()
         })
       });
@@ -338,6 +393,23 @@ function App() {
               </select>
             </div>
 
+            <div className="form-group">
+              <label htmlFor="max_distance_km">Maximum Distance</label>
+              <select
+                id="max_distance_km"
+                name="max_distance_km"
+                value={formData.max_distance_km}
+                onChange={handleInputChange}
+              >
+                <option value="">No limit</option>
+                <option value="25">Within 25 km</option>
+                <option value="50">Within 50 km</option>
+                <option value="100">Within 100 km</option>
+                <option value="200">Within 200 km</option>
+              </select>
+              <small className="form-hint">Distance from your preferred location</small>
+            </div>
+
             <div className="form-group">
               <label htmlFor="budget_range">Budget Range *</label>
               <select
@@ -602,7 +674,10 @@ function App() {
                       </span>
                     </div>
                   </div>
-                  <div className="college-location">📍 {college.location}</div>
+                  <div className="college-location">
+                    📍 {college.location}
+                    {college.distance_km > 0 && ` (${Math.round(college.distance_km)} km away)`}
+                  </div>
 
                   <div className="college-details">
                     <div className="detail-item">
@@ -111,6 +111,19 @@ const Comparison = ({ colleges, allColleges }) => {
                     <td key={college.id}>{college.type || 'N/A'}</td>
                   ))}
                 </tr>
+                <tr>
+                  <td>Only Here</td>
+                  {selectedColleges.map(college => {
+                    const unique = comparisonData.differences?.unique_features?.[college.id];
+                    return <td key={college.id}>{unique ? unique.programs.join(', ') || '-' : '-'}</td>;
+                  })}
+                </tr>
+                <tr>
+                  <td>Shared by All</td>
+                  <td colSpan={selectedColleges.length}>
+                    {(comparisonData.common_features?.programs || []).join(', ') || 'No common programs'}
+                  </td>
+                </tr>
               </tbody>
             </table>
           </div>